@@ -1,16 +1,25 @@
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+import json
+import time
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match
 from pydantic import BaseModel
-from app.modules.chat_module import ChatModule
-from app.modules.api_module import APIModule
-from app.modules.search_module import SearchModule
-from app.modules.wiki_summary_module import WikiSummaryModule
-from app.modules.wikipedia_query_module import WikipediaQueryModule
-from app.modules.product_comparison_module import ProductComparisonModule
-from app.modules.agentic_reflection_module import AgenticReflectionModule
-from app.modules.translation_module import TranslationModule
+from app.modules.module_registry import get_module_registry, MODULES
+from app.modules.worker_pool import WorkerPool, PoolRejectedError
+from app.modules.streaming import EventStream, format_sse
+from app.modules.cancellation import CancellationToken, GenerationCancelled
+from app.modules.async_provider import connection_pool
+from app.modules.metrics import metrics, runtime_stats, CONTENT_TYPE_LATEST
+from app.modules.tracing import tracer, span, current_span, parse_traceparent
+from app.modules.response_cache import ResponseCache, request_key
+from app.modules.single_flight import SingleFlight
+from app.modules.scheduler import current_api_key
+from app.modules.rate_limiter import RateLimiter, RateLimitExceeded, current_usage
+from app.modules.job_queue import JobRunner, public_job
 from srt_core.config import Config
 from srt_core.utils.logger import Logger
-import uvicorn
 
 app = FastAPI(
     title="SRT Agent API",
@@ -25,54 +34,297 @@ app = FastAPI(
 
 config = Config()
 logger = Logger()
-chat_module = ChatModule(config, logger)
+worker_pool = WorkerPool(config, logger)
+module_registry = get_module_registry(config, logger)
+metrics.add_stats_source(runtime_stats(worker_pool))
+tracer.configure(config, logger)
+response_cache = ResponseCache(config, logger)
+rate_limiter = RateLimiter(config, logger)
+single_flight_settings = config.config.get("single_flight", {}) or {}
+single_flight_timeouts = {
+    "wiki_summary": 120, "wikipedia_query": 120, "translate": 60,
+    **(single_flight_settings.get("timeouts", {}) or {}),
+} if single_flight_settings.get("enabled", True) else {}
+single_flights = {endpoint: SingleFlight(endpoint) for endpoint in single_flight_timeouts}
+
+disconnect_poll_interval = config.config.get("disconnect_poll_interval", 0.5)
+async_providers_enabled = (config.config.get("async_providers", {}) or {}).get("enabled", False)
+max_batch_queries = (config.config.get("wikipedia_retrieval", {}) or {}).get("max_batch_queries", 50)
 
 server_name = config.server_name
 server_port = config.server_port
 logger.info(f"Starting API service on: {server_name}:{server_port}.")
 
-# Initialize modules with error handling
-try:
-    api_module = APIModule(config, logger)
-except ImportError as e:
-    api_module = None
-    logger.info(f"API module could not be imported: {e}. API functionality is disabled.")
-
-try:
-    search_module = SearchModule(config, logger)
-except ImportError as e:
-    search_module = None
-    logger.info(f"Search module could not be initialized: {e}. Search functionality is disabled.")
-
-try:
-    wiki_summary_module = WikiSummaryModule(config, logger)
-except ImportError as e:
-    wiki_summary_module = None
-    logger.info(f"WikiSummary module could not be initialized: {e}. WikiSummary functionality is disabled.")
-
-try:
-    wikipedia_query_module = WikipediaQueryModule(config, logger)
-except ImportError as e:
-    wikipedia_query_module = None
-    logger.info(f"Wikipedia Query module could not be initialized: {e}. Wikipedia Query functionality is disabled.")
-
-try:
-    product_comparison_module = ProductComparisonModule(config, logger)
-except ImportError as e:
-    product_comparison_module = None
-    logger.info(f"Product Comparison module could not be initialized: {e}. Product Comparison functionality is disabled.")
-
-try:
-    agentic_reflection_module = AgenticReflectionModule(config, logger)
-except ImportError as e:
-    agentic_reflection_module = None
-    logger.info(f"Agentic Reflection module could not be initialized: {e}. Reflection functionality is disabled.")
-
-try:
-    translation_module = TranslationModule(config, logger)
-except ImportError as e:
-    translation_module = None
-    logger.info(f"Translation module could not be initialized: {e}. Translation functionality is disabled.")
+# Modules are shared with the chat tools through the registry and are not created at
+# import time: `startup.mode` builds them concurrently in the background once the server
+# runs (default), before it accepts traffic (eager) or on first use (lazy). A module that
+# cannot be initialized is None and its endpoints answer 501.
+startup_settings = config.config.get("startup", {}) or {}
+startup_mode = startup_settings.get("mode", "background")
+startup_modules = startup_settings.get("modules") or list(MODULES)
+for name in [name for name in startup_modules if name not in MODULES]:
+    logger.warning(f"Unknown module {name} in startup.modules, ignoring it.")
+    startup_modules.remove(name)
+
+async def get_module(name):
+    return await module_registry.aget(name)
+
+def async_variant(func):
+    """
+    Return the native asyncio counterpart of a module method (`foo` -> `afoo`) when
+    async providers are enabled and the module's backend supports them. Modules served
+    by another process (see RemoteModule) are always called asynchronously.
+    """
+    module = getattr(func, "__self__", None)
+    if not async_providers_enabled and not getattr(module, "remote", False):
+        return None
+    afunc = getattr(module, f"a{getattr(func, '__name__', '')}", None)
+    if afunc is None or not module.supports_async():
+        return None
+    return afunc
+
+def admit(endpoint, args):
+    """Charge the request's API key for its estimated tokens, 429 if over its rate limit."""
+    try:
+        return rate_limiter.admit(endpoint, args)
+    except RateLimitExceeded as e:
+        metrics.record_error(endpoint, e)
+        raise HTTPException(status_code=429, detail=f"Rate limit exceeded: {e.reason}.",
+                            headers={"Retry-After": str(e.retry_after)})
+
+async def run_in_pool(endpoint, func, *args, cancel_token=None, charge=None):
+    if charge is None:
+        charge = admit(endpoint, args)
+    # LLM calls add the tokens they use to the charge, settled once the call is done.
+    usage_token = current_usage.set(charge.usage) if charge else None
+    try:
+        afunc = async_variant(func)
+        if afunc is not None:
+            return await worker_pool.run_async(endpoint, afunc, *args)
+        if cancel_token is not None:
+            func = cancel_token.bind(func)
+        return await worker_pool.run(endpoint, func, *args)
+    except PoolRejectedError as e:
+        metrics.record_error(endpoint, e)
+        raise HTTPException(status_code=e.status_code, detail=f"Service busy: {e.reason}.",
+                            headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        metrics.record_error(endpoint, e)
+        raise
+    finally:
+        if usage_token is not None:
+            current_usage.reset(usage_token)
+        rate_limiter.settle(charge)
+
+async def run_cancellable(endpoint, request, func, *args):
+    """
+    Run a module call on the worker pool and cancel it if the client goes away, so the
+    backend stops generating an answer nobody will read.
+    """
+    token = CancellationToken()
+    task = asyncio.ensure_future(run_in_pool(endpoint, func, *args, cancel_token=token))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=disconnect_poll_interval)
+            if not task.done() and await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling {endpoint} request.")
+                token.cancel("client disconnected")
+                # Async provider calls run on the event loop and stop as soon as the task is cancelled.
+                task.cancel()
+                # The worker notices the cancellation at its next checkpoint; nobody waits for it.
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                raise HTTPException(status_code=499, detail="Client Closed Request")
+        return task.result()
+    except asyncio.CancelledError:
+        token.cancel("request cancelled")
+        raise
+    except GenerationCancelled:
+        raise HTTPException(status_code=499, detail="Client Closed Request")
+
+def check_pool_capacity(endpoint):
+    # Streams cannot change their status code once started, so reject up front.
+    if worker_pool.get_limiter(endpoint).is_saturated():
+        raise HTTPException(status_code=429, detail="Service busy: too many queued requests.",
+                            headers={"Retry-After": str(worker_pool.retry_after)})
+
+async def stream_module_events(endpoint, func, *args, charge=None):
+    stream = EventStream()
+    token = CancellationToken()
+
+    async def produce():
+        try:
+            result = await run_in_pool(endpoint, func, *args, stream.emit, cancel_token=token, charge=charge)
+            stream.emit("done", result)
+        except HTTPException as e:
+            stream.emit("error", e.detail)
+        except GenerationCancelled:
+            logger.info(f"Streaming {endpoint} request was cancelled.")
+        except Exception as e:
+            logger.error(f"Error streaming {endpoint} response: {e}")
+            stream.emit("error", "Internal Server Error")
+        finally:
+            stream.close()
+
+    producer = asyncio.create_task(produce())
+    try:
+        async for event, data in stream:
+            yield event, data
+    finally:
+        if not producer.done():
+            # The consumer went away (client disconnected), stop the generation.
+            token.cancel("client disconnected")
+
+def sse_response(endpoint, func, *args):
+    check_pool_capacity(endpoint)
+    charge = admit(endpoint, args)
+
+    async def body():
+        try:
+            async for event, data in stream_module_events(endpoint, func, *args, charge=charge):
+                yield format_sse(event, data)
+        finally:
+            # Settles the charge if the client left before the stream started.
+            rate_limiter.settle(charge)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def coalesced(endpoint, args, compute):
+    """
+    Await `compute()` unless an identical request (same endpoint and normalized
+    arguments) is already running, in which case share its result. Waiting callers
+    give up with 504 after the endpoint's timeout.
+    """
+    if endpoint not in single_flights:
+        return await compute()
+    try:
+        return await single_flights[endpoint].run(request_key(endpoint, *args), compute,
+                                                  single_flight_timeouts[endpoint])
+    except asyncio.TimeoutError as e:
+        metrics.record_error(endpoint, e)
+        raise HTTPException(status_code=504, detail="Timed out waiting for the result.")
+
+def etag_matches(if_none_match, etag):
+    tags = [tag.strip().removeprefix("W/") for tag in (if_none_match or "").split(",")]
+    return "*" in tags or etag in tags
+
+async def cached_response(endpoint, http_request, args, compute):
+    """
+    Serve the endpoint from the response cache, awaiting `compute()` for the response
+    body on a miss. Adds `ETag`/`Cache-Control` headers and answers conditional requests
+    with 304. Empty bodies (failed upstream fetches) are neither cached nor cacheable.
+    """
+    if not response_cache.enabled_for(endpoint):
+        return await compute()
+    cached = await response_cache.get_or_compute(endpoint, args, compute)
+    if not cached.stored:
+        return JSONResponse(cached.value, headers={"Cache-Control": "no-store", "X-Cache": "MISS"})
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={cached.max_age}",
+        "X-Cache": "HIT" if cached.hit else "MISS",
+    }
+    if etag_matches(http_request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(cached.value, headers=headers)
+
+def route_path(scope):
+    # Label metrics with the route template, never the raw path, to bound cardinality.
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    route = route_path(request.scope)
+    started = time.monotonic()
+    status = 500
+    try:
+        with metrics.track_in_flight(route):
+            response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception as e:
+        metrics.record_error(route, e)
+        raise
+    finally:
+        metrics.observe_request(request.method, route, status, time.monotonic() - started)
+
+@app.middleware("http")
+async def identify_api_key(request: Request, call_next):
+    # The scheduler shares generation slots fairly between API keys.
+    reset_token = current_api_key.set(request.headers.get("x-api-key") or "anonymous")
+    try:
+        return await call_next(request)
+    finally:
+        current_api_key.reset(reset_token)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Root span of the request; continues the caller's trace when a W3C traceparent
+    # header is sent. Streamed bodies are produced after the span ends, their LLM
+    # calls still share its trace id.
+    trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+    request_span = tracer.start_span(f"{request.method} {route_path(request.scope)}",
+                                     trace_id=trace_id, parent_id=parent_id, **{"http.target": request.url.path})
+    reset_token = current_span.set(request_span)
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        request_span.end(e)
+        raise
+    finally:
+        current_span.reset(reset_token)
+    request_span.set_attribute("http.status_code", response.status_code)
+    request_span.end()
+    response.headers["X-Trace-Id"] = request_span.trace_id
+    return response
+
+# Job kind -> (worker pool endpoint, module, method, parameters, result field)
+JOB_KINDS = {
+    "reflective-response": ("reflective_response", "agentic_reflection", "get_reflective_response",
+                            ["input_message"], "response"),
+    "product-comparison": ("product_comparison", "product_comparison", "compare_and_recommend",
+                           ["product1", "product2", "category", "user_profile"], "result"),
+}
+
+async def run_job(job):
+    endpoint, module_name, method, parameters, result_field = JOB_KINDS[job["kind"]]
+    module = await get_module(module_name)
+    if module is None:
+        raise RuntimeError(f"{job['kind']} functionality is disabled.")
+    # Jobs are scheduled and rate limited as the API key that submitted them.
+    api_key_token = current_api_key.set(job["api_key"] or "anonymous")
+    try:
+        result = await run_in_pool(endpoint, getattr(module, method), *[job["payload"][name] for name in parameters])
+        return {result_field: result}
+    finally:
+        current_api_key.reset(api_key_token)
+
+job_runner = JobRunner(config, logger, run_job)
+
+@app.on_event("startup")
+async def initialize_modules():
+    if startup_mode == "eager":
+        await module_registry.initialize(startup_modules)
+    elif startup_mode == "background":
+        # Keep a reference, the event loop only holds weak references to tasks.
+        app.state.module_initialization = asyncio.ensure_future(module_registry.initialize(startup_modules))
+
+@app.on_event("startup")
+async def start_job_runner():
+    job_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown_worker_pool():
+    await job_runner.stop()
+    worker_pool.shutdown(wait=False)
+    await connection_pool.close()
+    module_registry.close()
+    response_cache.close()
+    rate_limiter.close()
 
 class ChatRequest(BaseModel):
     message: str
@@ -85,114 +337,345 @@ class TranslationRequest(BaseModel):
     source_language: str
     target_language: str
 
+class WikipediaQueriesRequest(BaseModel):
+    page_url: str
+    queries: List[str]
+
+class JobRequest(BaseModel):
+    params: dict
+    webhook: Optional[str] = None
+
 @app.get("/", summary="Health Check", tags=["Health"])
 def health_check():
     logger.debug("Health check endpoint called")
     return {"message": "Welcome to the SRT Agent API"}
 
+@app.get("/ready", summary="Readiness Probe", tags=["Health"])
+def readiness():
+    """503 until every module initialized at startup is ready (or disabled), with the state of each module."""
+    modules = module_registry.readiness()
+    required = startup_modules if startup_mode != "lazy" else []
+    ready = all(modules[name]["state"] in ("ready", "disabled") for name in required)
+    return JSONResponse({"ready": ready, "modules": modules}, status_code=200 if ready else 503)
+
+@app.get("/metrics", summary="Prometheus Metrics", tags=["Health"])
+def prometheus_metrics():
+    if not metrics.enabled:
+        raise HTTPException(status_code=501, detail="Metrics are disabled, prometheus_client is not installed.")
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post("/chat", response_model=ChatResponse, summary="Chat with the Agent", tags=["Chat Module"])
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
+    chat_module = await get_module("chat")
     try:
-        response = chat_module.chat(request.message)
+        response = await run_cancellable("chat", http_request, chat_module.chat, request.message)
         return {"response": response}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing chat request: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@app.post("/chat/stream", summary="Chat with the Agent (Server-Sent Events)", tags=["Chat Module"])
+async def chat_stream(request: ChatRequest):
+    chat_module = await get_module("chat")
+    return sse_response("chat", chat_module.chat_stream, request.message)
+
 @app.get("/fetch", summary="Fetch Data", tags=["API Module"])
-def fetch_data(url: str = Query(..., description="URL to fetch data from")):
+async def fetch_data(http_request: Request, url: str = Query(..., description="URL to fetch data from")):
+    api_module = await get_module("api")
     if not api_module:
         raise HTTPException(status_code=501, detail="API functionality is disabled.")
     logger.debug(f"Fetching data from URL: {url}")
+
+    async def compute():
+        afunc = async_variant(api_module.fetch_data)
+        return await afunc(url) if afunc else await asyncio.to_thread(api_module.fetch_data, url)
+
     try:
-        response = api_module.fetch_data(url)
-        return response
+        return await cached_response("fetch", http_request, [url], compute)
     except Exception as e:
         logger.error(f"Error fetching data from URL: {url}, error: {e}")
         raise HTTPException(status_code=404, detail="Error fetching data")
 
 @app.get("/fetch-list", summary="Fetch Data List", tags=["API Module"])
-def fetch_data_list(url: str = Query(..., description="URL to fetch list data from")):
+async def fetch_data_list(http_request: Request, url: str = Query(..., description="URL to fetch list data from")):
+    api_module = await get_module("api")
     if not api_module:
         raise HTTPException(status_code=501, detail="API functionality is disabled.")
     logger.debug(f"Fetching list from URL: {url}")
+
+    async def compute():
+        afunc = async_variant(api_module.fetch_data_list)
+        return await afunc(url) if afunc else await asyncio.to_thread(api_module.fetch_data_list, url)
+
     try:
-        response = api_module.fetch_data_list(url)
-        return response
+        return await cached_response("fetch_list", http_request, [url], compute)
     except Exception as e:
         logger.error(f"Error fetching list from URL: {url}, error: {e}")
         raise HTTPException(status_code=404, detail="Error fetching data list")
 
 @app.get("/search", summary="Perform a Web Search", tags=["Search Module"])
-def search(query: str = Query(..., description="Query to search for")):
+async def search(query: str = Query(..., description="Query to search for")):
+    search_module = await get_module("search")
     if not search_module:
         raise HTTPException(status_code=501, detail="Search functionality is disabled.")
     logger.debug(f"Performing search for query: {query}")
     try:
-        results = search_module.search(query)
+        results = await run_in_pool("search", search_module.search, query)
         return {"results": results}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error performing search for query: {query}, error: {e}")
         raise HTTPException(status_code=500, detail="Error performing search")
 
+@app.get("/search/stream", summary="Perform a Web Search (Server-Sent Events)", tags=["Search Module"])
+async def search_stream(query: str = Query(..., description="Query to search for")):
+    search_module = await get_module("search")
+    if not search_module:
+        raise HTTPException(status_code=501, detail="Search functionality is disabled.")
+    return sse_response("search", search_module.search_stream, query)
+
 @app.get("/wiki-summary/{title}", summary="Get Wikipedia Summary", tags=["Wiki Summary Module"])
-def wiki_summary(title: str):
+async def wiki_summary(title: str, http_request: Request):
+    wiki_summary_module = await get_module("wiki_summary")
     if not wiki_summary_module:
         raise HTTPException(status_code=501, detail="WikiSummary functionality is disabled.")
     logger.debug(f"Fetching wiki summary for title: {title}")
-    try:
-        summary = wiki_summary_module.summarize_wikipedia_page(title)
+
+    async def compute():
+        summary = await run_in_pool("wiki_summary", wiki_summary_module.summarize_wikipedia_page, title)
         return {"summary": summary}
+
+    try:
+        return await cached_response("wiki_summary", http_request, [title],
+                                     lambda: coalesced("wiki_summary", [title], compute))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching wiki summary for title: {title}, error: {e}")
         raise HTTPException(status_code=500, detail="Error fetching wiki summary")
 
 @app.get("/wikipedia-query", summary="Query Wikipedia Page", tags=["Wikipedia Query Module"])
-def wikipedia_query(page_url: str, query: str):
+async def wikipedia_query(page_url: str, query: str):
+    wikipedia_query_module = await get_module("wikipedia_query")
     if not wikipedia_query_module:
         raise HTTPException(status_code=501, detail="Wikipedia Query functionality is disabled.")
     logger.debug(f"Processing Wikipedia query for page: {page_url} and query: {query}")
     try:
-        result = wikipedia_query_module.process_wikipedia_query(page_url, query)
-        return {"result": result}
+        result = await coalesced("wikipedia_query", [page_url, query], lambda: run_in_pool(
+            "wikipedia_query", wikipedia_query_module.process_wikipedia_query, page_url, query))
+        return {"result": result["answer"], "page": result["page"], "revision": result["revision"],
+                "sources": result["sources"]}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing Wikipedia query for page: {page_url} and query: {query}, error: {e}")
         raise HTTPException(status_code=500, detail="Error processing Wikipedia query")
 
+@app.post("/wikipedia-query/batch", summary="Query Wikipedia Page with Several Questions",
+          tags=["Wikipedia Query Module"])
+async def wikipedia_query_batch(request: WikipediaQueriesRequest, http_request: Request):
+    """
+    Answer several questions about one page, indexing it once. Results are in the order
+    of `queries`; a question that failed has an `error` instead of a `result`.
+    """
+    wikipedia_query_module = await get_module("wikipedia_query")
+    if not wikipedia_query_module:
+        raise HTTPException(status_code=501, detail="Wikipedia Query functionality is disabled.")
+    if not request.queries or len(request.queries) > max_batch_queries:
+        raise HTTPException(status_code=422, detail=f"Send between 1 and {max_batch_queries} queries.")
+    logger.debug(f"Processing {len(request.queries)} Wikipedia queries for page: {request.page_url}")
+    try:
+        result = await run_cancellable("wikipedia_query_batch", http_request,
+                                       wikipedia_query_module.process_wikipedia_queries,
+                                       request.page_url, request.queries)
+        results = [
+            {"query": item["query"], "result": item["answer"], "sources": item["sources"]} if "answer" in item
+            else {"query": item["query"], "error": "Error processing Wikipedia query"}
+            for item in result["results"]
+        ]
+        return {"page": result["page"], "revision": result["revision"], "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing Wikipedia queries for page: {request.page_url}, error: {e}")
+        raise HTTPException(status_code=500, detail="Error processing Wikipedia queries")
+
 @app.get("/product-comparison", summary="Compare Products and Recommend", tags=["Product Comparison Module"])
-def product_comparison(product1: str, product2: str, category: str, user_profile: str):
+async def product_comparison(product1: str, product2: str, category: str, user_profile: str, http_request: Request):
+    product_comparison_module = await get_module("product_comparison")
     if not product_comparison_module:
         raise HTTPException(status_code=501, detail="Product Comparison functionality is disabled.")
     logger.debug(f"Processing product comparison for: {product1} vs {product2} in category {category} for user {user_profile}")
-    try:
-        result = product_comparison_module.compare_and_recommend(product1, product2, category, user_profile)
+
+    async def compute():
+        result = await run_cancellable("product_comparison", http_request, product_comparison_module.compare_and_recommend,
+                                       product1, product2, category, user_profile)
         return {"result": result}
+
+    try:
+        return await cached_response("product_comparison", http_request,
+                                     [product1, product2, category, user_profile], compute)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing product comparison: {e}")
         raise HTTPException(status_code=500, detail="Error processing product comparison")
 
 @app.post("/reflective-response", summary="Get Reflective Response", tags=["Agentic Reflection Module"])
-def reflective_response(input_message: str):
+async def reflective_response(input_message: str, http_request: Request):
+    agentic_reflection_module = await get_module("agentic_reflection")
     if not agentic_reflection_module:
         raise HTTPException(status_code=501, detail="Reflection functionality is disabled.")
     logger.debug(f"Processing reflective response for message: {input_message}")
     try:
-        response = agentic_reflection_module.get_reflective_response(input_message)
+        response = await run_cancellable("reflective_response", http_request,
+                                         agentic_reflection_module.get_reflective_response, input_message)
         return {"response": response}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing reflective response for message: {input_message}, error: {e}")
         raise HTTPException(status_code=500, detail="Error processing reflective response")
 
 @app.post("/translate", response_model=ChatResponse, summary="Translate text", tags=["Translation Module"])
-async def translate(request: TranslationRequest):
+async def translate(request: TranslationRequest, http_request: Request):
+    translation_module = await get_module("translation")
     if not translation_module:
         raise HTTPException(status_code=501, detail="Translation functionality is disabled.")
-    try:
-        translated_text = translation_module.translate(request.text, request.source_language, request.target_language)
+
+    async def compute():
+        translated_text = await run_in_pool("translate", translation_module.translate,
+                                            request.text, request.source_language, request.target_language)
         return {"response": translated_text}
+
+    args = [request.text, request.source_language, request.target_language]
+    try:
+        return await cached_response("translate", http_request, args, lambda: coalesced("translate", args, compute))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error translating text: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-if __name__ == "__main__":
+@app.post("/translate/stream", summary="Translate text (Server-Sent Events)", tags=["Translation Module"])
+async def translate_stream(request: TranslationRequest):
+    translation_module = await get_module("translation")
+    if not translation_module:
+        raise HTTPException(status_code=501, detail="Translation functionality is disabled.")
+    return sse_response("translate", translation_module.translate_stream,
+                        request.text, request.source_language, request.target_language)
+
+async def resolve_stream_call(kind, payload):
+    if kind == "chat":
+        chat_module = await get_module("chat")
+        return chat_module.chat_stream, [ChatRequest(**payload).message]
+    if kind == "search" and (search_module := await get_module("search")):
+        return search_module.search_stream, [payload["query"]]
+    if kind == "translate" and (translation_module := await get_module("translation")):
+        request = TranslationRequest(**payload)
+        return translation_module.translate_stream, [request.text, request.source_language, request.target_language]
+    return None, None
+
+@app.post("/jobs/{kind}", status_code=202, summary="Submit a Job", tags=["Jobs"])
+async def submit_job(kind: str, request: JobRequest, http_request: Request, response: Response):
+    """
+    Queue a long-running request (`reflective-response` or `product-comparison`, with
+    the parameters of the matching endpoint in `params`) and return its id at once.
+    Poll `GET /jobs/{id}` for the result, or pass a `webhook` URL that receives the
+    finished job as a POST (http or https, to a public host or one of `webhook_hosts`).
+    """
+    if not job_runner.enabled:
+        raise HTTPException(status_code=501, detail="Jobs are disabled.")
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind: {kind}")
+    _, module_name, _, parameters, _ = JOB_KINDS[kind]
+    if await get_module(module_name) is None:
+        raise HTTPException(status_code=501, detail=f"{kind} functionality is disabled.")
+    missing = [name for name in parameters if name not in request.params]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing parameters: {', '.join(missing)}")
+
+    if request.webhook is not None:
+        try:
+            await asyncio.to_thread(job_runner.validate_webhook, request.webhook)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    payload = {name: str(request.params[name]) for name in parameters}
+    job_id = await asyncio.to_thread(job_runner.submit, kind, payload, request.webhook,
+                                     http_request.headers.get("x-api-key"))
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {"id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}", summary="Get Job Status", tags=["Jobs"])
+async def get_job(job_id: str, http_request: Request):
+    """The job, only for the `X-API-Key` that submitted it."""
+    if not job_runner.enabled:
+        raise HTTPException(status_code=501, detail="Jobs are disabled.")
+    job = await asyncio.to_thread(job_runner.get, job_id, http_request.headers.get("x-api-key"))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
+
+@app.websocket("/ws/{kind}")
+async def stream_websocket(websocket: WebSocket, kind: str):
+    """
+    WebSocket variant of the streaming endpoints. Every JSON message received is handled
+    as one request (same body as the matching POST/GET endpoint) and answered with a
+    sequence of `{"event": ..., "data": ...}` messages, starting with `trace` (the trace id)
+    and ending with `done` or `error`.
+    """
+    await websocket.accept()
+    current_api_key.set(websocket.headers.get("x-api-key") or "anonymous")
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                func, args = await resolve_stream_call(kind, payload)
+            except Exception as e:
+                await websocket.send_json({"event": "error", "data": f"Invalid request: {e}"})
+                continue
+            if func is None:
+                await websocket.send_json({"event": "error", "data": f"Streaming is not available for '{kind}'."})
+                continue
+            if worker_pool.get_limiter(kind).is_saturated():
+                await websocket.send_json({"event": "error", "data": "Service busy: too many queued requests."})
+                continue
+            try:
+                charge = admit(kind, args)
+            except HTTPException as e:
+                await websocket.send_json({"event": "error", "data": e.detail})
+                continue
+            try:
+                with span(f"WS /ws/{kind}") as message_span:
+                    await websocket.send_json({"event": "trace", "data": message_span.trace_id})
+                    async for event, data in stream_module_events(kind, func, *args, charge=charge):
+                        await websocket.send_text(json.dumps({"event": event, "data": data}, default=str))
+            finally:
+                rate_limiter.settle(charge)
+    except WebSocketDisconnect:
+        logger.debug(f"WebSocket client for {kind} disconnected.")
+
+def main():
+    """
+    Run the API service. With `startup.workers` above 1 it runs under gunicorn with that
+    many uvicorn workers, forked after the modules were loaded (see app.server).
+    """
+    workers = startup_settings.get("workers", 1)
+    if workers > 1:
+        from app.server import run_preforked
+        for name, backend in [("response_cache", response_cache.backend), ("rate_limit", rate_limiter.store)]:
+            if backend is not None and not backend.shared:
+                logger.warning(f"{name} uses an in-process backend, every worker keeps its own state. "
+                               f"Use the sqlite or redis backend to share it.")
+        run_preforked("app.api_service", server_name, server_port, workers,
+                      startup_settings.get("preload", True), startup_settings.get("worker_timeout", 600), logger)
+        return
+    import uvicorn
     uvicorn.run("app.api_service:app", host=server_name, port=server_port, reload=False, app_dir="app/")
+
+if __name__ == "__main__":
+    main()
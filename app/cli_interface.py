@@ -1,11 +1,6 @@
-from app.modules.chat_module import ChatModule
-from app.modules.api_module import APIModule
-from app.modules.search_module import SearchModule
-from app.modules.wiki_summary_module import WikiSummaryModule
-from app.modules.wikipedia_query_module import WikipediaQueryModule
-from app.modules.product_comparison_module import ProductComparisonModule
-from app.modules.agentic_reflection_module import AgenticReflectionModule
-from app.modules.translation_module import TranslationModule
+import asyncio
+from app.modules.module_registry import get_module_registry
+from app.modules.tracing import tracer
 from srt_core.config import Config
 from srt_core.utils.logger import Logger
 
@@ -13,57 +8,19 @@ from srt_core.utils.logger import Logger
 def main():
     config = Config()
     logger = Logger()
+    tracer.configure(config, logger)
 
-    chat_module = ChatModule(config, logger)
-
-    # Initialize APIModule with error handling
-    try:
-        api_module = APIModule(config, logger)
-    except ImportError as e:
-        api_module = None
-        logger.info(f"API module could not be imported: {e}. API functionality is disabled.")
-
-    # Initialize SearchModule with error handling
-    try:
-        search_module = SearchModule(config, logger)
-    except ImportError as e:
-        search_module = None
-        logger.info(f"Search module could not be initialized: {e}. Search functionality is disabled.")
-
-    # Initialize WikiSummaryModule with error handling
-    try:
-        wiki_summary_module = WikiSummaryModule(config, logger)
-    except ImportError as e:
-        wiki_summary_module = None
-        logger.info(f"WikiSummary module could not be initialized: {e}. WikiSummary functionality is disabled.")
-
-    # Initialize WikipediaQueryModule with error handling
-    try:
-        wikipedia_query_module = WikipediaQueryModule(config, logger)
-    except ImportError as e:
-        wikipedia_query_module = None
-        logger.info(f"Wikipedia Query module could not be initialized: {e}. Wikipedia Query functionality is disabled.")
-
-    # Initialize ProductComparisonModule with error handling
-    try:
-        product_comparison_module = ProductComparisonModule(config, logger)
-    except ImportError as e:
-        product_comparison_module = None
-        logger.info(f"Product Comparison module could not be initialized: {e}. Product Comparison functionality is disabled.")
-
-    # Initialize AgenticReflectionModule with error handling
-    try:
-        agentic_reflection_module = AgenticReflectionModule(config, logger)
-    except ImportError as e:
-        agentic_reflection_module = None
-        logger.info(f"Agentic Reflection module could not be initialized: {e}. Reflection functionality is disabled.")
-
-    # Initialize TranslationModule with error handling
-    try:
-        translation_module = TranslationModule(config, logger)
-    except ImportError as e:
-        translation_module = None
-        logger.info(f"Translation module could not be initialized: {e}. Translation functionality is disabled.")
+    modules = get_module_registry(config, logger)
+    # Build every module concurrently, logging how long each one took.
+    asyncio.run(modules.initialize())
+    chat_module = modules.get("chat")
+    api_module = modules.get("api")
+    search_module = modules.get("search")
+    wiki_summary_module = modules.get("wiki_summary")
+    wikipedia_query_module = modules.get("wikipedia_query")
+    product_comparison_module = modules.get("product_comparison")
+    agentic_reflection_module = modules.get("agentic_reflection")
+    translation_module = modules.get("translation")
 
     while True:
         user_input = input("> ")
@@ -117,7 +74,10 @@ def main():
                     page_url, query = inputs
                     try:
                         result = wikipedia_query_module.process_wikipedia_query(page_url.strip(), query.strip())
-                        print(f"Query Result: {result}")
+                        print(f"Query Result: {result['answer']}")
+                        for source in result["sources"]:
+                            print(f"Source: {result['page']} (revision {result['revision']}), "
+                                  f"characters {source['offset']}-{source['offset'] + source['length']}")
                     except Exception as e:
                         print(f"Error processing wikipedia query: {e}")
                 else:
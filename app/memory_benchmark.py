@@ -0,0 +1,103 @@
+"""
+Measures the memory used by the API service per process (Linux only).
+
+Starts the service under gunicorn with the given number of workers, with and without
+preloading the modules before forking, waits until /ready answers 200 and reports RSS,
+PSS and USS of the master and every worker from /proc/<pid>/smaps_rollup. PSS splits
+shared pages between the processes sharing them, so the PSS total is the memory the
+deployment actually uses.
+
+    python -m app.memory_benchmark --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def process_memory(pid):
+    """RSS, PSS and USS (private pages) of a process in MiB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[0].endswith(":"):
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0) / 1024,
+        "pss": values.get("Pss", 0) / 1024,
+        "uss": (values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)) / 1024,
+    }
+
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"The service was not ready within {timeout}s")
+
+
+def measure(workers, preload, port, timeout):
+    code = (f"from app.server import run_preforked; "
+            f"run_preforked('app.api_service', '127.0.0.1', {port}, {workers}, {preload})")
+    master = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port, timeout)
+        # /ready may be answered by the first worker while others are still starting.
+        deadline = time.monotonic() + timeout
+        while len(child_pids(master.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.5)
+        time.sleep(2)
+        processes = [("master", master.pid)] + [(f"worker {i + 1}", pid) for i, pid in enumerate(child_pids(master.pid))]
+        return [{"process": name, "pid": pid, **process_memory(pid)} for name, pid in processes]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+
+def report(title, rows):
+    print(title)
+    print(f"  {'process':<10} {'RSS MiB':>10} {'PSS MiB':>10} {'USS MiB':>10}")
+    for row in rows:
+        print(f"  {row['process']:<10} {row['rss']:>10.1f} {row['pss']:>10.1f} {row['uss']:>10.1f}")
+    print(f"  {'total':<10} {sum(row['rss'] for row in rows):>10.1f} {sum(row['pss'] for row in rows):>10.1f} "
+          f"{sum(row['uss'] for row in rows):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--timeout", type=int, default=900, help="seconds to wait for the modules to load")
+    parser.add_argument("--json", action="store_true", help="print the measurements as JSON")
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("The memory benchmark needs Linux (/proc/<pid>/smaps_rollup).")
+
+    results = {f"preload={preload}": measure(args.workers, preload, args.port, args.timeout)
+               for preload in (True, False)}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for title, rows in results.items():
+        report(f"{args.workers} workers, {title}", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import sys
+from typing import List
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from app.modules.module_registry import get_module_registry, MODULES
+from app.modules.remote_module import SERVICE_METHODS
+from app.modules.worker_pool import WorkerPool, PoolRejectedError
+from app.modules.streaming import EventStream, format_sse
+from app.modules.cancellation import CancellationToken, GenerationCancelled
+from app.modules.async_provider import connection_pool
+from app.modules.metrics import metrics, runtime_stats, CONTENT_TYPE_LATEST
+from app.modules.tracing import tracer, current_span, parse_traceparent
+from app.modules.scheduler import current_api_key
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+
+class CallRequest(BaseModel):
+    args: List = []
+
+
+def create_app(name, config=None, logger=None, module_registry=None):
+    """
+    HTTP service for a single module, so it can be scaled on its own nodes behind the API
+    gateway (see `gateway.services`). `POST /call/{method}` runs one of the module's
+    SERVICE_METHODS with `{"args": [...]}` on this process' worker pool and answers
+    `{"result": ...}`, or Server-Sent Events for `_stream` methods. Rate limiting and
+    caching stay with the gateway; the worker pool and scheduler apply per node.
+    """
+    if name not in SERVICE_METHODS:
+        raise ValueError(f"Unknown module: {name}")
+    config = config or Config()
+    logger = logger or Logger()
+    module_registry = module_registry or get_module_registry(config, logger)
+    # This process serves the module itself, even when the shared config.yaml forwards it.
+    module_registry.services.pop(name, None)
+    methods = SERVICE_METHODS[name]
+    label = MODULES[name][2]
+    worker_pool = WorkerPool(config, logger)
+    metrics.add_stats_source(runtime_stats(worker_pool))
+    tracer.configure(config, logger)
+    disconnect_poll_interval = config.config.get("disconnect_poll_interval", 0.5)
+    async_providers_enabled = (config.config.get("async_providers", {}) or {}).get("enabled", False)
+
+    app = FastAPI(title=f"SRT Agent API - {label} module",
+                  description=f"Serves the {label} module for the SRT Agent API gateway.")
+
+    async def resolve(method):
+        if method not in methods:
+            raise HTTPException(status_code=404, detail=f"Unknown method: {method}")
+        module = await module_registry.aget(name)
+        if module is None:
+            raise HTTPException(status_code=501, detail=f"{label} functionality is disabled.")
+        return module, getattr(module, method), methods[method]
+
+    async def run(module, method, func, endpoint, args, token):
+        afunc = getattr(module, f"a{method}", None) if async_providers_enabled else None
+        if afunc is not None and module.supports_async():
+            return await worker_pool.run_async(endpoint, afunc, *args)
+        return await worker_pool.run(endpoint, token.bind(func), *args)
+
+    def stream_response(module, method, func, endpoint, args):
+        # Streams cannot change their status code once started, so reject up front.
+        if worker_pool.get_limiter(endpoint).is_saturated():
+            raise HTTPException(status_code=429, detail="Service busy: too many queued requests.",
+                                headers={"Retry-After": str(worker_pool.retry_after)})
+        events = EventStream()
+        token = CancellationToken()
+
+        async def produce():
+            try:
+                result = await run(module, method, func, endpoint, [*args, events.emit], token)
+                events.emit("done", result)
+            except PoolRejectedError as e:
+                events.emit("error", f"Service busy: {e.reason}.")
+            except GenerationCancelled:
+                logger.info(f"Streaming {name}.{method} call was cancelled.")
+            except Exception as e:
+                metrics.record_error(endpoint, e)
+                logger.error(f"Error streaming {name}.{method}: {e}")
+                events.emit("error", str(e))
+            finally:
+                events.close()
+
+        async def body():
+            producer = asyncio.create_task(produce())
+            try:
+                async for event, data in events:
+                    yield format_sse(event, data)
+            finally:
+                if not producer.done():
+                    # The gateway went away (its client disconnected), stop the generation.
+                    token.cancel("client disconnected")
+
+        return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.middleware("http")
+    async def request_context(request: Request, call_next):
+        # Continue the gateway's trace and schedule the call as the gateway's API key.
+        trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+        request_span = tracer.start_span(f"{request.method} {request.url.path}", trace_id=trace_id,
+                                         parent_id=parent_id, module=name)
+        span_token = current_span.set(request_span)
+        api_key_token = current_api_key.set(request.headers.get("x-api-key") or "anonymous")
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            request_span.end(e)
+            raise
+        finally:
+            current_span.reset(span_token)
+            current_api_key.reset(api_key_token)
+        request_span.set_attribute("http.status_code", response.status_code)
+        request_span.end()
+        return response
+
+    @app.on_event("startup")
+    async def initialize_module():
+        # Keep a reference, the event loop only holds weak references to tasks.
+        app.state.module_initialization = asyncio.ensure_future(module_registry.initialize([name]))
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        worker_pool.shutdown(wait=False)
+        await connection_pool.close()
+        module_registry.close()
+
+    @app.get("/", summary="Health Check", tags=["Health"])
+    def health_check():
+        return {"message": f"{label} module service", "methods": list(methods)}
+
+    @app.get("/ready", summary="Readiness Probe", tags=["Health"])
+    def readiness():
+        modules = module_registry.readiness([name])
+        ready = modules[name]["state"] in ("ready", "disabled")
+        return JSONResponse({"ready": ready, "modules": modules}, status_code=200 if ready else 503)
+
+    @app.get("/metrics", summary="Prometheus Metrics", tags=["Health"])
+    def prometheus_metrics():
+        if not metrics.enabled:
+            raise HTTPException(status_code=501, detail="Metrics are disabled, prometheus_client is not installed.")
+        return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+    @app.post("/call/{method}", summary="Call a Module Method", tags=["Module"])
+    async def call(method: str, request: CallRequest, http_request: Request):
+        module, func, endpoint = await resolve(method)
+        if method.endswith("_stream"):
+            return stream_response(module, method, func, endpoint, request.args)
+
+        token = CancellationToken()
+        task = asyncio.ensure_future(run(module, method, func, endpoint, request.args, token))
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=disconnect_poll_interval)
+                if not task.done() and await http_request.is_disconnected():
+                    logger.info(f"Gateway disconnected, cancelling {name}.{method} call.")
+                    token.cancel("client disconnected")
+                    task.cancel()
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                    raise HTTPException(status_code=499, detail="Client Closed Request")
+            result = task.result()
+        except PoolRejectedError as e:
+            metrics.record_error(endpoint, e)
+            raise HTTPException(status_code=e.status_code, detail=f"Service busy: {e.reason}.",
+                                headers={"Retry-After": str(e.retry_after)})
+        except GenerationCancelled:
+            raise HTTPException(status_code=499, detail="Client Closed Request")
+        except HTTPException:
+            raise
+        except Exception as e:
+            metrics.record_error(endpoint, e)
+            logger.error(f"Error calling {name}.{method}: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        # Module results are not always plain JSON types (e.g. agent message objects).
+        return Response(json.dumps({"result": result}, default=str), media_type="application/json")
+
+    return app
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in SERVICE_METHODS:
+        sys.exit(f"Usage: python -m app.module_service <{'|'.join(SERVICE_METHODS)}>")
+    import uvicorn
+    name = sys.argv[1]
+    config = Config()
+    logger = Logger()
+    logger.info(f"Starting {MODULES[name][2]} module service on: {config.server_name}:{config.server_port}.")
+    uvicorn.run(create_app(name, config, logger), host=config.server_name, port=config.server_port)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ from pydantic import BaseModel, Field
 from llama_cpp_agent import LlamaCppAgent, MessagesFormatterType
 from llama_cpp_agent.chat_history import BasicChatHistory
 from app.modules.base_module import BaseModule
+from app.modules.async_agent import AsyncAgent
+from app.modules.cancellation import raise_if_cancelled
+from app.modules.tracing import traced, span
 
 class ReflectionState(Enum):
     approved = "approved"
@@ -20,40 +23,82 @@ class AgenticReflectionModule(BaseModule):
     def __init__(self, config, logger):
         super().__init__(config, logger, ["llama_cpp_agent"])
         if self.dependencies_available:
-            self.provider = self._initialize_provider(config.default_llm_settings)
-            self.chat_history = BasicChatHistory(k=35)
+            self.provider = self._initialize_provider(task="reflection")
+            # The critique is a cheap classification step and can run on a smaller model.
+            self.critique_provider = self._initialize_provider(task="reflection_critique")
 
-            self.generator_agent = LlamaCppAgent(
-                self.provider,
-                debug_output=True,
-                system_prompt="You are a misinformed AI agent.",
-                predefined_messages_formatter_type=MessagesFormatterType.MISTRAL,
-                chat_history=self.chat_history
-            )
-
-            self.reflection_agent = LlamaCppAgent(
-                self.provider,
-                system_prompt="Your task is to analyze, provide feedback and critique on an AI agent's latest response to a user in an ongoing conversation. You then decide if the latest response is approved or rejected.",
-                debug_output=True,
-                predefined_messages_formatter_type=MessagesFormatterType.MISTRAL
-            )
+    def _agents(self):
+        """
+        A generator and a reflection agent with their own chat histories. Every call gets
+        its own, as the module is shared by the API and the chat tools and calls run
+        concurrently.
+        """
+        generator_agent = LlamaCppAgent(
+            self.provider,
+            debug_output=True,
+            system_prompt="You are a misinformed AI agent.",
+            predefined_messages_formatter_type=MessagesFormatterType.MISTRAL,
+            chat_history=BasicChatHistory(k=35)
+        )
+        reflection_agent = LlamaCppAgent(
+            self.critique_provider,
+            system_prompt="Your task is to analyze, provide feedback and critique on an AI agent's latest response to a user in an ongoing conversation. You then decide if the latest response is approved or rejected.",
+            debug_output=True,
+            predefined_messages_formatter_type=MessagesFormatterType.MISTRAL,
+            chat_history=BasicChatHistory()
+        )
+        return generator_agent, reflection_agent
 
+    @traced("reflection.get_reflective_response")
     def get_reflective_response(self, input_message: str):
+        generator_agent, reflection_agent = self._agents()
+        approved = False
+        iteration = 0
+        while not approved:
+            iteration += 1
+            with span("reflection.iteration", iteration=iteration) as iteration_span:
+                raise_if_cancelled()
+                generator_agent.get_chat_response(input_message)
+                messages = generator_agent.chat_history.get_chat_messages()
+                ctx = ""
+                for message in messages:
+                    ctx += f"{json.dumps(message, indent=2)}\n\n"
+
+                raise_if_cancelled()
+                reflection_response = reflection_agent.get_chat_response(ctx)
+                reflection_data = json.loads(reflection_response)
+                iteration_span.set_attribute("response_state", reflection_data["response_state"])
+
+                if reflection_data["response_state"] == ReflectionState.approved.value:
+                    approved = True
+
+        return generator_agent.chat_history.get_latest_message().content
+
+    @traced("reflection.get_reflective_response")
+    async def aget_reflective_response(self, input_message: str):
+        generator_agent, reflection_agent = self._agents()
+        # Not cached by _async_agent, the agents only live for this call.
+        async_generator_agent = AsyncAgent(generator_agent, self._async_provider_for(generator_agent.provider))
+        async_reflection_agent = AsyncAgent(reflection_agent, self._async_provider_for(reflection_agent.provider))
         approved = False
+        iteration = 0
         while not approved:
-            self.generator_agent.get_chat_response(input_message)
-            messages = self.generator_agent.chat_history.get_chat_messages()
-            ctx = ""
-            for message in messages:
-                ctx += f"{json.dumps(message, indent=2)}\n\n"
+            iteration += 1
+            with span("reflection.iteration", iteration=iteration) as iteration_span:
+                await async_generator_agent.get_chat_response(input_message)
+                messages = generator_agent.chat_history.get_chat_messages()
+                ctx = ""
+                for message in messages:
+                    ctx += f"{json.dumps(message, indent=2)}\n\n"
 
-            reflection_response = self.reflection_agent.get_chat_response(ctx)
-            reflection_data = json.loads(reflection_response)
+                reflection_response = await async_reflection_agent.get_chat_response(ctx)
+                reflection_data = json.loads(reflection_response)
+                iteration_span.set_attribute("response_state", reflection_data["response_state"])
 
-            if reflection_data["response_state"] == ReflectionState.approved.value:
-                approved = True
+                if reflection_data["response_state"] == ReflectionState.approved.value:
+                    approved = True
 
-        return self.generator_agent.chat_history.get_latest_message().content
+        return generator_agent.chat_history.get_latest_message().content
 
 # Example usage
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import requests
+from app.modules.tracing import traced
 from srt_core.config import Config
 from srt_core.utils.logger import Logger
 
@@ -7,6 +8,7 @@ class APIModule:
         self.config = config
         self.logger = logger
 
+    @traced("api.fetch_data")
     def fetch_data(self, url):
         try:
             response = requests.get(url)
@@ -16,6 +18,36 @@ class APIModule:
             self.logger.error(f"Failed to fetch data from {url}: {e}")
             return None
 
+    def supports_async(self):
+        try:
+            import httpx  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    @traced("api.fetch_data")
+    async def afetch_data(self, url):
+        import httpx
+        from app.modules.async_provider import connection_pool
+        client = connection_pool.get_client("api_module")
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            # ValueError: the body is not JSON, which requests reports as a RequestException.
+            self.logger.error(f"Failed to fetch data from {url}: {e}")
+            return None
+
+    @traced("api.fetch_data_list")
+    async def afetch_data_list(self, url):
+        data = await self.afetch_data(url)
+        if data:
+            return [item for item in data]
+        else:
+            return []
+
+    @traced("api.fetch_data_list")
     def fetch_data_list(self, url):
         data = self.fetch_data(url)
         if data:
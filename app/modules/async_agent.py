@@ -0,0 +1,165 @@
+import asyncio
+from copy import copy, deepcopy
+from llama_cpp_agent.chat_history.messages import Roles
+from llama_cpp_agent.llm_output_settings import LlmStructuredOutputSettings, LlmStructuredOutputType
+from llama_cpp_agent.llm_prompt_template import PromptTemplate
+from app.modules.tracing import span
+
+
+class DeferredCompletion:
+    def __init__(self, prompt, structured_output_settings, settings, bos_token):
+        self.prompt = prompt
+        self.structured_output_settings = structured_output_settings
+        self.settings = settings
+        self.bos_token = bos_token
+
+
+class DeferredCompletionProvider:
+    """
+    Stands in for an agent's provider while building a prompt: everything is delegated
+    to the real provider except the completion itself, which is captured instead of sent.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def create_completion(self, prompt, structured_output_settings, settings, bos_token):
+        return DeferredCompletion(prompt, structured_output_settings, settings, bos_token)
+
+
+class AsyncAgent:
+    """
+    Async variant of LlamaCppAgent.get_chat_response. The wrapped agent still builds the
+    prompt (system prompt, chat history, structured output documentation), only the
+    generation goes through an async provider.
+    """
+
+    FUNCTION_CALLING_TYPES = (
+        LlmStructuredOutputType.function_calling,
+        LlmStructuredOutputType.parallel_function_calling,
+    )
+
+    def __init__(self, agent, async_provider):
+        self.agent = agent
+        self.async_provider = async_provider
+        self.prompt_agent = copy(agent)
+        self.prompt_agent.provider = DeferredCompletionProvider(agent.provider)
+
+    async def get_chat_response(
+            self,
+            message=None,
+            role=Roles.user,
+            prompt_suffix=None,
+            chat_history=None,
+            system_prompt=None,
+            add_message_to_chat_history=True,
+            add_response_to_chat_history=True,
+            structured_output_settings=None,
+            llm_sampling_settings=None,
+    ):
+        if chat_history is None:
+            chat_history = self.agent.chat_history
+        if structured_output_settings is None:
+            structured_output_settings = LlmStructuredOutputSettings(
+                output_type=LlmStructuredOutputType.no_structured_output
+            )
+        if llm_sampling_settings is None:
+            llm_sampling_settings = self.agent.provider.get_provider_default_settings()
+        else:
+            llm_sampling_settings = deepcopy(llm_sampling_settings)
+        if llm_sampling_settings.get_additional_stop_sequences() is not None:
+            llm_sampling_settings.add_additional_stop_sequences(
+                self.agent.messages_formatter.default_stop_sequences
+            )
+
+        deferred, response_role = self.prompt_agent.get_response_role_and_completion(
+            message=message,
+            chat_history=chat_history,
+            system_prompt=system_prompt,
+            add_message_to_chat_history=add_message_to_chat_history,
+            role=role,
+            prompt_suffix=prompt_suffix,
+            structured_output_settings=structured_output_settings,
+            llm_sampling_settings=llm_sampling_settings,
+        )
+        text = await self.async_provider.create_completion(
+            deferred.prompt, structured_output_settings, llm_sampling_settings
+        )
+
+        eos_token = self.agent.messages_formatter.eos_token
+        if text.strip().endswith(eos_token):
+            text = text.replace(eos_token, "")
+        if prompt_suffix:
+            text = prompt_suffix + text
+        self.agent.last_response = text
+        if add_response_to_chat_history:
+            chat_history.add_message({"role": response_role, "content": text})
+
+        if structured_output_settings.output_type in self.FUNCTION_CALLING_TYPES:
+            # Function calls run the (blocking) tools, keep them off the event loop.
+            return await asyncio.to_thread(
+                structured_output_settings.handle_structured_output,
+                text, prompt_suffix=prompt_suffix, provider=self.agent.provider
+            )
+        return structured_output_settings.handle_structured_output(
+            text, prompt_suffix=prompt_suffix, provider=self.agent.provider
+        )
+
+    async def run_chain(self, chain_elements, additional_fields=None, before_element=None):
+        """Async variant of AgentChain.run_chain for chains without function tools."""
+        outputs = dict(additional_fields or {})
+        for element in chain_elements:
+            if before_element is not None:
+                before_element(element)
+            sys_prompt = PromptTemplate.from_string(element.system_prompt).generate_prompt(outputs)
+            prompt = PromptTemplate.from_string(element.prompt).generate_prompt(outputs)
+            if element.preprocessor is not None:
+                sys_prompt, prompt, outputs = element.preprocessor(sys_prompt, prompt, outputs)
+            with span("agent_chain.element", output=element.output_identifier):
+                outputs[element.output_identifier] = await self.get_chat_response(
+                    prompt,
+                    system_prompt=sys_prompt,
+                    structured_output_settings=element.structured_output_settings,
+                    add_response_to_chat_history=element.add_response_to_chat_history,
+                    add_message_to_chat_history=element.add_prompt_to_chat_history,
+                    llm_sampling_settings=element.llm_sampling_settings,
+                )
+        output = "\n".join([val if isinstance(val, str) else str(val) for val in outputs.values()])
+        return output, outputs
+
+    async def generate_function_calling_response(self, message, structured_output_settings, llm_sampling_settings=None):
+        """
+        Async variant of FunctionCallingAgent.generate_response, to be used on the
+        function calling agent's inner LlamaCppAgent.
+        """
+        self.agent.add_message(role=Roles.user, message=message)
+        result = await self.get_chat_response(
+            structured_output_settings=structured_output_settings, llm_sampling_settings=llm_sampling_settings
+        )
+        while not isinstance(result, str):
+            if result is None:
+                break
+            function_message = "Function Calling Results:\n\n"
+            agent_sent_message = False
+            for count, res in enumerate(result, start=1):
+                if isinstance(res, str):
+                    function_message += f"{count}. " + res + "\n\n"
+                    continue
+                if res["function"] == "send_message":
+                    agent_sent_message = True
+                if "params" in res:
+                    function_message += f"""{count}. Function: "{res["function"]}"\nArguments: "{res["params"]}"\nReturn Value: {res["return_value"]}\n\n"""
+                else:
+                    function_message += f"""{count}. Function: "{res["function"]}"\nReturn Value: {res["return_value"]}\n\n"""
+            self.agent.add_message(role=Roles.tool, message=function_message.strip())
+            if agent_sent_message:
+                break
+            result = await self.get_chat_response(
+                structured_output_settings=structured_output_settings, llm_sampling_settings=llm_sampling_settings
+            )
+        return result
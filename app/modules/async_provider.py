@@ -0,0 +1,296 @@
+import abc
+import asyncio
+import json
+import os
+import threading
+import time
+from copy import deepcopy
+from app.modules.cancellation import cancellation_stats
+from app.modules.metrics import metrics, estimate_tokens
+from app.modules.tracing import tracer
+from app.modules.rate_limiter import record_usage
+
+
+class AsyncConnectionPool:
+    """
+    Process-wide registry of keep-alive HTTP clients, one per backend URL, shared by
+    every async provider talking to that backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._pid = os.getpid()
+
+    def get_client(self, base_url, max_connections=100, max_keepalive_connections=20, http2=False, timeout=600,
+                   connect_timeout=10.0):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Clients created before a fork belong to the master process.
+                self._clients = {}
+                self._pid = os.getpid()
+            client = self._clients.get(base_url)
+            if client is None:
+                import httpx
+                if http2:
+                    try:
+                        import h2  # noqa: F401
+                    except ImportError:
+                        http2 = False
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=max_connections,
+                        max_keepalive_connections=max_keepalive_connections,
+                    ),
+                    timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                    http2=http2,
+                )
+                self._clients[base_url] = client
+            return client
+
+    async def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+connection_pool = AsyncConnectionPool()
+
+
+def _is_structured(structured_output_settings):
+    return (structured_output_settings is not None
+            and structured_output_settings.output_type.name != "no_structured_output")
+
+
+class AsyncLlmProvider(abc.ABC):
+    """
+    Async counterpart of a llama-cpp-agent provider. It reuses the synchronous provider
+    for endpoints and generation settings and only replaces the HTTP transport.
+    """
+
+    def __init__(self, provider, client, api_key=None):
+        self.provider = provider
+        self.client = client
+        self.api_key = api_key
+        self.model_name = "unknown"
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    @abc.abstractmethod
+    def _completion_url(self, stream):
+        pass
+
+    @abc.abstractmethod
+    def _request_body(self, prompt, structured_output_settings, settings, stream):
+        pass
+
+    @abc.abstractmethod
+    def _parse_response(self, data):
+        pass
+
+    @abc.abstractmethod
+    def _parse_stream_chunk(self, data):
+        pass
+
+    async def create_completion(self, prompt, structured_output_settings, settings):
+        body = self._request_body(prompt, structured_output_settings, settings, stream=False)
+        llm_span = tracer.start_span("llm.completion", model=self.model_name, stream=False)
+        started = time.monotonic()
+        try:
+            response = await self.client.post(self._completion_url(False), headers=self._headers(), json=body)
+            response.raise_for_status()
+            text = self._parse_response(response.json())
+        except BaseException as e:
+            llm_span.end(e)
+            raise
+        elapsed = time.monotonic() - started
+        metrics.observe_first_token(self.model_name, elapsed)
+        metrics.observe_generation(self.model_name, elapsed, estimate_tokens(prompt), estimate_tokens(text))
+        record_usage(estimate_tokens(prompt), estimate_tokens(text))
+        llm_span.end()
+        return text
+
+    async def stream_completion(self, prompt, structured_output_settings, settings):
+        body = self._request_body(prompt, structured_output_settings, settings, stream=True)
+        generated = 0
+        llm_span = tracer.start_span("llm.completion", model=self.model_name, stream=True)
+        error = None
+        started = time.monotonic()
+        try:
+            async with self.client.stream("POST", self._completion_url(True), headers=self._headers(), json=body) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    line = line.strip()
+                    if not line or not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    text = self._parse_stream_chunk(json.loads(payload))
+                    if text:
+                        if generated == 0:
+                            metrics.observe_first_token(self.model_name, time.monotonic() - started)
+                        generated += 1
+                        yield text
+        except asyncio.CancelledError:
+            # Leaving the stream context closes the connection, so the backend aborts.
+            max_tokens = getattr(settings, "max_tokens", None) or getattr(settings, "n_predict", None) or 0
+            cancellation_stats.record(max(max_tokens - generated, 0) if max_tokens > 0 else 0)
+            error = asyncio.CancelledError("cancelled")
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            metrics.observe_generation(self.model_name, time.monotonic() - started, estimate_tokens(prompt), generated)
+            record_usage(estimate_tokens(prompt), generated)
+            llm_span.set_attribute("generated_tokens", generated)
+            llm_span.end(error)
+
+
+class AsyncVLLMServerProvider(AsyncLlmProvider):
+    def __init__(self, provider, client, base_url, model, api_key=None):
+        super().__init__(provider, client, api_key)
+        self.completion_endpoint = base_url.rstrip("/") + "/completions"
+        self.model = model
+
+    def _completion_url(self, stream):
+        return self.completion_endpoint
+
+    def _request_body(self, prompt, structured_output_settings, settings, stream):
+        body = deepcopy(settings.as_dict())
+        body["model"] = self.model
+        body["prompt"] = prompt
+        body["stream"] = stream
+        if _is_structured(structured_output_settings):
+            body["guided_json"] = structured_output_settings.get_json_schema()
+        return body
+
+    def _parse_response(self, data):
+        return data["choices"][0]["text"]
+
+    def _parse_stream_chunk(self, data):
+        choices = data.get("choices") or []
+        return choices[0].get("text") if choices else None
+
+
+class AsyncLlamaCppServerProvider(AsyncLlmProvider):
+    def _completion_url(self, stream):
+        return self.provider.server_completion_endpoint
+
+    def _request_body(self, prompt, structured_output_settings, settings, stream):
+        body = deepcopy(settings.as_dict())
+        body["prompt"] = prompt
+        body["stream"] = stream
+        return self.provider.prepare_generation_settings(body, structured_output_settings)
+
+    def _parse_response(self, data):
+        if "choices" in data:
+            return data["choices"][0]["text"]
+        return data["content"]
+
+    def _parse_stream_chunk(self, data):
+        if "choices" in data:
+            return data["choices"][0].get("text")
+        return data.get("content")
+
+
+class AsyncTGIServerProvider(AsyncLlmProvider):
+    def _completion_url(self, stream):
+        # TGI serves streaming generation on its own endpoint.
+        if stream:
+            return self.provider.server_streaming_completion_endpoint
+        return self.provider.server_completion_endpoint
+
+    def _request_body(self, prompt, structured_output_settings, settings, stream):
+        parameters = deepcopy(settings.as_dict())
+        parameters.pop("stream", None)
+        if _is_structured(structured_output_settings):
+            parameters["grammar"] = {"type": "json", "value": structured_output_settings.get_json_schema()}
+        return {"parameters": parameters, "inputs": prompt}
+
+    def _parse_response(self, data):
+        return data["generated_text"]
+
+    def _parse_stream_chunk(self, data):
+        token = data.get("token") or {}
+        if token.get("special"):
+            return None
+        return token.get("text")
+
+
+class AsyncPooledProvider:
+    """Routes async completions through the BackendPool of a PooledProvider."""
+
+    def __init__(self, pool, providers):
+        self.pool = pool
+        self.providers = providers
+
+    async def create_completion(self, prompt, structured_output_settings, settings):
+        return await self.pool.call_async(
+            lambda backend: self.providers[backend.url].create_completion(prompt, structured_output_settings, settings)
+        )
+
+    async def stream_completion(self, prompt, structured_output_settings, settings):
+        chunks = self.pool.stream_async(
+            lambda backend: self.providers[backend.url].stream_completion(prompt, structured_output_settings, settings)
+        )
+        async for text in chunks:
+            yield text
+
+
+def _backend_limits(config, url):
+    settings = config.config.get("async_providers", {}) or {}
+    limits = {
+        "max_connections": settings.get("max_connections", 100),
+        "max_keepalive_connections": settings.get("max_keepalive_connections", 20),
+        "http2": settings.get("http2", False),
+        "timeout": settings.get("timeout", 600),
+    }
+    for llm_config in (config.config.get("llms", {}) or {}).values():
+        if llm_config.get("url") == url:
+            for key in ("max_connections", "max_keepalive_connections", "http2"):
+                if key in llm_config:
+                    limits[key] = llm_config[key]
+    return limits
+
+
+def create_async_provider(provider, llm_settings, config):
+    """
+    Builds the async provider matching a synchronous llama-cpp-agent provider, or
+    returns None for backends without an async implementation (e.g. llama_cpp_python).
+    """
+    # Unwrap the cancellation/metrics wrappers down to the llama-cpp-agent provider (or pool).
+    while hasattr(provider, "provider"):
+        provider = provider.provider
+    pool = getattr(provider, "pool", None)
+    if pool is not None:
+        providers = {
+            backend.url: create_async_provider(backend.provider, {**llm_settings, "url": backend.url, "urls": None}, config)
+            for backend in pool.backends
+        }
+        if any(async_provider is None for async_provider in providers.values()):
+            return None
+        return AsyncPooledProvider(pool, providers)
+
+    provider_type = llm_settings["agent_provider"]
+    url = llm_settings["url"]
+    client = connection_pool.get_client(url, **_backend_limits(config, url))
+
+    if provider_type == "vllm_server":
+        api_key = llm_settings.get("api_key") or config.openai_compatible_api_key
+        async_provider = AsyncVLLMServerProvider(provider, client, url, llm_settings["huggingface"], api_key)
+    elif provider_type in ("llama_cpp_server", "llama_cpp_python_server"):
+        async_provider = AsyncLlamaCppServerProvider(provider, client, getattr(provider, "api_key", None))
+    elif provider_type == "tgi_server":
+        async_provider = AsyncTGIServerProvider(provider, client, getattr(provider, "api_key", None))
+    else:
+        return None
+    async_provider.model_name = llm_settings["huggingface"]
+    return async_provider
@@ -0,0 +1,561 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from app.modules.cancellation import GenerationCancelled
+from app.modules.worker_pool import configured_max_workers
+
+
+class NoBackendAvailableError(Exception):
+    """Raised when every backend of a pool is unhealthy or has an open circuit."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. Once `reset_timeout` seconds
+    have passed a single trial request is let through (half-open); it closes the
+    circuit on success and re-opens it on failure.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allows_request(self):
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial_in_flight)
+
+    def on_request(self):
+        if self.state == "half_open":
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+
+class Backend:
+    def __init__(self, url, provider, breaker, health_url=None):
+        self.url = url
+        self.provider = provider
+        self.breaker = breaker
+        self.health_url = health_url
+        self.healthy = True
+        self.outstanding = 0
+        # Exponentially weighted moving average of request latency in seconds.
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+
+    def record_latency(self, elapsed, alpha=0.2):
+        self.latency = elapsed if self.latency is None else (1 - alpha) * self.latency + alpha * elapsed
+
+
+class HedgePolicy:
+    """
+    Decides when to send a duplicate (hedged) request to a second backend.
+
+    The hedge delay is the given percentile of recent latency samples, clamped to
+    [min_delay, max_delay]; until `min_samples` are collected `initial_delay` is used.
+    Streaming calls are timed to their first token and non-streaming calls to their full
+    answer, in separate windows. At most `max_hedge_ratio` of all requests are hedged.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.05, max_delay=10.0, initial_delay=2.0,
+                 window=500, min_samples=20, max_hedge_ratio=0.1):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self._lock = threading.Lock()
+        # Time to first token of streams (True) and time to answer of other calls (False).
+        self._latencies = {True: deque(maxlen=window), False: deque(maxlen=window)}
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record_latency(self, seconds, streaming=True):
+        with self._lock:
+            self._latencies[streaming].append(seconds)
+
+    def delay(self, streaming=True):
+        with self._lock:
+            samples = sorted(self._latencies[streaming])
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return min(max(samples[index], self.min_delay), self.max_delay)
+
+    def within_budget(self):
+        with self._lock:
+            return self.hedged < self.max_hedge_ratio * max(self.requests, 1)
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedged += 1
+
+    def record_winner(self, hedge_won):
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            "delay": self.delay(),
+            "completion_delay": self.delay(streaming=False),
+        }
+
+
+class BackendPool:
+    """
+    Spreads the requests of one logical model over several backend URLs.
+
+    Requests go to the available backend with the fewest outstanding requests
+    (`least_outstanding`) or with the lowest latency-weighted load (`latency`). Backends
+    failing their health probe or with an open circuit are skipped, and a request that
+    fails is retried once on every other available backend before the error is raised.
+    """
+
+    ROUTING_STRATEGIES = ("least_outstanding", "latency")
+
+    def __init__(self, name, backends, logger, routing="least_outstanding", hedging=None, max_concurrency=64):
+        if routing not in self.ROUTING_STRATEGIES:
+            raise ValueError(f"Unsupported routing strategy: {routing}")
+        self.name = name
+        self.backends = backends
+        self.logger = logger
+        self.routing = routing
+        self.hedging = hedging
+        # Hedged requests run their attempts side by side, off the calling thread: every call
+        # in flight (`max_concurrency`) may need a thread for its request and one for its hedge.
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2,
+                                            thread_name_prefix=f"hedge-{name}") if hedging else None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def _load(self, backend):
+        latency = backend.latency or 0.0
+        if self.routing == "latency":
+            return latency * (backend.outstanding + 1), backend.outstanding
+        return backend.outstanding, latency
+
+    def _acquire(self, tried):
+        with self._lock:
+            candidates = [b for b in self.backends
+                          if b not in tried and b.healthy and b.breaker.allows_request()]
+            if not candidates:
+                raise NoBackendAvailableError(f"No backend available for {self.name}.")
+            backend = min(candidates, key=self._load)
+            backend.breaker.on_request()
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend, started, error=None):
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                backend.record_latency(time.monotonic() - started)
+                backend.breaker.record_success()
+            elif isinstance(error, GenerationCancelled):
+                backend.breaker.trial_in_flight = False
+            else:
+                backend.failures += 1
+                backend.breaker.record_failure()
+
+    def _failover(self, backend, error, tried):
+        tried.add(backend)
+        self.logger.warning(f"Backend {backend.url} of {self.name} failed: {error}. "
+                            f"Circuit is {backend.breaker.state}.")
+
+    def _start(self, func, backend, streaming):
+        # Returns once the backend has answered, or for streams produced its first chunk.
+        started = time.monotonic()
+        try:
+            result = func(backend.provider)
+            if streaming:
+                chunks = iter(result)
+                result = next(chunks, None), chunks
+        except Exception as e:
+            self._release(backend, started, e)
+            raise
+        if self.hedging is not None:
+            self.hedging.record_latency(time.monotonic() - started, streaming)
+        return started, result
+
+    def _finish(self, backend, started, result, streaming):
+        if streaming:
+            first, chunks = result
+            return self._tracked_stream(backend, started, first, chunks)
+        self._release(backend, started)
+        return result
+
+    def _discard(self, backend, future):
+        # The losing stream of a hedge: close it so the backend stops generating.
+        if future.cancelled() or future.exception() is not None:
+            return
+        started, (first, chunks) = future.result()
+        if hasattr(chunks, "close"):
+            chunks.close()
+        self._release(backend, started, GenerationCancelled("lost hedge"))
+
+    def call(self, func, streaming=False):
+        """
+        Run `func(provider)` on the selected backend. For streaming calls the first chunk
+        is read before returning so connection errors still fail over.
+
+        Only streaming calls are hedged: a blocking non-streaming request cannot be stopped
+        once sent, so a hedge would have both backends generate the full answer.
+        """
+        tried = set()
+        last_error = None
+        while len(tried) < len(self.backends):
+            try:
+                backend = self._acquire(tried)
+            except NoBackendAvailableError:
+                break
+            try:
+                if self.hedging is not None and streaming:
+                    backend, started, result = self._hedged_start(func, backend, streaming, tried)
+                else:
+                    started, result = self._start(func, backend, streaming)
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                if backend not in tried:
+                    self._failover(backend, e, tried)
+                last_error = e
+                continue
+            return self._finish(backend, started, result, streaming)
+        raise last_error or NoBackendAvailableError(f"No backend available for {self.name}.")
+
+    def _hedged_start(self, func, primary, streaming, tried):
+        futures = {self._submit(func, primary, streaming): primary}
+        done, _ = wait(futures, timeout=self.hedging.delay(streaming))
+        hedge = self._hedge_backend(done, primary, tried)
+        if hedge is not None:
+            futures[self._submit(func, hedge, streaming)] = hedge
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend = futures[future]
+                try:
+                    started, result = future.result()
+                except Exception as e:
+                    if isinstance(e, GenerationCancelled):
+                        for other in pending:
+                            other.add_done_callback(functools.partial(self._discard, futures[other]))
+                        raise
+                    self._failover(backend, e, tried)
+                    error = e
+                    continue
+                for other in pending | (done - {future}):
+                    other.add_done_callback(functools.partial(self._discard, futures[other]))
+                if hedge is not None:
+                    self.hedging.record_winner(backend is hedge)
+                return backend, started, result
+        raise error
+
+    def _submit(self, func, backend, streaming):
+        # Copy the caller's context so the cancellation token follows the request.
+        return self._executor.submit(contextvars.copy_context().run, self._start, func, backend, streaming)
+
+    def _hedge_backend(self, done, primary, tried):
+        self.hedging.record_request()
+        if done or not self.hedging.within_budget():
+            return None
+        try:
+            hedge = self._acquire(tried | {primary})
+        except NoBackendAvailableError:
+            return None
+        self.hedging.record_hedge()
+        self.logger.debug(f"Hedging {self.name} request from {primary.url} to {hedge.url}.")
+        return hedge
+
+    def _tracked_stream(self, backend, started, first, chunks):
+        error = None
+        try:
+            if first is not None:
+                yield first
+            for chunk in chunks:
+                yield chunk
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else GenerationCancelled("stream closed")
+            raise
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self._release(backend, started, error)
+
+    async def _start_async(self, func, backend, streaming):
+        started = time.monotonic()
+        chunks = None
+        try:
+            if streaming:
+                chunks = func(backend)
+                try:
+                    result = await chunks.__anext__(), chunks
+                except StopAsyncIteration:
+                    result = None, chunks
+            else:
+                result = await func(backend)
+        except BaseException as e:
+            if chunks is not None:
+                await chunks.aclose()
+            # Task cancellation means the client (or a won hedge) went away, not a backend failure.
+            self._release(backend, started, e if isinstance(e, Exception) else GenerationCancelled("cancelled"))
+            raise
+        if self.hedging is not None:
+            self.hedging.record_latency(time.monotonic() - started, streaming)
+        if not streaming:
+            self._release(backend, started)
+        return started, result
+
+    async def _call_async(self, func, streaming):
+        tried = set()
+        last_error = None
+        while len(tried) < len(self.backends):
+            try:
+                backend = self._acquire(tried)
+            except NoBackendAvailableError:
+                break
+            try:
+                if self.hedging is not None:
+                    backend, started, result = await self._hedged_start_async(func, backend, streaming, tried)
+                else:
+                    started, result = await self._start_async(func, backend, streaming)
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                if backend not in tried:
+                    self._failover(backend, e, tried)
+                last_error = e
+                continue
+            return backend, started, result
+        raise last_error or NoBackendAvailableError(f"No backend available for {self.name}.")
+
+    async def _hedged_start_async(self, func, primary, streaming, tried):
+        tasks = {asyncio.ensure_future(self._start_async(func, primary, streaming)): primary}
+        hedge = None
+        try:
+            # A non-streaming loser is cancelled with its task, which closes its connection.
+            done, _ = await asyncio.wait(tasks, timeout=self.hedging.delay(streaming))
+            hedge = self._hedge_backend(done, primary, tried)
+            if hedge is not None:
+                tasks[asyncio.ensure_future(self._start_async(func, hedge, streaming))] = hedge
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    backend = tasks[task]
+                    try:
+                        started, result = task.result()
+                    except GenerationCancelled:
+                        raise
+                    except Exception as e:
+                        self._failover(backend, e, tried)
+                        error = e
+                        continue
+                    for other in done - {task}:
+                        await self._discard_async(tasks[other], other, streaming)
+                    if hedge is not None:
+                        self.hedging.record_winner(backend is hedge)
+                    return backend, started, result
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _discard_async(self, backend, task, streaming):
+        if task.cancelled() or task.exception() is not None or not streaming:
+            return
+        started, (first, chunks) = task.result()
+        await chunks.aclose()
+        self._release(backend, started, GenerationCancelled("lost hedge"))
+
+    async def call_async(self, func):
+        """Async counterpart of `call` for coroutine functions `func(backend)`."""
+        backend, started, result = await self._call_async(func, streaming=False)
+        return result
+
+    async def stream_async(self, func):
+        """
+        Async counterpart of a streaming `call`: `func(backend)` returns an async iterator,
+        which fails over until its first chunk has been received.
+        """
+        backend, started, (first, chunks) = await self._call_async(func, streaming=True)
+        error = None
+        try:
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else GenerationCancelled("stream closed")
+            raise
+        finally:
+            await chunks.aclose()
+            self._release(backend, started, error)
+
+    def check_health(self, timeout=2):
+        for backend in self.backends:
+            if not backend.health_url:
+                continue
+            try:
+                # Any answer below 500 (including 401 from a key-protected server) means it is up.
+                healthy = requests.get(backend.health_url, timeout=timeout).status_code < 500
+            except requests.exceptions.RequestException:
+                healthy = False
+            if healthy != backend.healthy:
+                self.logger.info(f"Backend {backend.url} of {self.name} is now "
+                                 f"{'healthy' if healthy else 'unhealthy'}.")
+            backend.healthy = healthy
+
+    def start_health_checks(self, interval=10, timeout=2):
+        def run():
+            while not self._stop.wait(interval):
+                self.check_health(timeout)
+
+        def start():
+            self._health_thread = threading.Thread(target=run, name=f"health-{self.name}", daemon=True)
+            self._health_thread.start()
+
+        start()
+        # Threads do not survive fork: restart the checks in every preforked API worker.
+        os.register_at_fork(after_in_child=start)
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return [
+            {
+                "url": backend.url,
+                "healthy": backend.healthy,
+                "circuit": backend.breaker.state,
+                "outstanding": backend.outstanding,
+                "latency": backend.latency,
+                "requests": backend.requests,
+                "failures": backend.failures,
+            }
+            for backend in self.backends
+        ]
+
+
+class PooledProvider:
+    """
+    Provider facade over a BackendPool. Completions are routed through the pool, every
+    other attribute (default settings, tokenizer, identifier) comes from the first backend.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        if name == "pool":
+            raise AttributeError(name)
+        return getattr(self.pool.backends[0].provider, name)
+
+    def create_completion(self, prompt, structured_output_settings, settings, bos_token):
+        return self.pool.call(
+            lambda provider: provider.create_completion(prompt, structured_output_settings, settings, bos_token),
+            streaming=settings.is_streaming(),
+        )
+
+    def create_chat_completion(self, messages, structured_output_settings, settings):
+        return self.pool.call(
+            lambda provider: provider.create_chat_completion(messages, structured_output_settings, settings),
+            streaming=settings.is_streaming(),
+        )
+
+
+def health_url(agent_provider, url):
+    url = url.rstrip("/")
+    if agent_provider == "vllm_server":
+        # OpenAI compatible servers answer on /models once the model is loaded.
+        return f"{url}/models"
+    if agent_provider in ("llama_cpp_server", "llama_cpp_python_server", "tgi_server"):
+        if url.endswith("/v1"):
+            url = url[:-len("/v1")]
+        return f"{url}/health"
+    return None
+
+
+# Every pool created by this process, by logical model name.
+backend_pools = {}
+
+
+def create_backend_pool(config, logger, llm_settings, providers):
+    """
+    Build the pool for an `llms` entry with several `urls`; `providers` maps each URL
+    to its provider. Settings come from the `load_balancing` section of config.yaml.
+    """
+    settings = config.config.get("load_balancing", {}) or {}
+    backends = [
+        Backend(
+            url,
+            provider,
+            CircuitBreaker(settings.get("failure_threshold", 3), settings.get("reset_timeout", 30)),
+            health_url(llm_settings["agent_provider"], url),
+        )
+        for url, provider in providers.items()
+    ]
+    name = llm_settings.get("server_name") or llm_settings["url"]
+    hedging_settings = settings.get("hedging", {}) or {}
+    hedging = None
+    if hedging_settings.get("enabled", False):
+        hedging = HedgePolicy(**{key: value for key, value in hedging_settings.items() if key != "enabled"})
+    # Calls reaching a pool run on worker pool threads unless configured otherwise.
+    max_concurrency = settings.get("max_concurrency") or configured_max_workers(config)
+    pool = BackendPool(name, backends, logger, settings.get("routing", "least_outstanding"), hedging,
+                       max_concurrency)
+    interval = settings.get("health_check_interval", 10)
+    if interval:
+        pool.start_health_checks(interval, settings.get("health_check_timeout", 2))
+    backend_pools[name] = pool
+    logger.info(f"Load balancing {name} over {len(backends)} backends ({pool.routing}"
+                f"{', hedged' if hedging else ''}).")
+    return pool
@@ -1,12 +1,9 @@
 from llama_cpp_agent import LlamaCppAgent, MessagesFormatterType
-from llama_cpp_agent.providers import (
-    LlamaCppServerProvider,
-    VLLMServerProvider,
-    TGIServerProvider,
-    LlamaCppPythonProvider,
-    #GroqProvider
-)
-from llama_cpp import Llama
+from app.modules.cancellable_provider import CancellableProvider
+from app.modules.instrumented_provider import InstrumentedProvider
+from app.modules.provider_registry import get_provider_registry
+from app.modules.backend_pool import PooledProvider, create_backend_pool
+from app.modules.async_agent import AsyncAgent
 
 class BaseModule:
     def __init__(self, config, logger, required_modules):
@@ -14,6 +11,8 @@ class BaseModule:
         self.logger = logger
         self.required_modules = required_modules
         self.dependencies_available = self._check_dependencies()
+        self.llm_settings = None
+        self._async_agents = {}
 
     def _check_dependencies(self):
         missing_modules = []
@@ -28,22 +27,72 @@ class BaseModule:
             return False
         return True
 
-    def _initialize_provider(self, llm_settings):
+    def _initialize_provider(self, llm_settings=None, task="default"):
+        # Providers are shared by every module that resolves to the same backend.
+        registry = get_provider_registry(self.config, self.logger)
+        if llm_settings is None:
+            llm_settings = registry.settings_for_task(task)
+            self.logger.info(f"Routing {task} task to LLM {registry.llm_name_for_task(task)}.")
+        if self.llm_settings is None:
+            self.llm_settings = llm_settings
+        return registry.get_provider(llm_settings, self._create_wrapped_provider)
+
+    def _create_wrapped_provider(self, llm_settings):
+        provider = InstrumentedProvider(self._create_provider(llm_settings), llm_settings["huggingface"])
+        return CancellableProvider(provider, self.logger)
+
+    @property
+    def async_provider(self):
+        return self._async_provider_for(self.provider)
+
+    def _async_provider_for(self, provider):
+        async_provider = get_provider_registry(self.config, self.logger).get_async_provider(provider)
+        if async_provider is None:
+            raise ValueError(f"Provider {provider.get_provider_identifier()} has no async implementation.")
+        return async_provider
+
+    def supports_async(self):
+        try:
+            return self.async_provider is not None
+        except (AttributeError, ValueError, ImportError):
+            return False
+
+    def _async_agent(self, agent):
+        async_agent = self._async_agents.get(id(agent))
+        if async_agent is None:
+            async_agent = AsyncAgent(agent, self._async_provider_for(agent.provider))
+            self._async_agents[id(agent)] = async_agent
+        return async_agent
+
+    def _create_provider(self, llm_settings):
+        if llm_settings.get("urls"):
+            providers = {
+                url: self._create_provider({**llm_settings, "url": url, "urls": None})
+                for url in llm_settings["urls"]
+            }
+            return PooledProvider(create_backend_pool(self.config, self.logger, llm_settings, providers))
+
         self.logger.info(f"Initializing provider with settings: {llm_settings}")
         provider_type = llm_settings["agent_provider"]
 
+        # Providers are imported when first used, so HTTP-only deployments never load llama_cpp models.
         if provider_type == "vllm_server":
+            from llama_cpp_agent.providers import VLLMServerProvider
             return VLLMServerProvider(
                 llm_settings["url"],
                 llm_settings["huggingface"],
                 llm_settings["huggingface"],
-                self.config.openai_compatible_api_key,
+                llm_settings.get("api_key") or self.config.openai_compatible_api_key,
             )
         elif provider_type == "llama_cpp_server":
+            from llama_cpp_agent.providers import LlamaCppServerProvider
             return LlamaCppServerProvider(llm_settings["url"])
         elif provider_type == "tgi_server":
+            from llama_cpp_agent.providers import TGIServerProvider
             return TGIServerProvider(server_address=llm_settings["url"])
         elif provider_type == "llama_cpp_python":
+            from llama_cpp import Llama
+            from llama_cpp_agent.providers import LlamaCppPythonProvider
             llama_model = Llama(
                 model_path=f"models/{llm_settings['filename']}",
                 flash_attn=True,
@@ -54,6 +103,7 @@ class BaseModule:
             )
             return LlamaCppPythonProvider(llama_model)
         #elif provider_type == "groq":
+        #    from llama_cpp_agent.providers import GroqProvider
         #    return GroqProvider(
         #        base_url=llm_settings["url"],
         #        model=llm_settings["model"],
@@ -61,6 +111,7 @@ class BaseModule:
         #        api_key=llm_settings["api_key"]
         #    )
         elif provider_type == "llama_cpp_python_server":
+            from llama_cpp_agent.providers import LlamaCppServerProvider
             return LlamaCppServerProvider(llm_settings["url"], llama_cpp_python_server=True)
         else:
             self.logger.error(f"Unsupported provider: {provider_type}")
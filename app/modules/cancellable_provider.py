@@ -0,0 +1,92 @@
+from copy import copy
+from llama_cpp_agent.providers.provider_base import LlmProvider
+from app.modules.cancellation import current_cancel_token, cancellation_stats, GenerationCancelled
+
+
+class CancellableProvider(LlmProvider):
+    """
+    Wraps a provider so generations started for a cancellable request can be stopped.
+
+    When a cancellation token is active the completion is requested in streaming mode
+    and the token is checked after every chunk. Once cancelled the stream is closed,
+    which drops the HTTP connection so the backend (vLLM, llama.cpp server, TGI) aborts
+    the generation instead of finishing it. Calls without a token pass straight through.
+    """
+
+    def __init__(self, provider, logger=None):
+        self.provider = provider
+        self.logger = logger
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def is_using_json_schema_constraints(self):
+        return self.provider.is_using_json_schema_constraints()
+
+    def get_provider_identifier(self):
+        return self.provider.get_provider_identifier()
+
+    def get_provider_default_settings(self):
+        return self.provider.get_provider_default_settings()
+
+    def tokenize(self, prompt):
+        return self.provider.tokenize(prompt)
+
+    def create_completion(self, prompt, structured_output_settings, settings, bos_token):
+        token = current_cancel_token.get()
+        if token is None:
+            return self.provider.create_completion(prompt, structured_output_settings, settings, bos_token)
+        token.raise_if_cancelled()
+        stream_settings = self._streaming_settings(settings)
+        chunks = self.provider.create_completion(prompt, structured_output_settings, stream_settings, bos_token)
+        return self._consume(chunks, token, settings)
+
+    def create_chat_completion(self, messages, structured_output_settings, settings):
+        token = current_cancel_token.get()
+        if token is None:
+            return self.provider.create_chat_completion(messages, structured_output_settings, settings)
+        token.raise_if_cancelled()
+        stream_settings = self._streaming_settings(settings)
+        chunks = self.provider.create_chat_completion(messages, structured_output_settings, stream_settings)
+        return self._consume(chunks, token, settings)
+
+    @staticmethod
+    def _streaming_settings(settings):
+        stream_settings = copy(settings)
+        stream_settings.stream = True
+        return stream_settings
+
+    def _consume(self, chunks, token, settings):
+        if settings.is_streaming():
+            return self._guarded_stream(chunks, token, settings)
+        text = "".join(chunk["choices"][0]["text"] for chunk in self._guarded_stream(chunks, token, settings))
+        return {"choices": [{"text": text}]}
+
+    def _guarded_stream(self, chunks, token, settings):
+        generated = 0
+        try:
+            for chunk in chunks:
+                if token.cancelled:
+                    self._record_cancellation(token, settings, generated)
+                    raise GenerationCancelled(token.reason)
+                generated += 1
+                yield chunk
+        finally:
+            # Closing the provider's generator releases its streaming HTTP response.
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+    def _record_cancellation(self, token, settings, generated):
+        max_tokens = None
+        for name in ("max_tokens", "n_predict", "max_new_tokens"):
+            value = getattr(settings, name, None)
+            if isinstance(value, int) and value > 0:
+                max_tokens = value
+                break
+        tokens_saved = max(max_tokens - generated, 0) if max_tokens else 0
+        cancellation_stats.record(tokens_saved)
+        if self.logger:
+            self.logger.info(f"Cancelled generation after {generated} tokens ({token.reason}), "
+                             f"saved up to {tokens_saved} tokens.")
@@ -0,0 +1,62 @@
+import contextvars
+import threading
+
+# The cancellation token of the request currently running on this thread.
+current_cancel_token = contextvars.ContextVar("current_cancel_token", default=None)
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a module call once its request has been cancelled."""
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason="cancelled"):
+        self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise GenerationCancelled(self.reason)
+
+    def bind(self, func):
+        """
+        Wrap `func` so that it runs with this token as the current cancellation token,
+        which is how the token travels onto a worker thread.
+        """
+        def call(*args, **kwargs):
+            reset_token = current_cancel_token.set(self)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                current_cancel_token.reset(reset_token)
+
+        return call
+
+
+def raise_if_cancelled():
+    token = current_cancel_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+class CancellationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled_generations = 0
+        self.tokens_saved = 0
+
+    def record(self, tokens_saved):
+        with self._lock:
+            self.cancelled_generations += 1
+            self.tokens_saved += tokens_saved
+
+
+cancellation_stats = CancellationStats()
@@ -1,43 +1,84 @@
+import asyncio
 import datetime
+import time
 from typing import Union, Optional
 
 from llama_cpp_agent import FunctionCallingAgent, LlamaCppFunctionTool
 from llama_cpp_agent.messages_formatter import MessagesFormatterType
+from app.modules.async_agent import AsyncAgent
 from app.modules.base_module import BaseModule
-from app.modules.api_module import APIModule
-from app.modules.wiki_summary_module import WikiSummaryModule
-from app.modules.wikipedia_query_module import WikipediaQueryModule
-from app.modules.agentic_reflection_module import AgenticReflectionModule
+from app.modules.module_registry import get_module_registry
+from app.modules.streaming import current_event_sink, emit_event
+from app.modules.cancellation import raise_if_cancelled
+from app.modules.metrics import metrics
+from app.modules.tracing import traced, span
+from app.modules.semantic_cache import SemanticCache, current_tool_calls, record_tool_call
 
 class ChatModule(BaseModule):
     def __init__(self, config, logger):
         super().__init__(config, logger, ["llama_cpp_agent"])
         if self.dependencies_available:
-            self.provider = self._initialize_provider(config.default_llm_settings)
-            self.function_calling_agent = self._initialize_function_calling_agent()
-            # TODO: add debug toggle
-            #self.function_calling_agent.structured_output_settings.output_raw_json_string = True
-            self.function_calling_agent.structured_output_settings.add_thoughts_and_reasoning_field = True
-    def _initialize_function_calling_agent(self):
+            self.provider = self._initialize_provider(task="chat")
+            self.semantic_cache = SemanticCache(config, logger)
+    def _initialize_function_calling_agent(self, streaming_callback=None):
         tools = [
-            LlamaCppFunctionTool(self._get_current_datetime),
-            LlamaCppFunctionTool(self._perform_calculations),
-            LlamaCppFunctionTool(self._fetch_data),
-            LlamaCppFunctionTool(self._wiki_summary),
-            LlamaCppFunctionTool(self._wikipedia_query),
-            LlamaCppFunctionTool(self._reflective_response)
+            self._instrument_tool(LlamaCppFunctionTool(self._get_current_datetime)),
+            self._instrument_tool(LlamaCppFunctionTool(self._perform_calculations)),
+            self._instrument_tool(LlamaCppFunctionTool(self._fetch_data)),
+            self._instrument_tool(LlamaCppFunctionTool(self._wiki_summary)),
+            self._instrument_tool(LlamaCppFunctionTool(self._wikipedia_query)),
+            self._instrument_tool(LlamaCppFunctionTool(self._reflective_response))
         ]
         return FunctionCallingAgent(
             self.provider,
             llama_cpp_function_tools=tools,
             send_message_to_user_callback=self._send_message_to_user_callback,
+            streaming_callback=streaming_callback,
             allow_parallel_function_calling=True,
             debug_output=True,
             messages_formatter_type=MessagesFormatterType.MISTRAL
         )
 
+    def _conversation_agent(self, streaming_callback=None):
+        # A dedicated agent per call: the agent keeps the chat history and the message
+        # mode state, concurrent calls on a shared agent would mix their conversations.
+        agent = self._initialize_function_calling_agent(streaming_callback=streaming_callback)
+        # TODO: add debug toggle
+        #agent.structured_output_settings.output_raw_json_string = True
+        agent.structured_output_settings.add_thoughts_and_reasoning_field = True
+        return agent
+
+    def _instrument_tool(self, tool):
+        # Wrap the tool's generated run method so every invocation is reported to the
+        # event sink of the current request (tool_call / tool_result stream events),
+        # counted in the tool call metrics and traced as a span.
+        run = tool.model.run
+        tool_name = tool.model.__name__.lstrip("_")
+
+        def instrumented_run(model):
+            raise_if_cancelled()
+            record_tool_call(tool_name)
+            emit_event("tool_call", {"tool": tool_name, "arguments": model.model_dump()})
+            started = time.monotonic()
+            try:
+                with span(f"tool.{tool_name}"):
+                    result = run(model)
+            except Exception as e:
+                metrics.observe_tool_call(tool_name, time.monotonic() - started, e)
+                raise
+            metrics.observe_tool_call(tool_name, time.monotonic() - started)
+            emit_event("tool_result", {"tool": tool_name, "result": result})
+            return result
+
+        tool.model.run = instrumented_run
+        return tool
+
+    def _shared_module(self, name):
+        return get_module_registry(self.config, self.logger).get(name)
+
     def _send_message_to_user_callback(self, message: str):
         self.logger.info(f"Assistant: {message.strip()}")
+        emit_event("message", message.strip())
 
     def _get_current_datetime(self, output_format: Optional[str] = None):
         """
@@ -86,7 +127,9 @@ class ChatModule(BaseModule):
         Returns:
             dict: The fetched data.
         """
-        api_module = APIModule(self.config, self.logger)
+        api_module = self._shared_module("api")
+        if api_module is None:
+            return "API functionality is disabled."
         return api_module.fetch_data(url)
 
     def _wiki_summary(self, page_title: str):
@@ -99,7 +142,9 @@ class ChatModule(BaseModule):
         Returns:
             str: The summary of the Wikipedia page.
         """
-        wiki_summary_module = WikiSummaryModule(self.config, self.logger)
+        wiki_summary_module = self._shared_module("wiki_summary")
+        if wiki_summary_module is None:
+            return "WikiSummary functionality is disabled."
         return wiki_summary_module.summarize_wikipedia_page(page_title)
 
     def _wikipedia_query(self, page_url: str, query: str):
@@ -113,8 +158,10 @@ class ChatModule(BaseModule):
         Returns:
             str: The result of the query.
         """
-        wikipedia_query_module = WikipediaQueryModule(self.config, self.logger)
-        return wikipedia_query_module.process_wikipedia_query(page_url, query)
+        wikipedia_query_module = self._shared_module("wikipedia_query")
+        if wikipedia_query_module is None:
+            return "Wikipedia Query functionality is disabled."
+        return wikipedia_query_module.process_wikipedia_query(page_url, query)["answer"]
 
     def _reflective_response(self, input_message: str):
         """
@@ -126,16 +173,77 @@ class ChatModule(BaseModule):
         Returns:
             str: The reflective response.
         """
-        agentic_reflection_module = AgenticReflectionModule(self.config, self.logger)
+        agentic_reflection_module = self._shared_module("agentic_reflection")
+        if agentic_reflection_module is None:
+            return "Reflection functionality is disabled."
         return agentic_reflection_module.get_reflective_response(input_message)
 
+    @traced("chat.chat")
     def chat(self, user_input: str):
+        cached, embedding = self.semantic_cache.lookup(user_input)
+        if cached is not None:
+            return cached
+
+        settings = self.provider.get_provider_default_settings()
+        settings.stream = False
+        settings.temperature = 0.65
+        settings.max_tokens = 2048
+
+        tool_calls = []
+        calls_token = current_tool_calls.set(tool_calls)
+        try:
+            response = self._conversation_agent().generate_response(user_input, llm_sampling_settings=settings)
+        finally:
+            current_tool_calls.reset(calls_token)
+        self.semantic_cache.store(user_input, embedding, response, tool_calls)
+        return response
+
+    @traced("chat.chat")
+    async def achat(self, user_input: str):
+        # Embedding the message is CPU bound, keep it off the event loop.
+        cached, embedding = await asyncio.to_thread(self.semantic_cache.lookup, user_input)
+        if cached is not None:
+            return cached
+
         settings = self.provider.get_provider_default_settings()
         settings.stream = False
         settings.temperature = 0.65
         settings.max_tokens = 2048
 
-        return self.function_calling_agent.generate_response(user_input, llm_sampling_settings=settings)
+        tool_calls = []
+        calls_token = current_tool_calls.set(tool_calls)
+        try:
+            agent = self._conversation_agent()
+            async_agent = AsyncAgent(agent.llama_cpp_agent, self._async_provider_for(agent.llama_cpp_agent.provider))
+            response = await async_agent.generate_function_calling_response(
+                user_input, agent.structured_output_settings, llm_sampling_settings=settings
+            )
+        finally:
+            current_tool_calls.reset(calls_token)
+        self.semantic_cache.store(user_input, embedding, response, tool_calls)
+        return response
+
+    @traced("chat.chat_stream")
+    def chat_stream(self, user_input: str, emit):
+        """
+        Chat with the agent while streaming its progress to `emit(event, data)`.
+
+        Events are `token` for raw generated text, `tool_call` and `tool_result` for
+        function calls and `message` for text the agent sends to the user.
+        """
+        settings = self.provider.get_provider_default_settings()
+        settings.stream = True
+        settings.temperature = 0.65
+        settings.max_tokens = 2048
+
+        agent = self._conversation_agent(
+            streaming_callback=lambda response: response.text and emit("token", response.text)
+        )
+        sink_token = current_event_sink.set(emit)
+        try:
+            return agent.generate_response(user_input, llm_sampling_settings=settings)
+        finally:
+            current_event_sink.reset(sink_token)
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+import time
+from llama_cpp_agent.providers.provider_base import LlmProvider
+from app.modules.metrics import metrics, estimate_tokens
+from app.modules.tracing import tracer
+from app.modules.rate_limiter import record_usage
+
+
+class InstrumentedProvider(LlmProvider):
+    """
+    Wraps a provider to record time to first token, generation time and token
+    throughput per model in the Prometheus metrics, and each call as an `llm.completion` span.
+    """
+
+    def __init__(self, provider, model):
+        self.provider = provider
+        self.model = model
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def is_using_json_schema_constraints(self):
+        return self.provider.is_using_json_schema_constraints()
+
+    def get_provider_identifier(self):
+        return self.provider.get_provider_identifier()
+
+    def get_provider_default_settings(self):
+        return self.provider.get_provider_default_settings()
+
+    def tokenize(self, prompt):
+        return self.provider.tokenize(prompt)
+
+    def create_completion(self, prompt, structured_output_settings, settings, bos_token):
+        return self._observe(
+            lambda: self.provider.create_completion(prompt, structured_output_settings, settings, bos_token),
+            settings, estimate_tokens(prompt),
+        )
+
+    def create_chat_completion(self, messages, structured_output_settings, settings):
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+        return self._observe(
+            lambda: self.provider.create_chat_completion(messages, structured_output_settings, settings),
+            settings, prompt_tokens,
+        )
+
+    def _observe(self, create, settings, prompt_tokens):
+        llm_span = tracer.start_span("llm.completion", model=self.model, stream=settings.is_streaming(),
+                                     prompt_tokens=prompt_tokens)
+        started = time.monotonic()
+        try:
+            result = create()
+        except Exception as e:
+            llm_span.end(e)
+            raise
+        if settings.is_streaming():
+            return self._observed_stream(result, started, prompt_tokens, llm_span)
+        elapsed = time.monotonic() - started
+        generated = estimate_tokens(_completion_text(result))
+        metrics.observe_first_token(self.model, elapsed)
+        metrics.observe_generation(self.model, elapsed, prompt_tokens, generated)
+        record_usage(prompt_tokens, generated)
+        llm_span.set_attribute("generated_tokens", generated)
+        llm_span.end()
+        return result
+
+    def _observed_stream(self, chunks, started, prompt_tokens, llm_span):
+        generated = 0
+        error = None
+        try:
+            for chunk in chunks:
+                if generated == 0:
+                    metrics.observe_first_token(self.model, time.monotonic() - started)
+                    llm_span.set_attribute("time_to_first_token", time.monotonic() - started)
+                generated += 1
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            metrics.observe_generation(self.model, time.monotonic() - started, prompt_tokens, generated)
+            record_usage(prompt_tokens, generated)
+            llm_span.set_attribute("generated_tokens", generated)
+            llm_span.end(error)
+
+
+def _completion_text(result):
+    try:
+        choice = result["choices"][0]
+        return choice.get("text") or (choice.get("message") or {}).get("content") or ""
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return ""
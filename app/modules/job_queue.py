@@ -0,0 +1,318 @@
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+import requests
+
+
+class JobStore:
+    """
+    Persistent job queue in a SQLite file. Jobs survive restarts: a job whose worker
+    died is picked up again once its lease runs out.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT, payload TEXT, status TEXT, attempts INTEGER, max_attempts INTEGER, "
+            "result TEXT, error TEXT, webhook TEXT, api_key TEXT, created_at REAL, updated_at REAL, "
+            "run_after REAL, lease_until REAL, expires_at REAL)")
+        self._connection().execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, run_after)")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _transaction(self, work):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(connection)
+            connection.execute("COMMIT")
+            return result
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def submit(self, kind, payload, webhook=None, api_key=None, max_attempts=3):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO jobs (id, kind, payload, status, attempts, max_attempts, webhook, api_key, "
+            "created_at, updated_at, run_after) VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), max_attempts, webhook, api_key, now, now, now))
+        return job_id
+
+    def claim(self, lease_timeout):
+        """
+        Take the oldest runnable job (queued, or running with an expired lease and attempts
+        left) and mark it running. The returned job's `attempts` identifies this claim.
+        """
+        def work(connection):
+            now = time.time()
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+                "OR (status = 'running' AND lease_until <= ? AND attempts < max_attempts) "
+                "ORDER BY run_after LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ? "
+                "WHERE id = ?", (now + lease_timeout, now, row["id"]))
+            return self._job(row, status="running", attempts=row["attempts"] + 1)
+        return self._transaction(work)
+
+    def fail_expired(self, result_ttl):
+        """Mark running jobs whose lease expired on their last attempt as failed and return their ids."""
+        def work(connection):
+            now = time.time()
+            job_ids = [row["id"] for row in connection.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND lease_until <= ? AND attempts >= max_attempts",
+                (now,))]
+            for job_id in job_ids:
+                connection.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+                    ("The job did not finish within its lease on its last attempt.", now, now + result_ttl, job_id))
+            return job_ids
+        return self._transaction(work)
+
+    def renew(self, job_id, attempts, lease_timeout):
+        """Extend the lease of the claim `attempts` of a job; False if the claim was lost."""
+        now = time.time()
+        return self._connection().execute(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND attempts = ? AND status = 'running'",
+            (now + lease_timeout, now, job_id, attempts)).rowcount == 1
+
+    def complete(self, job_id, attempts, result, result_ttl):
+        """Store the result of the claim `attempts` of a job; False if the claim was lost."""
+        now = time.time()
+        return self._connection().execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, updated_at = ?, expires_at = ? "
+            "WHERE id = ? AND attempts = ? AND status = 'running'",
+            (json.dumps(result, default=str), now, now + result_ttl, job_id, attempts)).rowcount == 1
+
+    def fail(self, job_id, attempts, error, retry_delay, result_ttl):
+        """
+        Record a failed claim `attempts` of a job; the job is queued again after `retry_delay`
+        unless it ran out of attempts. Returns the new status, None if the claim was lost.
+        """
+        def work(connection):
+            now = time.time()
+            row = connection.execute(
+                "SELECT max_attempts FROM jobs WHERE id = ? AND attempts = ? AND status = 'running'",
+                (job_id, attempts)).fetchone()
+            if row is None:
+                return None
+            if attempts < row["max_attempts"]:
+                # Exponential backoff between attempts.
+                delay = retry_delay * 2 ** (attempts - 1)
+                connection.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, updated_at = ? WHERE id = ?",
+                    (error, now + delay, now, job_id))
+                return "queued"
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+                (error, now, now + result_ttl, job_id))
+            return "failed"
+        return self._transaction(work)
+
+    def get(self, job_id):
+        row = self._connection().execute(
+            "SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (job_id, time.time())).fetchone()
+        return self._job(row) if row is not None else None
+
+    def purge_expired(self):
+        return self._connection().execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def counts(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def _job(row, **overrides):
+        job = dict(row)
+        job.update(overrides)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def public_job(job):
+    """The fields of a job returned to clients."""
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+class JobRunner:
+    """
+    Runs queued jobs on `workers` asyncio tasks, configured by the `jobs` section of
+    config.yaml (off by default). `handler(job)` is awaited for every job and its return
+    value stored as the result. The lease of a running job is renewed every third of
+    `lease_timeout`, so only jobs whose worker died are run again. Failed jobs are retried
+    with exponential backoff up to `max_attempts`, and finished jobs are kept for
+    `result_ttl` seconds. When a job has a webhook, the finished job is POSTed to it.
+    """
+
+    def __init__(self, config, logger, handler):
+        self.config = config
+        self.logger = logger
+        self.handler = handler
+        settings = config.config.get("jobs", {}) or {}
+        self.enabled = settings.get("enabled", False)
+        self.path = settings.get("path", os.path.join(config.config.get("logs_path", "logs"), "jobs.db"))
+        self.workers = settings.get("workers", 2)
+        self.max_attempts = settings.get("max_attempts", 3)
+        self.retry_delay = settings.get("retry_delay", 10)
+        self.result_ttl = settings.get("result_ttl", 86400)
+        self.lease_timeout = settings.get("lease_timeout", 900)
+        self.poll_interval = settings.get("poll_interval", 1)
+        self.webhook_timeout = settings.get("webhook_timeout", 10)
+        self.webhook_hosts = settings.get("webhook_hosts") or []
+        self.store = None
+        self._tasks = []
+
+    def validate_webhook(self, url):
+        """
+        Raise ValueError unless `url` is an http(s) URL on one of `webhook_hosts` or, without
+        that list, on a host whose addresses are all public (no loopback or private network).
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("The webhook must be an http or https URL.")
+        if self.webhook_hosts:
+            if parts.hostname not in self.webhook_hosts:
+                raise ValueError(f"Webhooks to {parts.hostname} are not allowed.")
+            return
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or None)}
+        except (socket.gaierror, UnicodeError):
+            raise ValueError(f"Cannot resolve the webhook host {parts.hostname}.")
+        if not all(ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses):
+            raise ValueError(f"Webhooks to {parts.hostname} are not allowed.")
+
+    def submit(self, kind, payload, webhook=None, api_key=None):
+        job_id = self.store.submit(kind, payload, webhook, api_key, self.max_attempts)
+        self.logger.info(f"Queued {kind} job {job_id}.")
+        return job_id
+
+    def get(self, job_id, api_key=None):
+        """The job, if it exists and was submitted with `api_key`."""
+        job = self.store.get(job_id)
+        if job is None or job["api_key"] != api_key:
+            return None
+        return job
+
+    def start(self):
+        if not self.enabled or self._tasks:
+            return
+        self.store = JobStore(self.path)
+        self.logger.info(f"Starting {self.workers} job workers.")
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            self.store.close()
+
+    async def _work(self):
+        last_purge = 0
+        while True:
+            try:
+                if time.monotonic() - last_purge > 60:
+                    await asyncio.to_thread(self.store.purge_expired)
+                    last_purge = time.monotonic()
+                for job_id in await asyncio.to_thread(self.store.fail_expired, self.result_ttl):
+                    self.logger.warning(f"Job {job_id} ran out of attempts after its lease expired (failed).")
+                    await self._notify(job_id)
+                job = await asyncio.to_thread(self.store.claim, self.lease_timeout)
+                if job is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self.run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Job worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _renew_lease(self, job):
+        while True:
+            await asyncio.sleep(self.lease_timeout / 3)
+            if not await asyncio.to_thread(self.store.renew, job["id"], job["attempts"], self.lease_timeout):
+                self.logger.warning(f"Job {job['id']} lost its lease (attempt {job['attempts']}).")
+                return
+
+    async def run_job(self, job):
+        self.logger.info(f"Running {job['kind']} job {job['id']} (attempt {job['attempts']}).")
+        renewal = asyncio.ensure_future(self._renew_lease(job))
+        try:
+            result = await self.handler(job)
+        except asyncio.CancelledError:
+            # Shutting down: the job is run again once its lease expires.
+            raise
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e) or type(e).__name__
+            status = await asyncio.to_thread(
+                self.store.fail, job["id"], job["attempts"], error, self.retry_delay, self.result_ttl)
+            if status is None:
+                self.logger.warning(f"Job {job['id']} failed after losing its lease, discarding: {error}")
+                return
+            self.logger.warning(f"Job {job['id']} failed: {error} ({status}).")
+            if status == "failed":
+                await self._notify(job["id"])
+            return
+        finally:
+            renewal.cancel()
+        if not await asyncio.to_thread(self.store.complete, job["id"], job["attempts"], result, self.result_ttl):
+            self.logger.warning(f"Job {job['id']} finished after losing its lease, discarding the result.")
+            return
+        await self._notify(job["id"])
+
+    async def _notify(self, job_id):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if not job or not job["webhook"]:
+            return
+        try:
+            # Checked again when sending: the host may resolve to another address by now.
+            await asyncio.to_thread(self.validate_webhook, job["webhook"])
+            response = await asyncio.to_thread(
+                requests.post, job["webhook"], json=public_job(job), timeout=self.webhook_timeout,
+                allow_redirects=False)
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.warning(f"Webhook for job {job_id} failed: {e}")
@@ -1,6 +1,7 @@
 from srt_core.config import Config
 from srt_core.utils.logger import Logger
 import importlib
+from app.modules.provider_registry import normalize_llm_settings
 
 class LLMProvider:
     def __init__(self):
@@ -35,9 +36,14 @@ class LLMProvider:
         self.set_llm_attributes('summary', self.summary_llm_settings)
         self.set_llm_attributes('chat', self.chat_llm_settings)
 
-        self.default_provider = self._initialize_provider(self.default_llm_settings)
-        self.summary_provider = self._initialize_provider(self.summary_llm_settings)
-        self.chat_provider = self._initialize_provider(self.chat_llm_settings)
+        # Entries resolving to the same backend share a single provider.
+        providers = {}
+        for prefix in ('default', 'summary', 'chat'):
+            llm_settings = getattr(self, f"{prefix}_llm_settings")
+            key = normalize_llm_settings(llm_settings)
+            if key not in providers:
+                providers[key] = self._initialize_provider(llm_settings)
+            setattr(self, f"{prefix}_provider", providers[key])
 
     def _initialize_provider(self, llm_settings):
         self.logger.info(f"Initializing provider with settings: {llm_settings}")
@@ -0,0 +1,230 @@
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# LLM calls take seconds to minutes, the default Prometheus buckets stop at 10s.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def estimate_tokens(text):
+    # Backends do not report usage on every path; ~4 characters per token is close
+    # enough for throughput dashboards.
+    return max(1, len(text) // 4) if text else 0
+
+
+class StatsCollector:
+    """Exports the counters kept by other modules (cancellation, pools, hedging) at scrape time."""
+
+    def __init__(self):
+        self.sources = []
+
+    def add_source(self, source):
+        self.sources.append(source)
+
+    def collect(self):
+        for source in self.sources:
+            yield from source()
+
+
+class Metrics:
+    """
+    Prometheus instrumentation of the API. Every recording method is a no-op when
+    prometheus_client is not installed, so callers never need to check.
+    """
+
+    def __init__(self):
+        self.enabled = PROMETHEUS_AVAILABLE
+        if not self.enabled:
+            return
+        self.registry = CollectorRegistry()
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Time until the response starts, per route.",
+            ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.requests_in_flight = Gauge(
+            "http_requests_in_flight", "Requests currently being handled, per route.",
+            ["route"], registry=self.registry)
+        self.queue_wait = Histogram(
+            "worker_pool_queue_wait_seconds", "Time a request waited for a worker slot.",
+            ["endpoint"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.time_to_first_token = Histogram(
+            "llm_time_to_first_token_seconds", "Time until the first generated token (whole answer if not streamed).",
+            ["model"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.generation_duration = Histogram(
+            "llm_generation_duration_seconds", "Duration of LLM completions.",
+            ["model"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.generated_tokens = Counter(
+            "llm_generated_tokens", "Generated tokens (streamed chunks, estimated otherwise).",
+            ["model"], registry=self.registry)
+        self.prompt_tokens = Counter(
+            "llm_prompt_tokens", "Estimated prompt tokens sent to the model.",
+            ["model"], registry=self.registry)
+        self.tool_calls = Counter(
+            "chat_tool_calls", "Tool calls made by the chat agent.",
+            ["tool", "status"], registry=self.registry)
+        self.tool_duration = Histogram(
+            "chat_tool_call_duration_seconds", "Duration of chat agent tool calls.",
+            ["tool"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.cache_requests = Counter(
+            "cache_requests", "Cache lookups by result (hit or miss).",
+            ["cache", "result"], registry=self.registry)
+        self.scheduler_wait = Histogram(
+            "scheduler_wait_seconds", "Time a request waited for a generation slot, per priority class.",
+            ["priority_class"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.rate_limited_requests = Counter(
+            "rate_limited_requests", "Requests rejected by the token rate limiter, by reason.",
+            ["endpoint", "reason"], registry=self.registry)
+        self.charged_tokens = Counter(
+            "rate_limit_charged_tokens", "Tokens charged to API keys after reconciliation with actual usage.",
+            ["endpoint"], registry=self.registry)
+        self.coalesced_requests = Counter(
+            "coalesced_requests", "Requests that shared the result of an identical in-flight request.",
+            ["endpoint"], registry=self.registry)
+        self.errors = Counter(
+            "errors", "Errors by endpoint and exception type.",
+            ["endpoint", "exception"], registry=self.registry)
+        self.stats_collector = StatsCollector()
+        self.registry.register(self.stats_collector)
+
+    def observe_request(self, method, route, status, seconds):
+        if self.enabled:
+            self.request_latency.labels(method, route, str(status)).observe(seconds)
+
+    def track_in_flight(self, route):
+        if self.enabled:
+            return self.requests_in_flight.labels(route).track_inprogress()
+        return _NullContext()
+
+    def observe_queue_wait(self, endpoint, seconds):
+        if self.enabled:
+            self.queue_wait.labels(endpoint).observe(seconds)
+
+    def observe_scheduler_wait(self, priority_class, seconds):
+        if self.enabled:
+            self.scheduler_wait.labels(priority_class).observe(seconds)
+
+    def observe_first_token(self, model, seconds):
+        if self.enabled:
+            self.time_to_first_token.labels(model).observe(seconds)
+
+    def observe_generation(self, model, seconds, prompt_tokens, generated_tokens):
+        if self.enabled:
+            self.generation_duration.labels(model).observe(seconds)
+            self.prompt_tokens.labels(model).inc(prompt_tokens)
+            self.generated_tokens.labels(model).inc(generated_tokens)
+
+    def observe_tool_call(self, tool, seconds, error=None):
+        if self.enabled:
+            self.tool_calls.labels(tool, "error" if error else "ok").inc()
+            self.tool_duration.labels(tool).observe(seconds)
+
+    def record_cache(self, cache, hit):
+        if self.enabled:
+            self.cache_requests.labels(cache, "hit" if hit else "miss").inc()
+
+    def record_rate_limited(self, endpoint, reason):
+        if self.enabled:
+            self.rate_limited_requests.labels(endpoint, reason).inc()
+
+    def record_charged_tokens(self, endpoint, tokens):
+        if self.enabled:
+            self.charged_tokens.labels(endpoint).inc(tokens)
+
+    def record_coalesced(self, endpoint):
+        if self.enabled:
+            self.coalesced_requests.labels(endpoint).inc()
+
+    def record_error(self, endpoint, error):
+        if self.enabled:
+            self.errors.labels(endpoint, type(error).__name__).inc()
+
+    def add_stats_source(self, source):
+        """Register a callable yielding metric families, evaluated on every scrape."""
+        if self.enabled:
+            self.stats_collector.add_source(source)
+
+    def render(self):
+        return generate_latest(self.registry) if self.enabled else b""
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def counter_family(name, documentation, values, label_names=()):
+    """`values` is a list of (label values, value) pairs."""
+    family = CounterMetricFamily(name, documentation, labels=list(label_names))
+    for label_values, value in values:
+        family.add_metric(label_values, value)
+    return family
+
+
+def gauge_family(name, documentation, values, label_names=()):
+    """`values` is a list of (label values, value) pairs."""
+    family = GaugeMetricFamily(name, documentation, labels=list(label_names))
+    for label_values, value in values:
+        family.add_metric(label_values, value)
+    return family
+
+
+def runtime_stats(worker_pool):
+    """Stats source for the worker pool, cancellations, backend pools and hedging."""
+    from app.modules.backend_pool import backend_pools
+    from app.modules.cancellation import cancellation_stats
+
+    def collect():
+        yield counter_family("llm_cancelled_generations", "Generations cancelled because the client went away.",
+                             [([], cancellation_stats.cancelled_generations)])
+        yield counter_family("llm_cancelled_tokens_saved", "Tokens not generated thanks to cancellation.",
+                             [([], cancellation_stats.tokens_saved)])
+
+        pool_stats = worker_pool.stats()
+        yield gauge_family("worker_pool_active", "Requests running per endpoint.",
+                           [([name], stats["active"]) for name, stats in pool_stats.items()], ["endpoint"])
+        yield gauge_family("worker_pool_waiting", "Requests queued per endpoint.",
+                           [([name], stats["waiting"]) for name, stats in pool_stats.items()], ["endpoint"])
+
+        scheduler = worker_pool.scheduler.stats()
+        yield gauge_family("scheduler_queue_depth", "Requests waiting for a generation slot, per priority class.",
+                           [([name], depth) for name, depth in scheduler["waiting"].items()], ["priority_class"])
+        yield gauge_family("scheduler_active", "Generation slots in use.", [([], scheduler["active"])])
+
+        backends = [(name, backend) for name, pool in backend_pools.items() for backend in pool.stats()]
+        labels = ["pool", "url"]
+        yield gauge_family("llm_backend_outstanding", "Requests in flight per backend.",
+                           [([name, b["url"]], b["outstanding"]) for name, b in backends], labels)
+        yield gauge_family("llm_backend_healthy", "1 if the backend passed its last health probe.",
+                           [([name, b["url"]], int(b["healthy"])) for name, b in backends], labels)
+        yield gauge_family("llm_backend_circuit_open", "1 if the backend's circuit breaker is open.",
+                           [([name, b["url"]], int(b["circuit"] == "open")) for name, b in backends], labels)
+        yield counter_family("llm_backend_failures", "Failed requests per backend.",
+                             [([name, b["url"]], b["failures"]) for name, b in backends], labels)
+
+        hedging = [(name, pool.hedging.stats()) for name, pool in backend_pools.items() if pool.hedging]
+        yield counter_family("llm_hedge_requests", "Requests eligible for hedging.",
+                             [([name], h["requests"]) for name, h in hedging], ["pool"])
+        yield counter_family("llm_hedged_requests", "Requests that were hedged.",
+                             [([name], h["hedged"]) for name, h in hedging], ["pool"])
+        yield counter_family("llm_hedge_wins", "Hedged requests where the hedge answered first.",
+                             [([name], h["hedge_wins"]) for name, h in hedging], ["pool"])
+        yield gauge_family("llm_hedge_rate", "Share of requests that were hedged.",
+                           [([name], h["hedge_rate"]) for name, h in hedging], ["pool"])
+        yield gauge_family("llm_hedge_win_rate", "Share of hedges that answered first.",
+                           [([name], h["win_rate"]) for name, h in hedging], ["pool"])
+        yield gauge_family("llm_hedge_delay_seconds", "Current hedge delay of streaming calls (time to first token).",
+                           [([name], h["delay"]) for name, h in hedging], ["pool"])
+        yield gauge_family("llm_hedge_completion_delay_seconds",
+                           "Current hedge delay of non-streaming async calls (time to answer).",
+                           [([name], h["completion_delay"]) for name, h in hedging], ["pool"])
+
+    return collect
+
+
+metrics = Metrics()
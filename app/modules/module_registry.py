@@ -0,0 +1,147 @@
+import asyncio
+import importlib
+import threading
+import time
+from app.modules.remote_module import RemoteModule
+
+# name -> (module path, class name, label used in log messages)
+MODULES = {
+    "chat": ("app.modules.chat_module", "ChatModule", "Chat"),
+    "api": ("app.modules.api_module", "APIModule", "API"),
+    "search": ("app.modules.search_module", "SearchModule", "Search"),
+    "wiki_summary": ("app.modules.wiki_summary_module", "WikiSummaryModule", "WikiSummary"),
+    "wikipedia_query": ("app.modules.wikipedia_query_module", "WikipediaQueryModule", "Wikipedia Query"),
+    "product_comparison": ("app.modules.product_comparison_module", "ProductComparisonModule", "Product Comparison"),
+    "agentic_reflection": ("app.modules.agentic_reflection_module", "AgenticReflectionModule", "Agentic Reflection"),
+    "translation": ("app.modules.translation_module", "TranslationModule", "Translation"),
+}
+
+
+class ModuleRegistry:
+    """
+    Creates every module at most once and hands out the shared instance, so the API
+    routes, the CLI and the chat tools reuse the same providers, agents and rerankers.
+
+    Modules are built lazily on first use, or all at once in the background with
+    `initialize`. Each name has its own lock, so a slow module (e.g. the ColBERT
+    reranker) never blocks the creation of another one. A module that fails with
+    ImportError is remembered as disabled (None).
+
+    Modules listed under `gateway.services` in config.yaml run as their own service and
+    are represented by a RemoteModule forwarding calls to it.
+    """
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        self._lock = threading.Lock()
+        # Python modules are imported one at a time: importing packages with circular
+        # imports (llama_cpp_agent) from several threads at once fails with "partially
+        # initialized module". The module instances are still created concurrently.
+        self._import_lock = threading.Lock()
+        self._locks = {}
+        self._modules = {}
+        self._loading = set()
+        self._errors = {}
+        self.timings = {}
+        self.gateway_settings = config.config.get("gateway", {}) or {}
+        self.services = dict(self.gateway_settings.get("services", {}) or {})
+
+    def _module_lock(self, name):
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        if name in self._modules:
+            return self._modules[name]
+        if name not in MODULES:
+            raise KeyError(f"Unknown module: {name}")
+
+        with self._module_lock(name):
+            if name not in self._modules:
+                self._loading.add(name)
+                started = time.monotonic()
+                try:
+                    self._modules[name] = self._create(name)
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                finally:
+                    self._loading.discard(name)
+                    self.timings[name] = time.monotonic() - started
+                self._errors.pop(name, None)
+                if self._modules[name] is not None:
+                    self.logger.info(f"{MODULES[name][2]} module initialized in {self.timings[name]:.2f}s.")
+        return self._modules[name]
+
+    async def aget(self, name):
+        """`get` for the event loop: a module that is not built yet is created on a thread."""
+        if name in self._modules:
+            return self._modules[name]
+        return await asyncio.to_thread(self.get, name)
+
+    async def initialize(self, names=None):
+        """Create the given modules (all by default) concurrently and log the time each one took."""
+        names = list(names or MODULES)
+        started = time.monotonic()
+        results = await asyncio.gather(*(self.aget(name) for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"{MODULES[name][2]} module failed to initialize: {result}")
+        breakdown = ", ".join(f"{name} {self.timings.get(name, 0):.2f}s" for name in names)
+        self.logger.info(f"Modules initialized in {time.monotonic() - started:.2f}s ({breakdown}).")
+
+    def _create(self, name):
+        module_path, class_name, label = MODULES[name]
+        if name in self.services:
+            self.logger.info(f"Forwarding {label} module to {self.services[name]}.")
+            return RemoteModule(name, self.services[name], self.gateway_settings)
+        try:
+            with self._import_lock:
+                module_class = getattr(importlib.import_module(module_path), class_name)
+            self.logger.info(f"Initializing {label} module.")
+            return module_class(self.config, self.logger)
+        except ImportError as e:
+            self.logger.info(f"{label} module could not be initialized: {e}. {label} functionality is disabled.")
+            return None
+
+    def register(self, name, module):
+        with self._module_lock(name):
+            self._modules[name] = module
+
+    def close(self):
+        for module in list(self._modules.values()):
+            if isinstance(module, RemoteModule):
+                module.close()
+
+    def loaded(self):
+        return {name: module is not None for name, module in self._modules.items()}
+
+    def state(self, name):
+        if name in self._modules:
+            return "ready" if self._modules[name] is not None else "disabled"
+        if name in self._loading:
+            return "loading"
+        if name in self._errors:
+            return "failed"
+        return "pending"
+
+    def readiness(self, names=None):
+        return {
+            name: {"state": self.state(name), "seconds": round(self.timings[name], 3) if name in self.timings else None,
+                   **({"error": self._errors[name]} if name in self._errors else {})}
+            for name in (names or MODULES)
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_module_registry(config, logger):
+    """Return the process-wide module registry, creating it on first call."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModuleRegistry(config, logger)
+        return _registry
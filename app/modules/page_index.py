@@ -0,0 +1,135 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from app.modules.metrics import metrics
+from app.modules.page_store import evict_files, remove_file
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+class PageIndex:
+    """Chunks of one revision of a page, their character offsets and normalized embeddings."""
+
+    def __init__(self, title, revision, chunks, offsets, vectors):
+        self.title = title
+        self.revision = revision
+        self.chunks = list(chunks)
+        self.offsets = list(offsets)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + sum(len(chunk) for chunk in self.chunks)
+
+    def search(self, vector, k):
+        """Return the (similarity, chunk number) of the `k` chunks nearest to `vector`, best first."""
+        if not self.chunks:
+            return []
+        similarities = self.vectors @ vector
+        best = np.argsort(-similarities)[:k]
+        return [(float(similarities[i]), int(i)) for i in best]
+
+    def save(self, path):
+        # Write to a temporary file first so readers never see a partial index.
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez(f, vectors=self.vectors, offsets=np.asarray(self.offsets, dtype=np.int64),
+                     chunks=np.asarray(self.chunks, dtype=str), title=np.asarray(self.title),
+                     revision=np.asarray(self.revision))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data["title"]), data["revision"].item(), [str(chunk) for chunk in data["chunks"]],
+                       data["offsets"].tolist(), data["vectors"])
+
+
+class PageIndexStore:
+    """
+    Per-page indexes keyed by page title and revision id, persisted as one `.npz` file per
+    page under `path`, so a page revision is split and embedded once across queries and
+    restarts. A newer revision replaces the files of older ones. Whole page indexes are
+    evicted least recently used first: from memory above `max_memory_bytes` and from disk
+    above `max_disk_bytes`.
+    """
+
+    def __init__(self, path, max_memory_bytes, max_disk_bytes, logger):
+        self.path = path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.logger = logger
+        self.memory_size = 0
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _page_key(title):
+        return hashlib.sha256(title.encode()).hexdigest()[:32]
+
+    def _file(self, title, revision):
+        # Revisions are ids or ETags, which may hold characters not allowed in file names.
+        safe_revision = re.sub(r"[^\w.-]", "_", str(revision))
+        return os.path.join(self.path, f"{self._page_key(title)}-{safe_revision}.npz")
+
+    def get(self, title, revision):
+        key = (title, revision)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+        if index is None:
+            path = self._file(title, revision)
+            try:
+                index = PageIndex.load(path)
+                # The modification time orders files for disk eviction.
+                os.utime(path)
+            except FileNotFoundError:
+                metrics.record_cache("wikipedia_index", hit=False)
+                return None
+            except Exception as e:
+                self.logger.warning(f"Discarding unreadable page index {path}: {e}")
+                remove_file(path)
+                metrics.record_cache("wikipedia_index", hit=False)
+                return None
+            self._remember(index)
+        metrics.record_cache("wikipedia_index", hit=True)
+        return index
+
+    def put(self, index):
+        page_key = self._page_key(index.title)
+        path = self._file(index.title, index.revision)
+        index.save(path)
+        for name in os.listdir(self.path):
+            if name.startswith(f"{page_key}-") and os.path.join(self.path, name) != path:
+                remove_file(os.path.join(self.path, name))
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == index.title and key != (index.title, index.revision)]:
+                self.memory_size -= self._indexes.pop(key).nbytes
+        self._remember(index)
+        evict_files(self.path, ".npz", self.max_disk_bytes, keep=path)
+
+    def _remember(self, index):
+        key = (index.title, index.revision)
+        with self._lock:
+            if key in self._indexes:
+                self.memory_size -= self._indexes.pop(key).nbytes
+            self._indexes[key] = index
+            self.memory_size += index.nbytes
+            while self.memory_size > self.max_memory_bytes and len(self._indexes) > 1:
+                _, evicted = self._indexes.popitem(last=False)
+                self.memory_size -= evicted.nbytes
+
+    def disk_size(self):
+        return sum(os.path.getsize(os.path.join(self.path, name))
+                   for name in os.listdir(self.path) if name.endswith(".npz"))
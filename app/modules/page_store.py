@@ -0,0 +1,145 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+import zlib
+from app.modules.metrics import metrics
+from app.modules.wikipedia import WikipediaPage, PageNotFoundError, create_fetcher, page_title
+
+MB = 1024 * 1024
+
+
+def evict_files(directory, suffix, max_bytes, keep=None):
+    """Remove the least recently modified `suffix` files of `directory` until they fit in `max_bytes`."""
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith(suffix):
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            remove_file(path)
+            total -= size
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PageStore:
+    """
+    Wikipedia pages fetched by `fetcher`, stored zlib-compressed in one file per page
+    under `path` (shared by every worker process of the host) and read through mmap.
+
+    A stored page is served as is for `revalidate_interval` seconds after it was fetched
+    or last revalidated. Then the fetcher is asked whether the page changed (revision id
+    or ETag) and the page is only downloaded again if it did. If revalidation fails the
+    stored copy is served. The least recently validated pages are evicted above
+    `max_disk_bytes`. Without a `path` every page is fetched.
+    """
+
+    def __init__(self, path, fetcher, max_disk_bytes, revalidate_interval, logger):
+        self.path = path
+        self.fetcher = fetcher
+        self.max_disk_bytes = max_disk_bytes
+        self.revalidate_interval = revalidate_interval
+        self.logger = logger
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, title):
+        return os.path.join(self.path, f"{hashlib.sha256(title.encode()).hexdigest()[:32]}.page")
+
+    def get(self, title):
+        """The page with the given title or article URL, raising PageNotFoundError if there is none."""
+        title = page_title(title)
+        if not self.path:
+            return self.fetcher.fetch(title)
+
+        path = self._file(title)
+        stored, validated_at = self._read(path, title)
+        if stored is not None and time.time() - validated_at < self.revalidate_interval:
+            metrics.record_cache("wikipedia_page", hit=True)
+            return stored
+        try:
+            fetched = self.fetcher.fetch(title, stored.validator if stored is not None else None)
+        except PageNotFoundError:
+            remove_file(path)
+            raise
+        except Exception as e:
+            if stored is None:
+                raise
+            self.logger.warning(f"Could not revalidate Wikipedia page {title}, serving the stored copy: {e}")
+            return stored
+        if fetched is None:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            metrics.record_cache("wikipedia_page", hit=True)
+            return stored
+
+        metrics.record_cache("wikipedia_page", hit=False)
+        self._write(path, fetched)
+        evict_files(self.path, ".page", self.max_disk_bytes, keep=path)
+        return fetched
+
+    def _read(self, path, title):
+        """The stored page and when it was last fetched or revalidated (the file's modification time)."""
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = data.find(b"\n")
+                header = json.loads(data[:end])
+                if header["title"] != title:
+                    return None, 0
+                with memoryview(data) as view:
+                    text = zlib.decompress(view[end + 1:]).decode()
+                return WikipediaPage(title, text, header["validator"]), os.fstat(f.fileno()).st_mtime
+        except FileNotFoundError:
+            return None, 0
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable stored page {path}: {e}")
+            remove_file(path)
+            return None, 0
+
+    def _write(self, path, page):
+        header = json.dumps({"title": page.title, "validator": page.validator}).encode()
+        # Write to a temporary file first so readers never see a partial page.
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(header + b"\n" + zlib.compress(page.text.encode()))
+        os.replace(temporary, path)
+
+    def disk_size(self):
+        return sum(os.path.getsize(os.path.join(self.path, name))
+                   for name in os.listdir(self.path) if name.endswith(".page"))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_page_store(config, logger):
+    """Return the process-wide page store, creating it on first call."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            settings = config.config.get("wikipedia_pages", {}) or {}
+            path = None
+            if settings.get("enabled", True):
+                path = settings.get("path", os.path.join(config.config.get("logs_path", "logs"), "wikipedia_pages"))
+            _store = PageStore(path, create_fetcher(settings), int(settings.get("max_disk_mb", 512) * MB),
+                               settings.get("revalidate_interval", 300), logger)
+        return _store
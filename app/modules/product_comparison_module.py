@@ -1,5 +1,7 @@
 from llama_cpp_agent import AgentChainElement, AgentChain
 from app.modules.base_module import BaseModule
+from app.modules.cancellation import raise_if_cancelled
+from app.modules.tracing import traced, span
 
 
 class ProductComparisonModule(BaseModule):
@@ -8,7 +10,7 @@ class ProductComparisonModule(BaseModule):
         super().__init__(config, logger, required_modules)
 
         if self.dependencies_available:
-            self.provider = self._initialize_provider(config.default_llm_settings)
+            self.provider = self._initialize_provider(task="product_comparison")
             self.agent = self._initialize_agent("You are a product comparison expert.")
             self.chain = self._initialize_chain()
         else:
@@ -27,6 +29,7 @@ class ProductComparisonModule(BaseModule):
         )
         return AgentChain(self.agent, [product_comparison, product_recommendation])
 
+    @traced("product_comparison.compare")
     def compare_and_recommend(self, product1, product2, category, user_profile):
         if not self.dependencies_available:
             return "Product Comparison functionality is disabled due to missing dependencies."
@@ -37,5 +40,26 @@ class ProductComparisonModule(BaseModule):
             "category": category,
             "user_profile": user_profile
         }
-        result = self.chain.run_chain(additional_fields)
-        return result
+        return self._run_chain(additional_fields)
+
+    @traced("product_comparison.compare")
+    async def acompare_and_recommend(self, product1, product2, category, user_profile):
+        if not self.dependencies_available:
+            return "Product Comparison functionality is disabled due to missing dependencies."
+
+        additional_fields = {
+            "product1": product1,
+            "product2": product2,
+            "category": category,
+            "user_profile": user_profile
+        }
+        return await self._async_agent(self.agent).run_chain(self.chain.chain, additional_fields)
+
+    def _run_chain(self, additional_fields):
+        # Run the chain one element at a time so a cancelled request stops between steps.
+        output, outputs = "", dict(additional_fields)
+        for element in self.chain.chain:
+            raise_if_cancelled()
+            with span("agent_chain.element", output=element.output_identifier):
+                output, outputs = AgentChain(self.agent, [element]).run_chain(additional_fields=outputs)
+        return output, outputs
@@ -0,0 +1,116 @@
+import threading
+from urllib.parse import urlsplit, urlunsplit
+from app.modules.async_provider import create_async_provider
+
+# Tasks routed to the `summary_llm` / `chat_llm` entries unless `routing` says otherwise;
+# every other task uses `default_llm`.
+DEFAULT_ROUTES = {
+    "summary": "summary_llm",
+    "chat": "chat_llm",
+}
+
+
+def normalize_llm_settings(llm_settings):
+    """
+    Reduce LLM settings to what identifies a backend, so entries in `llms` that point
+    at the same server and model share one provider.
+    """
+    provider_type = llm_settings["agent_provider"]
+    if provider_type == "llama_cpp_python":
+        return provider_type, llm_settings.get("filename"), llm_settings.get("max_tokens")
+
+    urls = tuple(sorted(_normalize_url(url) for url in llm_settings.get("urls") or [llm_settings.get("url")]))
+    model = llm_settings.get("huggingface") if provider_type == "vllm_server" else llm_settings.get("model", "")
+    return provider_type, urls, model or "", llm_settings.get("api_key") or ""
+
+
+def _normalize_url(url):
+    parts = urlsplit((url or "").strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+class ProviderRegistry:
+    """
+    Process-wide provider cache keyed by normalized LLM settings, plus the task routing
+    table from the `routing` section of config.yaml (task name -> entry in `llms`).
+    """
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        self.routes = self.config.config.get("routing", {}) or {}
+        self._lock = threading.Lock()
+        self._providers = {}
+        self._settings = {}
+        self._async_providers = {}
+
+    def llm_name_for_task(self, task):
+        if task in self.routes:
+            return self.routes[task]
+        return getattr(self.config, f"{DEFAULT_ROUTES.get(task, 'default_llm')}_name")
+
+    def load_llm_settings(self, llm_name):
+        llm_config = self.config.config["llms"][llm_name]
+        return {
+            "type": llm_config["type"],
+            "filename": llm_config["filename"],
+            "huggingface": llm_config["huggingface"],
+            "url": llm_config["url"],
+            "agent_provider": llm_config["agent_provider"],
+            "server_name": llm_config["server"],
+            "max_tokens": llm_config["max_tokens"],
+            "model": llm_config.get("model", ""),
+            "api_key": llm_config.get("api_key", ""),
+            "urls": llm_config.get("urls"),
+        }
+
+    def settings_for_task(self, task):
+        if task not in self.routes:
+            llm_settings = getattr(self.config, f"{DEFAULT_ROUTES.get(task, 'default_llm')}_settings")
+            urls = ((self.config.config.get("llms", {}) or {}).get(self.llm_name_for_task(task)) or {}).get("urls")
+            return {**llm_settings, "urls": urls} if urls else llm_settings
+        llm_name = self.routes[task]
+        if llm_name not in (self.config.config.get("llms", {}) or {}):
+            raise ValueError(f"Task {task} is routed to unknown LLM: {llm_name}")
+        return self.load_llm_settings(llm_name)
+
+    def get_provider(self, llm_settings, factory):
+        """Return the shared provider for these settings, creating it with `factory` once."""
+        key = normalize_llm_settings(llm_settings)
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is None:
+                provider = factory(llm_settings)
+                self._providers[key] = provider
+                self._settings[id(provider)] = llm_settings
+            return provider
+
+    def get_async_provider(self, provider):
+        """Async counterpart of a provider created by this registry, or None if unsupported."""
+        llm_settings = self._settings.get(id(provider))
+        if llm_settings is None:
+            return None
+        key = normalize_llm_settings(llm_settings)
+        with self._lock:
+            if key not in self._async_providers:
+                self._async_providers[key] = create_async_provider(provider, llm_settings, self.config)
+            return self._async_providers[key]
+
+    def stats(self):
+        return {
+            "providers": len(self._providers),
+            "routes": {task: self.llm_name_for_task(task) for task in set(DEFAULT_ROUTES) | set(self.routes)},
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_provider_registry(config, logger):
+    """Return the process-wide provider registry, creating it on first call."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProviderRegistry(config, logger)
+        return _registry
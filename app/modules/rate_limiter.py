@@ -0,0 +1,253 @@
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from app.modules.metrics import metrics, estimate_tokens
+from app.modules.scheduler import current_api_key
+
+# Tokens used by the LLM calls of the request being handled, filled in by the
+# instrumented providers and used to settle the rate limit charge.
+current_usage = contextvars.ContextVar("current_usage", default=None)
+
+# Tokens an endpoint is expected to use on top of its input: search results or page
+# content added to the prompt plus the generation's max_tokens.
+DEFAULT_ESTIMATES = {
+    "chat": 2048,
+    "translate": 1024,
+    "search": 12288,
+    "wiki_summary": 8192,
+    "wikipedia_query": 4096,
+    "wikipedia_query_batch": 4096,  # per query
+    "product_comparison": 8192,
+    "reflective_response": 16384,
+}
+
+
+class TokenUsage:
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    @property
+    def total(self):
+        return self.prompt_tokens + self.completion_tokens
+
+
+def record_usage(prompt_tokens, completion_tokens):
+    usage = current_usage.get()
+    if usage is not None:
+        usage.add(prompt_tokens, completion_tokens)
+
+
+def _refill(tokens, updated_at, capacity, rate, now):
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryBucketStore:
+    """Token buckets of this process."""
+
+    shared = False
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, amount, capacity, rate):
+        """Take `amount` tokens if available; return 0, or the seconds until they will be."""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, capacity, rate, now)
+            if tokens < amount:
+                self._buckets[key] = (tokens, now)
+                return (amount - tokens) / rate
+            self._buckets[key] = (tokens - amount, now)
+            return 0
+
+    def adjust(self, key, amount, capacity, rate):
+        """Remove `amount` tokens (negative to give them back), going into debt if needed."""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            self._buckets[key] = (min(capacity, _refill(tokens, updated_at, capacity, rate, now) - amount), now)
+
+    def close(self):
+        pass
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, shared by every worker process of the host."""
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL)")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE.
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _update(self, key, capacity, rate, change):
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*(row or (capacity, now)), capacity, rate, now)
+            tokens, result = change(tokens)
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now))
+            connection.execute("COMMIT")
+            return result
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def take(self, key, amount, capacity, rate):
+        def change(tokens):
+            if tokens < amount:
+                return tokens, (amount - tokens) / rate
+            return tokens - amount, 0
+        return self._update(key, capacity, rate, change)
+
+    def adjust(self, key, amount, capacity, rate):
+        self._update(key, capacity, rate, lambda tokens: (min(capacity, tokens - amount), None))
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, api_key, retry_after, reason):
+        super().__init__(f"{api_key}: {reason}")
+        self.api_key = api_key
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Charge:
+    def __init__(self, api_key, endpoint, estimated, limits):
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.estimated = estimated
+        self.limits = limits
+        self.usage = TokenUsage()
+        self.settled = False
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiting per API key, configured by the `rate_limit` section of
+    config.yaml. Every request is charged its estimated prompt plus completion tokens
+    up front and rejected if the key's bucket cannot cover them; once the call is done
+    the charge is corrected with the tokens actually used.
+
+    `max_inflight_tokens` additionally sheds load when the estimated tokens of all
+    running requests of this process would exceed it, before the backend queue grows.
+    """
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        settings = config.config.get("rate_limit", {}) or {}
+        self.enabled = settings.get("enabled", False)
+        self.default_limits = {"tokens_per_minute": 100000, **(settings.get("default", {}) or {})}
+        self.api_keys = settings.get("api_keys", {}) or {}
+        self.estimates = {**DEFAULT_ESTIMATES, **(settings.get("estimates", {}) or {})}
+        self.max_inflight_tokens = settings.get("max_inflight_tokens")
+        self.inflight_tokens = 0
+        self._lock = threading.Lock()
+        self.store = None
+        if self.enabled:
+            if settings.get("store", "memory") == "sqlite":
+                self.store = SQLiteBucketStore(settings.get(
+                    "path", os.path.join(config.config.get("logs_path", "logs"), "rate_limit.db")))
+            else:
+                self.store = MemoryBucketStore()
+            self.logger.info(f"Rate limiting enabled with {type(self.store).__name__}.")
+
+    def limits_for(self, api_key):
+        limits = {**self.default_limits, **(self.api_keys.get(api_key, {}) or {})}
+        rate = limits["tokens_per_minute"] / 60
+        capacity = limits.get("burst", limits["tokens_per_minute"])
+        return capacity, rate
+
+    def estimate(self, endpoint, args):
+        # A list argument is a batch, charged as one request per item.
+        items = [item for arg in args for item in (arg if isinstance(arg, list) else [arg])]
+        requests = max([len(arg) for arg in args if isinstance(arg, list)], default=1)
+        text = " ".join(str(item) for item in items if isinstance(item, str))
+        return estimate_tokens(text) + self.estimates.get(endpoint, 1024) * requests
+
+    def admit(self, endpoint, args):
+        """Charge the current API key for a request, raising RateLimitExceeded if it cannot be served."""
+        if not self.enabled:
+            return None
+        api_key = current_api_key.get()
+        capacity, rate = self.limits_for(api_key)
+        # A request larger than the bucket could never pass, charge a full bucket instead.
+        estimated = min(self.estimate(endpoint, args), capacity)
+
+        with self._lock:
+            if self.max_inflight_tokens and self.inflight_tokens + estimated > self.max_inflight_tokens:
+                metrics.record_rate_limited(endpoint, "overloaded")
+                raise RateLimitExceeded(api_key, 1, "server overloaded")
+            self.inflight_tokens += estimated
+
+        try:
+            wait = self.store.take(api_key, estimated, capacity, rate)
+        except BaseException:
+            self._finish(estimated)
+            raise
+        if wait:
+            self._finish(estimated)
+            metrics.record_rate_limited(endpoint, "rate_limited")
+            raise RateLimitExceeded(api_key, max(1, int(wait + 0.999)), "token rate limit exceeded")
+        return Charge(api_key, endpoint, estimated, (capacity, rate))
+
+    def _finish(self, estimated):
+        with self._lock:
+            self.inflight_tokens -= estimated
+
+    def settle(self, charge):
+        """Correct the charge with the tokens the request actually used."""
+        if charge is None or charge.settled:
+            return
+        charge.settled = True
+        self._finish(charge.estimated)
+        difference = charge.usage.total - charge.estimated
+        metrics.record_charged_tokens(charge.endpoint, charge.usage.total)
+        if difference:
+            try:
+                self.store.adjust(charge.api_key, difference, *charge.limits)
+            except Exception as e:
+                self.logger.warning(f"Could not settle rate limit charge of {charge.api_key}: {e}")
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,195 @@
+import json
+import threading
+import types
+from app.modules.async_provider import connection_pool
+from app.modules.cancellation import GenerationCancelled
+from app.modules.scheduler import current_api_key
+from app.modules.tracing import current_span
+from app.modules.worker_pool import PoolRejectedError
+
+# Methods each module serves over HTTP (see app.module_service) and the worker pool
+# endpoint they run on. `_stream` methods take an `emit(event, data)` callback as last
+# argument and are served as Server-Sent Events.
+SERVICE_METHODS = {
+    "chat": {"chat": "chat", "chat_stream": "chat"},
+    "api": {"fetch_data": "fetch", "fetch_data_list": "fetch_list"},
+    "search": {"search": "search", "search_stream": "search"},
+    "wiki_summary": {"summarize_wikipedia_page": "wiki_summary"},
+    "wikipedia_query": {"process_wikipedia_query": "wikipedia_query",
+                        "process_wikipedia_queries": "wikipedia_query_batch"},
+    "product_comparison": {"compare_and_recommend": "product_comparison"},
+    "agentic_reflection": {"get_reflective_response": "reflective_response"},
+    "translation": {"translate": "translate", "translate_stream": "translate"},
+}
+
+
+class RemoteModuleError(Exception):
+    def __init__(self, module, method, status_code, detail):
+        super().__init__(f"{module}.{method} failed with {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _detail(response):
+    try:
+        return response.json().get("detail", response.text)
+    except ValueError:
+        return response.text
+
+
+def _parse_sse(lines):
+    """Yield (event, data) pairs from the lines of a Server-Sent Events body."""
+    event = None
+    for line in lines:
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:") and event is not None:
+            yield event, json.loads(line[len("data:"):].strip())
+            event = None
+
+
+async def _aparse_sse(lines):
+    event = None
+    async for line in lines:
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:") and event is not None:
+            yield event, json.loads(line[len("data:"):].strip())
+            event = None
+
+
+class RemoteModule:
+    """
+    Stand-in for a module running as its own service (`python -m app.module_service
+    <name>`), created by the module registry for the modules listed under
+    `gateway.services`. It has the module's SERVICE_METHODS and their `a`-prefixed async
+    variants, forwarded over keep-alive connections: async calls share the process-wide
+    connection pool, blocking calls (chat tools on worker threads) a pooled sync client.
+
+    The API key and trace context of the current request are passed on, so the service
+    schedules and traces the call as part of the same request.
+    """
+
+    remote = True
+    dependencies_available = True
+
+    def __init__(self, name, url, settings=None):
+        settings = settings or {}
+        self.name = name
+        self.url = url.rstrip("/")
+        self.methods = SERVICE_METHODS[name]
+        self.timeout = settings.get("timeout", 300)
+        self.connect_timeout = settings.get("connect_timeout", 5)
+        self.max_connections = settings.get("max_connections", 100)
+        self.max_keepalive_connections = settings.get("max_keepalive_connections", 20)
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        methods = self.__dict__.get("methods", {})
+        if attribute in methods:
+            def call(self, *args):
+                return self.call(attribute, *args)
+        elif attribute.startswith("a") and attribute[1:] in methods:
+            async def call(self, *args):
+                return await self.acall(attribute[1:], *args)
+        else:
+            raise AttributeError(attribute)
+        call.__name__ = attribute
+        return types.MethodType(call, self)
+
+    def supports_async(self):
+        return True
+
+    def _headers(self):
+        headers = {"X-API-Key": current_api_key.get()}
+        active = current_span.get()
+        if active is not None:
+            headers["traceparent"] = f"00-{active.trace_id}-{active.span_id}-{'01' if active.sampled else '00'}"
+        return headers
+
+    def _timeout(self):
+        import httpx
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+    def _sync_client(self):
+        with self._lock:
+            if self._client is None:
+                import httpx
+                self._client = httpx.Client(
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_keepalive_connections),
+                    timeout=self._timeout(),
+                )
+            return self._client
+
+    def _async_client(self):
+        return connection_pool.get_client(self.url, self.max_connections, self.max_keepalive_connections,
+                                          timeout=self.timeout, connect_timeout=self.connect_timeout)
+
+    def _raise_for_status(self, method, response):
+        if response.status_code < 400:
+            return
+        detail = _detail(response)
+        if response.status_code in (429, 503):
+            # The service's own worker pool is full, answer busy like a local pool would.
+            retry_after = int(response.headers.get("retry-after", 5))
+            raise PoolRejectedError(self.methods[method], response.status_code, retry_after, f"{self.name} service busy")
+        if response.status_code == 499:
+            raise GenerationCancelled(detail)
+        raise RemoteModuleError(self.name, method, response.status_code, detail)
+
+    def _split_emit(self, method, args):
+        if method.endswith("_stream"):
+            return list(args[:-1]), args[-1]
+        return list(args), None
+
+    def _forward_event(self, method, event, data, emit):
+        """Pass a streamed event on to `emit`; True once the result (`done`) arrived."""
+        if event == "error":
+            raise RemoteModuleError(self.name, method, 500, data)
+        if event == "done":
+            return True
+        emit(event, data)
+        return False
+
+    def call(self, method, *args):
+        args, emit = self._split_emit(method, args)
+        url = f"{self.url}/call/{method}"
+        client = self._sync_client()
+        if emit is None:
+            response = client.post(url, json={"args": args}, headers=self._headers())
+            self._raise_for_status(method, response)
+            return response.json()["result"]
+        with client.stream("POST", url, json={"args": args}, headers=self._headers()) as response:
+            if response.status_code >= 400:
+                response.read()
+                self._raise_for_status(method, response)
+            for event, data in _parse_sse(response.iter_lines()):
+                if self._forward_event(method, event, data, emit):
+                    return data
+        raise RemoteModuleError(self.name, method, 502, "stream ended without a result")
+
+    async def acall(self, method, *args):
+        args, emit = self._split_emit(method, args)
+        url = f"{self.url}/call/{method}"
+        client = self._async_client()
+        if emit is None:
+            response = await client.post(url, json={"args": args}, headers=self._headers(), timeout=self._timeout())
+            self._raise_for_status(method, response)
+            return response.json()["result"]
+        async with client.stream("POST", url, json={"args": args}, headers=self._headers(),
+                                 timeout=self._timeout()) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                self._raise_for_status(method, response)
+            async for event, data in _aparse_sse(response.aiter_lines()):
+                if self._forward_event(method, event, data, emit):
+                    return data
+        raise RemoteModuleError(self.name, method, 502, "stream ended without a result")
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
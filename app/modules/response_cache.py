@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+from app.modules.metrics import metrics
+
+
+class LRUCacheBackend:
+    """In-process cache bounded by the total size of the stored values (least recently used evicted first)."""
+
+    blocking = False
+    shared = False
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self.size -= len(value)
+
+    def close(self):
+        pass
+
+
+class SQLiteCacheBackend:
+    """Cache stored in a local SQLite file, shared by every worker process of the host."""
+
+    blocking = True
+    shared = True
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache "
+                "(key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)")
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, nor with forked workers.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                connection.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return bytes(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now))
+            connection.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class RedisProtocolError(Exception):
+    pass
+
+
+class RedisCacheBackend:
+    """
+    Cache stored in Redis (or anything speaking its protocol, e.g. Valkey or KeyDB).
+    Talks RESP over a plain socket, so no client library is needed. Size-bounded
+    eviction is left to the server's `maxmemory` policy.
+    """
+
+    blocking = True
+    shared = True
+
+    def __init__(self, url="redis://localhost:6379/0", prefix="srt-agent-api:", timeout=2):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.username = unquote(parts.username) if parts.username else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._pid = os.getpid()
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._socket.makefile("rb")
+        if self.password:
+            self._send(*(["AUTH", self.username, self.password] if self.username else ["AUTH", self.password]))
+        if self.db:
+            self._send("SELECT", str(self.db))
+
+    def _send(self, *args):
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            payload.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self._socket.sendall(b"".join(payload))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisProtocolError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisProtocolError(f"Unexpected reply: {line!r}")
+
+    def command(self, *args):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._socket is None or self._pid != os.getpid():
+                        # A socket inherited from the master process belongs to it.
+                        self._connect()
+                    return self._send(*args)
+                except (ConnectionError, OSError):
+                    # Reconnect once, e.g. after the server closed an idle connection.
+                    self.close()
+                    if attempt:
+                        raise
+
+    def get(self, key):
+        return self.command("GET", self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.command("SET", self.prefix + key, value, "PX", str(int(ttl * 1000)))
+
+    def delete(self, key):
+        self.command("DEL", self.prefix + key)
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+        self._socket = None
+        self._reader = None
+
+
+def normalize_text(value):
+    return " ".join(str(value).split())
+
+
+def normalize_title(title):
+    # Wikipedia treats underscores as spaces and capitalizes the first letter.
+    title = normalize_text(str(title).replace("_", " "))
+    return title[:1].upper() + title[1:]
+
+
+def normalize_url(url):
+    parts = urlsplit(str(url).strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+
+
+def normalize_casefold(value):
+    return normalize_text(value).casefold()
+
+
+def normalize_source_text(value):
+    # Whitespace inside a text to translate (newlines, indentation) is kept in the translation.
+    return str(value).strip()
+
+
+# How the arguments of every cacheable endpoint are normalized into the cache key.
+KEY_NORMALIZERS = {
+    "wiki_summary": [normalize_title],
+    "translate": [normalize_source_text, normalize_casefold, normalize_casefold],
+    "fetch": [normalize_url],
+    "fetch_list": [normalize_url],
+    "product_comparison": [normalize_casefold, normalize_casefold, normalize_casefold, normalize_casefold],
+    "wikipedia_query": [normalize_title, normalize_text],
+}
+
+def request_key(endpoint, *args):
+    """Key identifying a request by its endpoint and normalized arguments."""
+    normalized = [normalize(arg) for normalize, arg in zip(KEY_NORMALIZERS[endpoint], args)]
+    digest = hashlib.sha256(json.dumps([endpoint, normalized]).encode()).hexdigest()
+    return f"{endpoint}:{digest}"
+
+
+DEFAULT_TTLS = {
+    "wiki_summary": 86400,
+    "translate": 604800,
+    "fetch": 300,
+    "fetch_list": 300,
+    "product_comparison": 3600,
+}
+
+
+def is_empty(value):
+    # What modules return when they swallowed an upstream error (e.g. APIModule.fetch_data).
+    return value is None or value in ("", [], {})
+
+
+class CachedResponse:
+    def __init__(self, value, etag, expires_at, hit, stored=True):
+        self.value = value
+        self.etag = etag
+        self.expires_at = expires_at
+        self.hit = hit
+        self.stored = stored
+
+    @property
+    def max_age(self):
+        return max(int(self.expires_at - time.time()), 0)
+
+
+class ResponseCache:
+    """
+    Caches the responses of deterministic endpoints, configured by the `response_cache`
+    section of config.yaml. Keys are built from the normalized request arguments, so
+    `/wiki-summary/python` and `/wiki-summary/Python` share an entry.
+    """
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        settings = config.config.get("response_cache", {}) or {}
+        self.enabled = settings.get("enabled", False)
+        self.ttls = {**DEFAULT_TTLS, **(settings.get("ttl", {}) or {})}
+        self.backend = self._create_backend(settings) if self.enabled else None
+        if self.enabled:
+            self.logger.info(f"Response cache enabled with {type(self.backend).__name__}.")
+
+    def _create_backend(self, settings):
+        backend = settings.get("backend", "memory")
+        if backend == "memory":
+            return LRUCacheBackend(int(settings.get("max_memory_mb", 64) * 1024 * 1024))
+        if backend == "sqlite":
+            path = settings.get("path", os.path.join(self.config.config.get("logs_path", "logs"), "response_cache.db"))
+            return SQLiteCacheBackend(path, settings.get("max_entries", 10000))
+        if backend == "redis":
+            return RedisCacheBackend(settings.get("url", "redis://localhost:6379/0"),
+                                     settings.get("prefix", "srt-agent-api:"))
+        raise ValueError(f"Unsupported response cache backend: {backend}")
+
+    def enabled_for(self, endpoint):
+        return self.enabled and endpoint in KEY_NORMALIZERS and (self.ttls.get(endpoint) or 0) > 0
+
+    def key(self, endpoint, *args):
+        return request_key(endpoint, *args)
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get_or_compute(self, endpoint, args, compute):
+        """
+        Return a CachedResponse for the endpoint and arguments, awaiting `compute()` on a
+        miss. Empty results are not stored. Backend errors are logged and treated as
+        misses, never failing the request.
+        """
+        key = self.key(endpoint, *args)
+        try:
+            stored = await self._call(self.backend.get, key)
+        except Exception as e:
+            self.logger.warning(f"Response cache lookup failed: {e}")
+            stored = None
+        if stored is not None:
+            entry = json.loads(stored)
+            metrics.record_cache(endpoint, hit=True)
+            return CachedResponse(entry["value"], entry["etag"], entry["expires_at"], hit=True)
+
+        metrics.record_cache(endpoint, hit=False)
+        value = await compute()
+        if is_empty(value):
+            return CachedResponse(value, None, time.time(), hit=False, stored=False)
+        ttl = self.ttls[endpoint]
+        body = json.dumps(value, sort_keys=True, default=str)
+        entry = {"value": value, "etag": f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"',
+                 "expires_at": time.time() + ttl}
+        try:
+            await self._call(self.backend.set, key, json.dumps(entry, default=str).encode(), ttl)
+        except Exception as e:
+            self.logger.warning(f"Response cache update failed: {e}")
+        return CachedResponse(value, entry["etag"], entry["expires_at"], hit=False)
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
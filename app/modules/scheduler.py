@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import itertools
+import time
+from app.modules.metrics import metrics
+
+# API key (X-API-Key header) of the request being handled, set by the API middleware.
+current_api_key = contextvars.ContextVar("current_api_key", default="anonymous")
+
+# Priority classes, lower runs first.
+DEFAULT_CLASSES = {"interactive": 0, "standard": 1, "batch": 2}
+
+DEFAULT_ENDPOINT_CLASSES = {
+    "chat": "interactive",
+    "translate": "interactive",
+    "search": "standard",
+    "wiki_summary": "standard",
+    "wikipedia_query": "standard",
+    "wikipedia_query_batch": "batch",
+    "product_comparison": "batch",
+    "reflective_response": "batch",
+}
+
+# Expected generation length per endpoint, the max_tokens its module requests.
+DEFAULT_EXPECTED_TOKENS = {
+    "chat": 2048,
+    "translate": 1024,
+    "search": 4096,
+    "wiki_summary": 4096,
+    "wikipedia_query": 2048,
+    "wikipedia_query_batch": 32768,
+    "product_comparison": 4096,
+    "reflective_response": 8192,
+}
+
+
+class _Ticket:
+    def __init__(self, endpoint, priority_class, priority, tenant, start_tag, finish_tag, sequence):
+        self.endpoint = endpoint
+        self.priority_class = priority_class
+        self.priority = priority
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.sequence = sequence
+        self.queued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class Scheduler:
+    """
+    Orders access to a shared number of generation slots, configured by the `scheduler`
+    section of config.yaml.
+
+    Waiting requests are served by priority class (per endpoint) first. Within a class,
+    API keys share the slots by weighted fair queuing: every request gets a virtual
+    finish tag of `cost / weight` after the key's previous one, and the smallest tag
+    runs next, so a key sending many requests only delays its own. The cost is 1 per
+    request, or the endpoint's expected tokens with `shortest_job_first`. A request
+    gains one priority class per `aging` seconds waited, so batch work is never starved.
+    """
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        settings = config.config.get("scheduler", {}) or {}
+        self.enabled = settings.get("enabled", False)
+        self.max_concurrency = settings.get("max_concurrency", 4)
+        self.queue_timeout = settings.get("queue_timeout", 120)
+        self.aging = settings.get("aging", 30)
+        self.shortest_job_first = settings.get("shortest_job_first", False)
+        self.classes = {**DEFAULT_CLASSES, **(settings.get("classes", {}) or {})}
+        self.endpoint_classes = {**DEFAULT_ENDPOINT_CLASSES, **(settings.get("endpoints", {}) or {})}
+        self.expected_tokens = {**DEFAULT_EXPECTED_TOKENS, **(settings.get("expected_tokens", {}) or {})}
+        self.default_weight = settings.get("default_weight", 1)
+        self.weights = settings.get("api_keys", {}) or {}
+        self.active = 0
+        self.waiting = []
+        self.virtual_time = 0.0
+        self._last_finish = {}
+        self._sequence = itertools.count()
+
+    def class_for(self, endpoint):
+        return self.endpoint_classes.get(endpoint, "standard")
+
+    def _cost(self, endpoint):
+        return self.expected_tokens.get(endpoint, 1024) if self.shortest_job_first else 1
+
+    def _ticket(self, endpoint, tenant):
+        priority_class = self.class_for(endpoint)
+        weight = self.weights.get(tenant, self.default_weight)
+        start_tag = max(self.virtual_time, self._last_finish.get(tenant, 0.0))
+        finish_tag = start_tag + self._cost(endpoint) / weight
+        self._last_finish[tenant] = finish_tag
+        return _Ticket(endpoint, priority_class, self.classes.get(priority_class, 1), tenant,
+                       start_tag, finish_tag, next(self._sequence))
+
+    async def acquire(self, endpoint):
+        """Wait for a generation slot; raises asyncio.TimeoutError after `queue_timeout`."""
+        if not self.enabled:
+            return None
+        ticket = self._ticket(endpoint, current_api_key.get())
+        if self.active < self.max_concurrency and not self.waiting:
+            self._start(ticket)
+            return ticket
+
+        self.waiting.append(ticket)
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if ticket.future.done() and not ticket.future.cancelled():
+                # The slot was handed over while we gave up; pass it on.
+                self.release(ticket)
+            else:
+                ticket.future.cancel()
+                self.waiting.remove(ticket)
+            raise
+        return ticket
+
+    def try_acquire(self, endpoint, tenant):
+        """
+        Take a generation slot only if one is free and no request waits for it, without
+        waiting: returns (True, ticket) or (False, None).
+        """
+        if not self.enabled:
+            return True, None
+        if self.active >= self.max_concurrency or self.waiting:
+            return False, None
+        ticket = self._ticket(endpoint, tenant)
+        self._start(ticket)
+        return True, ticket
+
+    def _start(self, ticket):
+        self.active += 1
+        self.virtual_time = max(self.virtual_time, ticket.start_tag)
+        metrics.observe_scheduler_wait(ticket.priority_class, time.monotonic() - ticket.queued_at)
+        if not ticket.future.done():
+            ticket.future.set_result(True)
+
+    def _effective_priority(self, ticket, now):
+        aged = int((now - ticket.queued_at) / self.aging) if self.aging else 0
+        return ticket.priority - aged
+
+    def release(self, ticket):
+        if ticket is None:
+            return
+        self.active -= 1
+        if self.waiting and self.active < self.max_concurrency:
+            now = time.monotonic()
+            ticket = min(self.waiting, key=lambda t: (self._effective_priority(t, now), t.finish_tag, t.sequence))
+            self.waiting.remove(ticket)
+            self._start(ticket)
+
+    def stats(self):
+        depth = {name: 0 for name in self.classes}
+        for ticket in self.waiting:
+            depth[ticket.priority_class] = depth.get(ticket.priority_class, 0) + 1
+        return {"active": self.active, "max_concurrency": self.max_concurrency, "waiting": depth}
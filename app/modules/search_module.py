@@ -1,7 +1,7 @@
-from llama_cpp_agent.tools import WebSearchTool
 from llama_cpp_agent import MessagesFormatterType
 from llama_cpp_agent.llm_output_settings import LlmStructuredOutputSettings
 from app.modules.base_module import BaseModule
+from app.modules.tracing import traced
 
 
 class SearchModule(BaseModule):
@@ -10,7 +10,9 @@ class SearchModule(BaseModule):
         super().__init__(config, logger, required_modules)
 
         if self.dependencies_available:
-            self.provider = self._initialize_provider(config.default_llm_settings)
+            # WebSearchTool imports trafilatura and readability at module level.
+            from llama_cpp_agent.tools import WebSearchTool
+            self.provider = self._initialize_provider(task="search")
             self.agent = self._initialize_agent("You are a web search assistant.")
             self.search_tool = WebSearchTool(
                 self.provider,
@@ -36,10 +38,38 @@ class SearchModule(BaseModule):
         """
         return "Please write the message to the user."
 
+    @traced("search.search")
     def search(self, query):
         if not self.dependencies_available or not self.search_tool or not self.output_settings:
             return "Search functionality is disabled due to missing dependencies."
 
         result = self.agent.get_chat_response(query, llm_sampling_settings=self.settings,
-                                              structured_output_settings=self.output_settings)
+                                              structured_output_settings=self.output_settings,
+                                              add_message_to_chat_history=False,
+                                              add_response_to_chat_history=False)
         return result
+
+    @traced("search.search")
+    async def asearch(self, query):
+        if not self.dependencies_available or not self.search_tool or not self.output_settings:
+            return "Search functionality is disabled due to missing dependencies."
+
+        return await self._async_agent(self.agent).get_chat_response(
+            query, llm_sampling_settings=self.settings, structured_output_settings=self.output_settings,
+            add_message_to_chat_history=False, add_response_to_chat_history=False
+        )
+
+    @traced("search.search_stream")
+    def search_stream(self, query, emit):
+        if not self.dependencies_available or not self.search_tool or not self.output_settings:
+            return "Search functionality is disabled due to missing dependencies."
+
+        settings = self.provider.get_provider_default_settings()
+        settings.temperature = self.settings.temperature
+        settings.max_tokens = self.settings.max_tokens
+        settings.stream = True
+        return self.agent.get_chat_response(
+            query, llm_sampling_settings=settings, structured_output_settings=self.output_settings,
+            streaming_callback=lambda response: response.text and emit("token", response.text),
+            add_message_to_chat_history=False, add_response_to_chat_history=False
+        )
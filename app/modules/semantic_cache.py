@@ -0,0 +1,141 @@
+import contextvars
+import threading
+import time
+from app.modules.metrics import metrics
+from app.modules.scheduler import current_api_key
+from app.modules.tracing import span
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Names of the chat tools called while answering the current message; answers that
+# used a time-sensitive tool are not cached.
+current_tool_calls = contextvars.ContextVar("current_tool_calls", default=None)
+
+
+# Chat tools returning live data: the current time and whatever a fetched URL returns now.
+DEFAULT_SKIP_TOOLS = ["get_current_datetime", "fetch_data"]
+
+
+def record_tool_call(tool_name):
+    calls = current_tool_calls.get()
+    if calls is not None:
+        calls.append(tool_name)
+
+
+class VectorIndex:
+    """
+    Exact cosine similarity search over normalized embeddings, kept in one matrix.
+    Holds at most `max_entries` answers; the oldest ones are evicted first.
+    """
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self.vectors = None
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, vector, scope=None):
+        """Return (similarity, entry) of the nearest live entry of `scope`, or (0.0, None)."""
+        with self._lock:
+            self._purge_expired()
+            own = [i for i, entry in enumerate(self.entries) if entry.get("scope") == scope]
+            if not own:
+                return 0.0, None
+            similarities = self.vectors[own] @ vector
+            best = int(np.argmax(similarities))
+            return float(similarities[best]), self.entries[own[best]]
+
+    def add(self, vector, entry):
+        with self._lock:
+            vector = vector.reshape(1, -1)
+            self.vectors = vector if self.vectors is None else np.vstack([self.vectors, vector])
+            self.entries.append(entry)
+            overflow = len(self.entries) - self.max_entries
+            if overflow > 0:
+                self._keep(list(range(overflow, len(self.entries))))
+
+    def _purge_expired(self):
+        now = time.time()
+        live = [i for i, entry in enumerate(self.entries) if entry["expires_at"] > now]
+        if len(live) != len(self.entries):
+            self._keep(live)
+
+    def _keep(self, indices):
+        self.entries = [self.entries[i] for i in indices]
+        self.vectors = self.vectors[indices] if indices else None
+
+
+class SemanticCache:
+    """
+    Answers chat messages that are paraphrases of earlier ones from the earlier answer,
+    configured by the `semantic_cache` section of config.yaml. Messages are embedded with
+    the `embeddings_llm` model (loaded with sentence-transformers on first use). Answers
+    are only served to the API key they were generated for, and answers that used a
+    live-data tool (`skip_tools`) are not cached.
+    """
+
+    def __init__(self, config, logger, embed=None):
+        self.config = config
+        self.logger = logger
+        settings = config.config.get("semantic_cache", {}) or {}
+        self.enabled = settings.get("enabled", False)
+        self.threshold = settings.get("similarity_threshold", 0.92)
+        self.ttl = settings.get("ttl", 86400)
+        self.skip_tools = set(settings.get("skip_tools", DEFAULT_SKIP_TOOLS))
+        self.model_name = config.config.get("embeddings_llm", "BAAI/bge-small-en-v1.5")
+        self.index = VectorIndex(settings.get("max_entries", 5000))
+        self._embed = embed
+        self._model_lock = threading.Lock()
+        if self.enabled and not NUMPY_AVAILABLE:
+            self.logger.warning("Semantic cache needs numpy, disabling it.")
+            self.enabled = False
+
+    def _load_model(self):
+        with self._model_lock:
+            if self._embed is None:
+                from sentence_transformers import SentenceTransformer
+                self.logger.info(f"Loading embeddings model {self.model_name} for the semantic cache.")
+                model = SentenceTransformer(self.model_name)
+                self._embed = lambda text: model.encode(text, normalize_embeddings=True)
+        return self._embed
+
+    def embed(self, text):
+        vector = np.asarray(self._load_model()(" ".join(text.split())), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, message):
+        """Return (cached answer or None, embedding of the message to pass to `store`)."""
+        if not self.enabled:
+            return None, None
+        try:
+            with span("semantic_cache.lookup") as lookup_span:
+                vector = self.embed(message)
+                similarity, entry = self.index.search(vector, current_api_key.get())
+                lookup_span.set_attribute("similarity", similarity)
+        except ImportError as e:
+            self.logger.warning(f"Semantic cache disabled, embeddings model unavailable: {e}")
+            self.enabled = False
+            return None, None
+        hit = entry is not None and similarity >= self.threshold
+        metrics.record_cache("chat_semantic", hit)
+        if hit:
+            self.logger.debug(f"Semantic cache hit ({similarity:.3f}) for message: {message}")
+            return entry["answer"], vector
+        return None, vector
+
+    def store(self, message, vector, answer, tool_calls=()):
+        if not self.enabled or vector is None or answer is None:
+            return False
+        if self.skip_tools.intersection(tool_calls):
+            self.logger.debug(f"Not caching answer that used time-sensitive tools: {sorted(tool_calls)}")
+            return False
+        self.index.add(vector, {"question": message, "answer": answer, "scope": current_api_key.get(),
+                                "expires_at": time.time() + self.ttl})
+        return True
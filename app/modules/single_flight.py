@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from app.modules.metrics import metrics
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls: the first caller for a key starts the
+    computation and every caller arriving while it runs awaits the same result (or
+    exception). Nothing is kept once the computation finishes.
+
+    The computation runs in its own task, so a caller that times out or goes away
+    does not cancel it for the others.
+    """
+
+    def __init__(self, name="default"):
+        self.name = name
+        self._calls = {}
+
+    def in_flight(self):
+        return len(self._calls)
+
+    async def run(self, key, compute, timeout=None):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            metrics.record_coalesced(self.name)
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so it is not reported as unhandled when every caller timed out.
+        task.cancelled() or task.exception()
+
+
+class ThreadSingleFlight:
+    """Thread-based counterpart of SingleFlight for blocking calls made on worker threads."""
+
+    def __init__(self, name="default"):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, func, *args, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self._calls[key] = call
+        if not leader:
+            metrics.record_coalesced(self.name)
+            return call.result(timeout)
+
+        try:
+            result = func(*args)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+# Wikipedia pages being downloaded, shared by the wiki summary and wikipedia query modules.
+wikipedia_pages = ThreadSingleFlight("wikipedia_page")
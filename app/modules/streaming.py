@@ -0,0 +1,55 @@
+import asyncio
+import contextvars
+import json
+
+# The event sink of the request currently running on this thread, so that code deep
+# inside an agent (tool calls, send_message callbacks) can report progress.
+current_event_sink = contextvars.ContextVar("current_event_sink", default=None)
+
+
+def emit_event(event, data=None):
+    sink = current_event_sink.get()
+    if sink is not None:
+        sink(event, data)
+
+
+class EventStream:
+    """
+    Carries events produced by a module running on a worker thread to an asyncio consumer.
+
+    The worker calls `emit(event, data)` and finally `close()`; the event loop side
+    iterates the stream with `async for event, data in stream`.
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def _put(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop is gone, nobody is listening any more.
+            pass
+
+    def emit(self, event, data=None):
+        self._put((event, data))
+
+    def close(self):
+        self._put(self._CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.queue.get()
+        if item is self._CLOSED:
+            raise StopAsyncIteration
+        return item
+
+
+def format_sse(event, data):
+    payload = json.dumps(data, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,175 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# The span of the code currently running; worker threads inherit it through the
+# copied context (see WorkerPool.run).
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation, modelled after the OpenTelemetry span (ids, parent, attributes, status)."""
+
+    def __init__(self, name, trace_id, parent_id=None, sampled=True, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "OK"
+        self.status_message = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self, error=None):
+        if self.end_ns is not None:
+            return
+        if error is not None:
+            self.record_error(error)
+        self.end_ns = time.time_ns()
+        tracer.export(self)
+
+    @property
+    def duration(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self):
+        # Field names follow the OTLP JSON encoding.
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message or ""},
+        }
+
+
+class ConsoleExporter:
+    def export(self, span):
+        sys.stdout.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+class FileExporter:
+    """Appends finished spans as JSON lines."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a") as file:
+                file.write(line)
+
+
+class Tracer:
+    def __init__(self):
+        self.exporter = None
+        self.sample_rate = 1.0
+
+    def configure(self, config, logger=None):
+        settings = config.config.get("tracing", {}) or {}
+        exporter = settings.get("exporter", "none")
+        self.sample_rate = settings.get("sample_rate", 1.0)
+        if exporter == "console":
+            self.exporter = ConsoleExporter()
+        elif exporter == "file":
+            self.exporter = FileExporter(settings.get("file", os.path.join(config.config.get("logs_path", "logs"), "traces.jsonl")))
+        elif exporter == "none":
+            self.exporter = None
+        else:
+            raise ValueError(f"Unsupported tracing exporter: {exporter}")
+        if logger:
+            logger.info(f"Tracing exporter: {exporter}.")
+
+    def start_span(self, name, trace_id=None, parent_id=None, **attributes):
+        """
+        Start a span as child of the current span (or of the given trace/parent ids, for
+        incoming `traceparent` headers). The span is not made current; call `end()`.
+        """
+        parent = current_span.get()
+        if trace_id is None and parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+        sampled = random.random() < self.sample_rate
+        return Span(name, trace_id or f"{random.getrandbits(128):032x}", parent_id, sampled, attributes)
+
+    def export(self, span):
+        if self.exporter is not None and span.sampled:
+            self.exporter.export(span)
+
+
+tracer = Tracer()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Run the enclosed block in a new span, made current for nested spans."""
+    active = tracer.start_span(name, **attributes)
+    reset_token = current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.record_error(e)
+        raise
+    finally:
+        current_span.reset(reset_token)
+        active.end()
+
+
+def traced(name):
+    """Decorator wrapping every call of a function or coroutine function in a span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def current_trace_id():
+    active = current_span.get()
+    return active.trace_id if active is not None else None
+
+
+def parse_traceparent(header):
+    """Return (trace id, parent span id) from a W3C `traceparent` header, or (None, None)."""
+    parts = (header or "").strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        try:
+            int(parts[1], 16)
+            int(parts[2], 16)
+        except ValueError:
+            return None, None
+        return parts[1], parts[2]
+    return None, None
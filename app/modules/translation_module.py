@@ -1,21 +1,46 @@
-from llama_cpp_agent import LlamaCppAgent
-from llama_cpp_agent.providers import LlamaCppServerProvider
-from llama_cpp_agent.llm_output_settings import MessagesFormatterType
+from llama_cpp_agent import LlamaCppAgent, MessagesFormatterType
 from app.modules.base_module import BaseModule
+from app.modules.tracing import traced
 
 class TranslationModule(BaseModule):
     def __init__(self, config, logger):
         super().__init__(config, logger, ["llama_cpp_agent"])
         if self.dependencies_available:
-            self.provider = self._initialize_provider()
+            self.provider = self._initialize_provider(task="translation")
             self.agent = self._initialize_agent(
                 system_prompt="You are a highly skilled translator. Your task is to translate text from one language to another.",
                 predefined_messages_formatter_type=MessagesFormatterType.MISTRAL
             )
 
+    @traced("translation.translate")
     def translate(self, text, source_language, target_language):
         prompt = f"Translate the following text from {source_language} to {target_language}:\n\n{text}"
         self.logger.debug(f"Translating text: {text} from {source_language} to {target_language}")
-        response = self.agent.get_chat_response(prompt)
+        response = self.agent.get_chat_response(prompt, add_message_to_chat_history=False,
+                                               add_response_to_chat_history=False)
         self.logger.debug(f"Translation result: {response.strip()}")
         return response.strip()
+
+    @traced("translation.translate")
+    async def atranslate(self, text, source_language, target_language):
+        prompt = f"Translate the following text from {source_language} to {target_language}:\n\n{text}"
+        self.logger.debug(f"Translating text: {text} from {source_language} to {target_language}")
+        response = await self._async_agent(self.agent).get_chat_response(
+            prompt, add_message_to_chat_history=False, add_response_to_chat_history=False)
+        self.logger.debug(f"Translation result: {response.strip()}")
+        return response.strip()
+
+    @traced("translation.translate_stream")
+    def translate_stream(self, text, source_language, target_language, emit):
+        prompt = f"Translate the following text from {source_language} to {target_language}:\n\n{text}"
+        self.logger.debug(f"Streaming translation of: {text} from {source_language} to {target_language}")
+        settings = self.provider.get_provider_default_settings()
+        settings.stream = True
+        response = ""
+        for token in self.agent.get_chat_response(prompt, llm_sampling_settings=settings,
+                                                  returns_streaming_generator=True,
+                                                  add_message_to_chat_history=False,
+                                                  add_response_to_chat_history=False):
+            response += token
+            emit("token", token)
+        return response.strip()
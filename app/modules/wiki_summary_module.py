@@ -1,16 +1,29 @@
-from llama_cpp_agent.llm_output_settings import LlmStructuredOutputSettings, LlmStructuredOutputType
-from ragatouille.utils import get_wikipedia_page
+import asyncio
 from app.modules.base_module import BaseModule
+from app.modules.tracing import traced
+from app.modules.response_cache import normalize_title
+from app.modules.single_flight import wikipedia_pages
+from app.modules.page_store import get_page_store
+from app.modules.metrics import estimate_tokens
+from app.modules.worker_pool import map_in_pool, amap_in_pool
 from llama_cpp_agent.text_utils import RecursiveCharacterTextSplitter
 
+SYSTEM_PROMPT = "You are an advanced AI assistant, trained by OpenAI."
+# Tokens of the instructions around the text of a summarization prompt.
+PROMPT_OVERHEAD_TOKENS = 64
+PARTIAL_PROMPT = ("The following is one part of the Wikipedia page \"{title}\". Summarize it, keeping the "
+                  "names, dates and figures a summary of the whole page may need:\n\n{text}")
+FINAL_PROMPT = "Summarize the following text:\n\n{text}"
+
 class WikiSummaryModule(BaseModule):
     def __init__(self, config, logger):
-        required_modules = ["llama_cpp_agent", "ragatouille"]
+        required_modules = ["llama_cpp_agent"]
         super().__init__(config, logger, required_modules)
 
         if self.dependencies_available:
-            self.provider = self._initialize_provider(config.default_llm_settings)
-            self.agent = self._initialize_agent("You are an advanced AI assistant, trained by OpenAI.")
+            self.provider = self._initialize_provider(task="summary")
+            self.agent = self._initialize_agent(SYSTEM_PROMPT)
+            self.pages = get_page_store(config, logger)
             self.splitter = RecursiveCharacterTextSplitter(
                 separators=["\n\n", "\n", " ", ""],
                 chunk_size=512,
@@ -18,25 +31,123 @@ class WikiSummaryModule(BaseModule):
                 length_function=len,
                 keep_separator=True
             )
+            settings = config.config.get("wiki_summary", {}) or {}
+            self.tokens_per_summary = config.config.get("tokens_per_summary", 4096)
+            self.concurrency = settings.get("concurrency", 4)
+            self.partial_summary_tokens = settings.get("partial_summary_tokens", 512)
+            self.summary_tokens = settings.get("summary_tokens", 1024)
         else:
             self.logger.info("WikiSummary module dependencies are not installed. Disabling functionality.")
 
+    def _text_budget(self):
+        """Tokens of text summarized by one call: tokens_per_summary, as far as the model's context allows."""
+        output_tokens = max(self.partial_summary_tokens, self.summary_tokens)
+        available = (self.llm_settings.get("max_tokens", 4096) - output_tokens - PROMPT_OVERHEAD_TOKENS
+                     - estimate_tokens(SYSTEM_PROMPT))
+        return min(self.tokens_per_summary, available)
+
+    def _groups(self, texts, separator):
+        """Consecutive texts joined into as few groups as fit the text budget."""
+        budget = self._text_budget()
+        if budget < 2 * self.partial_summary_tokens:
+            raise ValueError(f"The model's context leaves {budget} tokens per summary, "
+                             f"too few to combine summaries of {self.partial_summary_tokens} tokens.")
+        groups, group, size = [], [], 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if group and size + tokens > budget:
+                groups.append(separator.join(group))
+                group, size = [], 0
+            group.append(text)
+            size += tokens
+        if group:
+            groups.append(separator.join(group))
+        return groups
+
+    def _plan(self, page_content):
+        chunks = self.splitter.split_text(page_content)
+        if not chunks:
+            raise ValueError("The page is empty.")
+        # The splitter keeps the separators, the chunks join back into the page.
+        return self._groups(chunks, "")
+
+    def _regroup(self, groups, partials):
+        regrouped = self._groups(partials, "\n\n")
+        if len(regrouped) >= len(groups):
+            raise ValueError("The partial summaries are too long to be combined.")
+        return regrouped
+
+    def _settings(self, max_tokens):
+        settings = self.provider.get_provider_default_settings()
+        settings.max_tokens = max_tokens
+        return settings
+
+    def _generate(self, prompt, max_tokens):
+        # Pages are not kept in the chat history, every summary starts from the system prompt.
+        return self.agent.get_chat_response(
+            prompt, llm_sampling_settings=self._settings(max_tokens),
+            add_message_to_chat_history=False, add_response_to_chat_history=False)
+
+    async def _agenerate(self, prompt, max_tokens):
+        return await self._async_agent(self.agent).get_chat_response(
+            prompt, llm_sampling_settings=self._settings(max_tokens),
+            add_message_to_chat_history=False, add_response_to_chat_history=False)
+
+    def _summarize(self, title, page_content):
+        """
+        Map-reduce summary: while the text does not fit one call, its groups are summarized
+        concurrently (at most `concurrency` at once, within the free worker pool slots, see
+        map_in_pool) and the partial summaries regrouped.
+        """
+        groups = self._plan(page_content)
+        level = 0
+        while len(groups) > 1:
+            level += 1
+            self.logger.info(f"Summarizing {len(groups)} parts of Wikipedia page {title} (level {level}).")
+            partials = map_in_pool(
+                lambda group: self._generate(PARTIAL_PROMPT.format(title=title, text=group),
+                                             self.partial_summary_tokens).strip(),
+                groups, self.concurrency, thread_name_prefix="wiki-summary")
+            groups = self._regroup(groups, partials)
+        return self._generate(FINAL_PROMPT.format(text=groups[0]), self.summary_tokens)
+
+    async def _asummarize(self, title, page_content):
+        groups = self._plan(page_content)
+
+        async def summarize(group):
+            summary = await self._agenerate(PARTIAL_PROMPT.format(title=title, text=group),
+                                            self.partial_summary_tokens)
+            return summary.strip()
+
+        level = 0
+        while len(groups) > 1:
+            level += 1
+            self.logger.info(f"Summarizing {len(groups)} parts of Wikipedia page {title} (level {level}).")
+            partials = await amap_in_pool(summarize, groups, self.concurrency)
+            groups = self._regroup(groups, partials)
+        return await self._agenerate(FINAL_PROMPT.format(text=groups[0]), self.summary_tokens)
+
+    @traced("wiki_summary.summarize")
     def summarize_wikipedia_page(self, page_title):
         if not self.dependencies_available:
             return "WikiSummary functionality is disabled due to missing dependencies."
 
         try:
-            page_content = get_wikipedia_page(page_title)
-            splits = self.splitter.split_text(page_content)
-            summary = self.agent.get_chat_response(
-                f"Summarize the following text:\n\n{splits}",
-                structured_output_settings=LlmStructuredOutputSettings.from_functions([self.write_message_to_user])
-            )
-            return summary
+            page = wikipedia_pages.run(normalize_title(page_title), self.pages.get, page_title)
+            return self._summarize(page.title, page.text)
         except Exception as e:
             self.logger.error(f"Error summarizing Wikipedia page {page_title}: {e}")
             raise ValueError(f"Error summarizing Wikipedia page: {e}")
 
-    @staticmethod
-    def write_message_to_user():
-        return "Please write the message to the user."
+    @traced("wiki_summary.summarize")
+    async def asummarize_wikipedia_page(self, page_title):
+        if not self.dependencies_available:
+            return "WikiSummary functionality is disabled due to missing dependencies."
+
+        try:
+            page = await asyncio.to_thread(
+                wikipedia_pages.run, normalize_title(page_title), self.pages.get, page_title)
+            return await self._asummarize(page.title, page.text)
+        except Exception as e:
+            self.logger.error(f"Error summarizing Wikipedia page {page_title}: {e}")
+            raise ValueError(f"Error summarizing Wikipedia page: {e}")
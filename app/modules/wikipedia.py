@@ -0,0 +1,119 @@
+import hashlib
+from urllib.parse import urlsplit, unquote, quote
+import requests
+from app.modules.response_cache import normalize_title
+
+WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = "srt-agent-api (https://github.com/SolidRusT/srt-agent-api)"
+
+
+class PageNotFoundError(ValueError):
+    pass
+
+
+class WikipediaPage:
+    """Plain text of a page and the validator of its version (revision id or ETag)."""
+
+    def __init__(self, title, text, validator):
+        self.title = title
+        self.text = text
+        self.validator = validator
+
+
+class MediaWikiFetcher:
+    """
+    Fetches plain text page extracts from the MediaWiki API. A page is revalidated by
+    asking for its latest revision id only, and downloaded again only if it changed.
+    """
+
+    def __init__(self, api_url=WIKIPEDIA_API_URL, timeout=10):
+        self.api_url = api_url
+        self.timeout = timeout
+
+    def _query(self, title, prop, **params):
+        response = requests.get(self.api_url, params={
+            "action": "query", "format": "json", "titles": title, "prop": prop, "redirects": 1, **params,
+        }, headers={"User-Agent": USER_AGENT}, timeout=self.timeout)
+        response.raise_for_status()
+        page = next(iter(response.json()["query"]["pages"].values()))
+        if "missing" in page or not page.get("revisions"):
+            raise PageNotFoundError(f"Wikipedia page not found: {title}")
+        return page
+
+    def fetch(self, title, validator=None):
+        """The page, or None if its revision is still `validator`."""
+        if validator is not None:
+            if self._query(title, "revisions", rvprop="ids")["revisions"][0]["revid"] == validator:
+                return None
+        page = self._query(title, "extracts|revisions", explaintext=1, rvprop="ids")
+        return WikipediaPage(title, page.get("extract") or "", page["revisions"][0]["revid"])
+
+
+class HttpFetcher:
+    """
+    Fetches plain text pages from `url`, in which `{title}` is replaced by the page title
+    (e.g. a mirror or an internal page service). A page is revalidated with
+    `If-None-Match` and its ETag, a 304 keeps the stored copy. Without an ETag the
+    validator is a hash of the text, and a page downloaded again with the same hash
+    keeps the stored copy (and the index built from it).
+    """
+
+    HASH_PREFIX = "sha256:"
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self, title, validator=None):
+        """The page, or None if its ETag or text hash is still `validator`."""
+        headers = {"User-Agent": USER_AGENT}
+        if validator is not None and not validator.startswith(self.HASH_PREFIX):
+            headers["If-None-Match"] = validator
+        response = requests.get(self.url.format(title=quote(title.replace(" ", "_"))), headers=headers,
+                                timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        if response.status_code == 404:
+            raise PageNotFoundError(f"Wikipedia page not found: {title}")
+        response.raise_for_status()
+        text = response.text
+        current = response.headers.get("ETag")
+        if current is None:
+            current = self.HASH_PREFIX + hashlib.sha256(text.encode()).hexdigest()
+            if current == validator:
+                return None
+        return WikipediaPage(title, text, current)
+
+
+def create_fetcher(settings):
+    fetcher = settings.get("fetcher", "mediawiki")
+    timeout = settings.get("timeout", 10)
+    if fetcher == "mediawiki":
+        return MediaWikiFetcher(settings.get("api_url", WIKIPEDIA_API_URL), timeout)
+    if fetcher == "http":
+        return HttpFetcher(settings["url"], timeout)
+    raise ValueError(f"Unsupported Wikipedia page fetcher: {fetcher}")
+
+
+def page_title(page):
+    """Normalized page title from a title or an article URL (https://en.wikipedia.org/wiki/Title)."""
+    if "://" in page:
+        path = urlsplit(page).path
+        if "/wiki/" in path:
+            page = unquote(path.split("/wiki/", 1)[1])
+    return normalize_title(page)
+
+
+def chunk_offsets(text, chunks):
+    """Character offset in `text` of every chunk produced by splitting it, -1 if not found."""
+    offsets = []
+    cursor = 0
+    for chunk in chunks:
+        position = text.find(chunk, cursor)
+        if position < 0:
+            # Splitters may strip whitespace at chunk boundaries; search from the start.
+            position = text.find(chunk.strip())
+        else:
+            cursor = position + 1
+        offsets.append(position)
+    return offsets
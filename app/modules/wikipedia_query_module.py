@@ -1,20 +1,31 @@
-from llama_cpp_agent.llm_output_settings import LlmStructuredOutputSettings, LlmStructuredOutputType
-from llama_cpp_agent.rag.rag_colbert_reranker import RAGColbertReranker
+import asyncio
+import os
+import threading
 from llama_cpp_agent.text_utils import RecursiveCharacterTextSplitter
-from ragatouille.utils import get_wikipedia_page
-from pydantic import BaseModel, Field
-from typing import List
 from app.modules.base_module import BaseModule
+from app.modules.tracing import traced
+from app.modules.single_flight import wikipedia_pages, ThreadSingleFlight
+from app.modules.wikipedia import page_title, chunk_offsets
+from app.modules.page_index import PageIndex, PageIndexStore
+from app.modules.page_store import get_page_store
+from app.modules.metrics import estimate_tokens
+from app.modules.cancellation import GenerationCancelled
+from app.modules.worker_pool import map_in_pool, amap_in_pool
+
+MB = 1024 * 1024
+# Tokens of the prompt template around the excerpts, and per excerpt for its label.
+PROMPT_OVERHEAD_TOKENS = 64
+EXCERPT_OVERHEAD_TOKENS = 4
+SYSTEM_PROMPT = "You are an advanced AI assistant, trained by OpenAI."
 
 class WikipediaQueryModule(BaseModule):
     def __init__(self, config, logger):
-        required_modules = ["llama_cpp_agent", "ragatouille", "chromadb"]
+        required_modules = ["llama_cpp_agent", "ragatouille", "sentence_transformers", "numpy"]
         super().__init__(config, logger, required_modules)
 
         if self.dependencies_available:
-            self.provider = self._initialize_provider(config.default_llm_settings)
-            self.agent = self._initialize_agent("You are an advanced AI assistant, trained by OpenAI.")
-            self.rag = RAGColbertReranker(persistent=False)
+            self.provider = self._initialize_provider(task="wikipedia_query")
+            self.agent = self._initialize_agent(SYSTEM_PROMPT)
             self.splitter = RecursiveCharacterTextSplitter(
                 separators=["\n\n", "\n", " ", ""],
                 chunk_size=512,
@@ -22,23 +33,216 @@ class WikipediaQueryModule(BaseModule):
                 length_function=len,
                 keep_separator=True
             )
+            settings = config.config.get("wikipedia_index", {}) or {}
+            self.index_store = PageIndexStore(
+                settings.get("path", os.path.join(config.config.get("logs_path", "logs"), "wikipedia_index")),
+                int(settings.get("max_memory_mb", 256) * MB), int(settings.get("max_disk_mb", 2048) * MB), logger)
+            self.batch_size = settings.get("batch_size", 32)
+            self.embeddings_model_name = config.config.get("embeddings_llm", "BAAI/bge-small-en-v1.5")
+            self.embedder = None
+            self._embedder_lock = threading.Lock()
+            self._indexing = ThreadSingleFlight("wikipedia_index")
+            self.pages = get_page_store(config, logger)
+            retrieval = config.config.get("wikipedia_retrieval", {}) or {}
+            self.candidates = retrieval.get("candidates", 20)
+            self.rerank = retrieval.get("rerank", True)
+            self.rerank_model_name = retrieval.get("rerank_model", "colbert-ir/colbertv2.0")
+            self.answer_tokens = retrieval.get("answer_tokens", 2048)
+            self.max_context_tokens = retrieval.get("max_context_tokens", 3072)
+            self.batch_concurrency = retrieval.get("batch_concurrency", 4)
+            self.reranker = None
+            self._reranker_lock = threading.Lock()
         else:
             self.logger.info("Wikipedia Query module dependencies are not installed. Disabling functionality.")
 
+    def _embed(self, texts):
+        with self._embedder_lock:
+            if self.embedder is None:
+                from sentence_transformers import SentenceTransformer
+                self.logger.info(f"Loading embeddings model {self.embeddings_model_name} for Wikipedia queries.")
+                self.embedder = SentenceTransformer(self.embeddings_model_name)
+        return self.embedder.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+
+    def _rerank(self, queries, documents):
+        """ColBERT results of every query over `documents`, which are encoded once for all queries."""
+        # ColBERT keeps the documents being reranked on the model, so calls are serialized.
+        with self._reranker_lock:
+            if self.reranker is None:
+                from ragatouille import RAGPretrainedModel
+                self.logger.info(f"Loading reranker {self.rerank_model_name} for Wikipedia queries.")
+                self.reranker = RAGPretrainedModel.from_pretrained(self.rerank_model_name)
+            results = self.reranker.rerank(query=queries, documents=documents, k=len(documents))
+        # The results of a single query are not wrapped in a list.
+        return [results] if results and isinstance(results[0], dict) else results
+
+    @traced("wikipedia_query.index_page")
+    def _index_page(self, page_url):
+        """Return the index of the page's current revision, built once per revision."""
+        title = page_title(page_url)
+        page = wikipedia_pages.run(title, self.pages.get, title)
+        index = self.index_store.get(title, page.validator)
+        if index is None:
+            # Concurrent queries for a page that is not indexed yet share one build.
+            index = self._indexing.run((title, page.validator), self._build_index, page)
+        return index
+
+    def _build_index(self, page):
+        if not page.text:
+            raise ValueError(f"Wikipedia page is empty: {page.title}")
+        chunks = self.splitter.split_text(page.text)
+        # Chunks are embedded in batches of `batch_size`.
+        index = PageIndex(page.title, page.validator, chunks, chunk_offsets(page.text, chunks), self._embed(chunks))
+        self.index_store.put(index)
+        self.logger.info(f"Indexed {len(chunks)} chunks of Wikipedia page {page.title} (revision {page.validator}).")
+        return index
+
+    @traced("wikipedia_query.retrieve")
+    def _retrieve(self, index, queries):
+        """(score, chunk number) of the chunks most relevant to each query, best first."""
+        candidates = [index.search(vector, self.candidates) for vector in self._embed(queries)]
+        numbers = sorted({number for ranked in candidates for _, number in ranked})
+        if not self.rerank or len(numbers) < 2:
+            return candidates
+        reranked = self._rerank(queries, [index.chunks[number] for number in numbers])
+        # Every query is ranked against the candidates of the whole batch, keep its own.
+        retrieved = []
+        for ranked, results in zip(candidates, reranked):
+            own = {number for _, number in ranked}
+            retrieved.append([(float(result["score"]), numbers[result["result_index"]]) for result in results
+                              if numbers[result["result_index"]] in own])
+        return retrieved
+
+    def _context_budget(self, query):
+        """Tokens left for page excerpts once the system prompt, question and answer fit the context."""
+        available = (self.llm_settings.get("max_tokens", 4096) - self.answer_tokens - PROMPT_OVERHEAD_TOKENS
+                     - estimate_tokens(SYSTEM_PROMPT) - estimate_tokens(query))
+        if self.max_context_tokens:
+            available = min(available, self.max_context_tokens)
+        return max(available, 0)
+
+    @staticmethod
+    def _pack(index, ranked, budget):
+        """The best ranked chunks that fit in `budget` tokens, in rank order."""
+        selected = []
+        for score, number in ranked:
+            tokens = estimate_tokens(index.chunks[number]) + EXCERPT_OVERHEAD_TOKENS
+            if tokens <= budget:
+                selected.append((score, number))
+                budget -= tokens
+        return selected
+
+    def _prompt(self, index, query, ranked):
+        """Prompt grounded in the best ranked excerpts that fit the budget, and their sources."""
+        selected = self._pack(index, ranked, self._context_budget(query))
+        if not selected:
+            raise ValueError(f"No part of the Wikipedia page {index.title} fits in the context of the model.")
+        excerpts = "\n\n".join(f"[{n}] {index.chunks[number].strip()}" for n, (_, number) in enumerate(selected, 1))
+        prompt = (f"Consider the following excerpts of the Wikipedia page \"{index.title}\":\n"
+                  f"==========Excerpts===========\n{excerpts}\n======================\n"
+                  f"Answer the following question using only these excerpts: {query}")
+        sources = [{"offset": index.offsets[number], "length": len(index.chunks[number]), "score": score}
+                   for score, number in selected]
+        self.logger.debug(f"Answering from {len(selected)} of {len(index)} chunks of {index.title}, "
+                          f"{estimate_tokens(prompt)} prompt tokens.")
+        return prompt, sources
+
+    def _prepare(self, page_url, queries):
+        """Index the page once and retrieve the ranked chunks of every query."""
+        index = self._index_page(page_url)
+        return index, self._retrieve(index, queries)
+
+    def _sampling_settings(self):
+        settings = self.provider.get_provider_default_settings()
+        settings.max_tokens = self.answer_tokens
+        return settings
+
+    def _generate(self, prompt):
+        # Excerpts are not kept in the chat history, so every query gets the full budget.
+        return self.agent.get_chat_response(
+            prompt, llm_sampling_settings=self._sampling_settings(),
+            add_message_to_chat_history=False, add_response_to_chat_history=False)
+
+    async def _agenerate(self, prompt):
+        return await self._async_agent(self.agent).get_chat_response(
+            prompt, llm_sampling_settings=self._sampling_settings(),
+            add_message_to_chat_history=False, add_response_to_chat_history=False)
+
+    @traced("wikipedia_query.query")
     def process_wikipedia_query(self, page_url, query):
         try:
-            page_content = get_wikipedia_page(page_url)
-            splits = self.splitter.split_text(page_content)
-            for split in splits:
-                self.rag.add_document(split)
+            index, [ranked] = self._prepare(page_url, [query])
+            prompt, sources = self._prompt(index, query, ranked)
+            return {"answer": self._generate(prompt), "page": index.title, "revision": index.revision,
+                    "sources": sources}
+        except Exception as e:
+            self.logger.error(f"Error processing Wikipedia query for page: {page_url} and query: {query}, error: {e}")
+            raise ValueError(f"Error processing Wikipedia query: {e}")
 
-            output_settings = LlmStructuredOutputSettings.from_functions([self.write_message_to_user])
-            result = self.agent.get_chat_response(query, structured_output_settings=output_settings)
-            return result
+    @traced("wikipedia_query.query")
+    async def aprocess_wikipedia_query(self, page_url, query):
+        try:
+            index, [ranked] = await asyncio.to_thread(self._prepare, page_url, [query])
+            prompt, sources = self._prompt(index, query, ranked)
+            return {"answer": await self._agenerate(prompt), "page": index.title, "revision": index.revision,
+                    "sources": sources}
         except Exception as e:
             self.logger.error(f"Error processing Wikipedia query for page: {page_url} and query: {query}, error: {e}")
             raise ValueError(f"Error processing Wikipedia query: {e}")
 
-    @staticmethod
-    def write_message_to_user():
-        return "Please write the message to the user."
+    @traced("wikipedia_query.query_batch")
+    def process_wikipedia_queries(self, page_url, queries):
+        """
+        Answer several questions about one page. The page is indexed once, the questions
+        are embedded and reranked together and up to `batch_concurrency` answers are
+        generated at once, within the free worker pool slots (see map_in_pool). Results
+        are in the order of `queries`.
+        """
+        try:
+            index, retrieved = self._prepare(page_url, queries)
+        except Exception as e:
+            self.logger.error(f"Error processing Wikipedia queries for page: {page_url}, error: {e}")
+            raise ValueError(f"Error processing Wikipedia queries: {e}")
+
+        def answer(item):
+            query, ranked = item
+            result = {"query": query, "sources": []}
+            try:
+                prompt, result["sources"] = self._prompt(index, query, ranked)
+                result["answer"] = self._generate(prompt)
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                # A failed question does not fail the others.
+                self.logger.error(f"Error processing Wikipedia query for page: {page_url} and query: {query}, "
+                                  f"error: {e}")
+                result["error"] = str(e)
+            return result
+
+        results = map_in_pool(answer, list(zip(queries, retrieved)), self.batch_concurrency,
+                              thread_name_prefix="wikipedia-query")
+        return {"page": index.title, "revision": index.revision, "results": results}
+
+    @traced("wikipedia_query.query_batch")
+    async def aprocess_wikipedia_queries(self, page_url, queries):
+        try:
+            index, retrieved = await asyncio.to_thread(self._prepare, page_url, queries)
+        except Exception as e:
+            self.logger.error(f"Error processing Wikipedia queries for page: {page_url}, error: {e}")
+            raise ValueError(f"Error processing Wikipedia queries: {e}")
+
+        async def answer(item):
+            query, ranked = item
+            result = {"query": query, "sources": []}
+            try:
+                prompt, result["sources"] = self._prompt(index, query, ranked)
+                result["answer"] = await self._agenerate(prompt)
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error processing Wikipedia query for page: {page_url} and query: {query}, "
+                                  f"error: {e}")
+                result["error"] = str(e)
+            return result
+
+        results = await amap_in_pool(answer, list(zip(queries, retrieved)), self.batch_concurrency)
+        return {"page": index.title, "revision": index.revision, "results": list(results)}
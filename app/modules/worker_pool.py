@@ -0,0 +1,253 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.modules.metrics import metrics
+from app.modules.scheduler import Scheduler, current_api_key
+
+# The worker pool call running in this context, as (pool, endpoint, event loop), so
+# calls that fan out into several generations can share its limits (see map_in_pool).
+current_pool_call = contextvars.ContextVar("current_pool_call", default=None)
+
+
+class PoolRejectedError(Exception):
+    """
+    Raised when an endpoint cannot accept more work, either because its wait queue
+    is full or because a queued request waited too long for a free worker.
+    """
+
+    def __init__(self, endpoint, status_code, retry_after, reason):
+        super().__init__(f"{endpoint}: {reason}")
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class EndpointLimiter:
+    def __init__(self, name, max_concurrency, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    def is_saturated(self):
+        return self.active >= self.max_concurrency and self.waiting >= self.max_queue
+
+
+def configured_max_workers(config):
+    """Threads of the worker pool: `max_workers`, or enough for every endpoint to run at its full concurrency."""
+    settings = config.config.get("worker_pool", {}) or {}
+    if "max_workers" in settings:
+        return settings["max_workers"]
+    default = {**WorkerPool.DEFAULT_LIMITS, **(settings.get("default", {}) or {})}["max_concurrency"]
+    total = sum((limits or {}).get("max_concurrency", default)
+                for limits in (settings.get("endpoints", {}) or {}).values())
+    return max(total, default * 4)
+
+
+def map_in_pool(func, items, max_workers, thread_name_prefix="pool-map"):
+    """
+    Call `func` on every item, at most `max_workers` at once, and return the results in order.
+
+    Within a worker pool call the calls run on the call's own slot plus as many slots of
+    its endpoint and of the scheduler as are free when the map starts (without waiting for
+    more, the call's own slot always makes progress), so a fan-out stays within the
+    configured concurrency. Outside the worker pool (the CLI) it uses `max_workers` threads.
+    """
+    workers = max(1, min(max_workers, len(items)))
+    call = current_pool_call.get()
+    extra = []
+    if call is not None and workers > 1:
+        pool, endpoint, loop = call
+        extra = asyncio.run_coroutine_threadsafe(
+            pool._take_free_slots(endpoint, workers - 1, current_api_key.get()), loop).result()
+        workers = 1 + len(extra)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix) as executor:
+            # Every call runs in a copy of the request's context (trace span, cancellation, usage).
+            futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+            return [future.result() for future in futures]
+    finally:
+        for acquired in extra:
+            pool._release_threadsafe(loop, acquired)
+
+
+async def amap_in_pool(func, items, max_workers):
+    """Async variant of map_in_pool for a coroutine function, run on the event loop."""
+    workers = max(1, min(max_workers, len(items)))
+    call = current_pool_call.get()
+    extra = []
+    if call is not None and workers > 1:
+        pool, endpoint, _ = call
+        extra = await pool._take_free_slots(endpoint, workers - 1, current_api_key.get())
+        workers = 1 + len(extra)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    try:
+        # Every call finishes before the slots are given back, like the threads of map_in_pool.
+        results = await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+    finally:
+        for acquired in extra:
+            pool._release(acquired)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+class WorkerPool:
+    """
+    Runs blocking module calls on a dedicated thread pool so the event loop stays free.
+
+    Every endpoint gets its own concurrency limit and a bounded wait queue. When the
+    queue is full the call is rejected immediately (429) and when a queued call cannot
+    get a worker within `queue_timeout` seconds it is rejected with 503.
+
+    When the scheduler is enabled, calls that got past their endpoint limit then wait
+    for one of the scheduler's shared generation slots (see Scheduler).
+    """
+
+    DEFAULT_LIMITS = {"max_concurrency": 2, "max_queue": 8, "queue_timeout": 30}
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        settings = config.config.get("worker_pool", {}) or {}
+        self.retry_after = settings.get("retry_after", 5)
+        self.default_limits = {**self.DEFAULT_LIMITS, **(settings.get("default", {}) or {})}
+        self.endpoint_settings = settings.get("endpoints", {}) or {}
+        self.max_workers = configured_max_workers(config)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-worker")
+        self.limiters = {}
+        self.scheduler = Scheduler(config, logger)
+        self._shutting_down = False
+        self.logger.info(f"Worker pool started with {self.max_workers} workers.")
+
+    def get_limiter(self, endpoint):
+        limiter = self.limiters.get(endpoint)
+        if limiter is None:
+            limits = {**self.default_limits, **(self.endpoint_settings.get(endpoint, {}) or {})}
+            limiter = EndpointLimiter(
+                endpoint,
+                limits["max_concurrency"],
+                limits["max_queue"],
+                limits["queue_timeout"],
+            )
+            self.limiters[endpoint] = limiter
+        return limiter
+
+    async def _acquire(self, endpoint):
+        limiter = self.get_limiter(endpoint)
+        if limiter.is_saturated():
+            self.logger.warning(f"Rejecting {endpoint} request: {limiter.waiting} requests already queued.")
+            raise PoolRejectedError(endpoint, 429, self.retry_after, "too many queued requests")
+
+        limiter.waiting += 1
+        queued = time.monotonic()
+        try:
+            await asyncio.wait_for(limiter.semaphore.acquire(), timeout=limiter.queue_timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Rejecting {endpoint} request: no worker became free in {limiter.queue_timeout}s.")
+            raise PoolRejectedError(endpoint, 503, self.retry_after, "timed out waiting for a worker")
+        finally:
+            limiter.waiting -= 1
+            metrics.observe_queue_wait(endpoint, time.monotonic() - queued)
+
+        try:
+            ticket = await self.scheduler.acquire(endpoint)
+        except asyncio.TimeoutError:
+            limiter.semaphore.release()
+            self.logger.warning(f"Rejecting {endpoint} request: no generation slot in {self.scheduler.queue_timeout}s.")
+            raise PoolRejectedError(endpoint, 503, self.retry_after, "timed out waiting for a generation slot")
+        except BaseException:
+            limiter.semaphore.release()
+            raise
+
+        limiter.active += 1
+        return limiter, ticket
+
+    async def _take_free_slots(self, endpoint, count, api_key):
+        """Up to `count` more slots of the endpoint and the scheduler, as far as they are free right now."""
+        limiter = self.get_limiter(endpoint)
+        taken = []
+        while len(taken) < count and not limiter.semaphore.locked():
+            await limiter.semaphore.acquire()
+            acquired, ticket = self.scheduler.try_acquire(endpoint, api_key)
+            if not acquired:
+                limiter.semaphore.release()
+                break
+            limiter.active += 1
+            taken.append((limiter, ticket))
+        return taken
+
+    def _release(self, acquired):
+        limiter, ticket = acquired
+        self.scheduler.release(ticket)
+        limiter.active -= 1
+        limiter.semaphore.release()
+
+    async def run(self, endpoint, func, *args, **kwargs):
+        acquired = await self._acquire(endpoint)
+        loop = asyncio.get_running_loop()
+        # The executor does not carry contextvars over; copy them so the worker
+        # sees the request's trace span.
+        context = contextvars.copy_context()
+        context.run(current_pool_call.set, (self, endpoint, loop))
+        try:
+            if self._shutting_down:
+                raise RuntimeError("worker pool is shutting down")
+            future = self.executor.submit(context.run, functools.partial(func, *args, **kwargs))
+        except RuntimeError:
+            self._release(acquired)
+            if self._shutting_down:
+                raise PoolRejectedError(endpoint, 503, self.retry_after, "worker pool is shutting down")
+            raise
+        # The slot is held until the thread is done, not until the awaiting task is: a
+        # cancelled request whose call has no cancellation checkpoint still runs to the end.
+        future.add_done_callback(lambda _: self._release_threadsafe(loop, acquired))
+        return await asyncio.wrap_future(future)
+
+    def _release_threadsafe(self, loop, acquired):
+        try:
+            loop.call_soon_threadsafe(self._release, acquired)
+        except RuntimeError:
+            # The event loop is closed, nothing waits for the slot anymore.
+            pass
+
+    async def run_async(self, endpoint, func, *args, **kwargs):
+        """
+        Await a coroutine function on the event loop under the same per-endpoint limits
+        as `run`, without occupying a worker thread.
+        """
+        acquired = await self._acquire(endpoint)
+        call_token = current_pool_call.set((self, endpoint, asyncio.get_running_loop()))
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_pool_call.reset(call_token)
+            self._release(acquired)
+
+    def stats(self):
+        return {
+            name: {
+                "active": limiter.active,
+                "waiting": limiter.waiting,
+                "max_concurrency": limiter.max_concurrency,
+                "max_queue": limiter.max_queue,
+            }
+            for name, limiter in self.limiters.items()
+        }
+
+    def shutdown(self, wait=True):
+        self.logger.info("Shutting down worker pool.")
+        self._shutting_down = True
+        self.executor.shutdown(wait=wait, cancel_futures=True)
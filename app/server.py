@@ -0,0 +1,42 @@
+import asyncio
+import gc
+import importlib
+
+
+def run_preforked(module_path, host, port, workers, preload=True, timeout=600, logger=None):
+    """
+    Serve `<module_path>:app` with gunicorn and `workers` uvicorn worker processes.
+
+    With `preload` the app module is imported and its startup modules (providers,
+    agents, rerankers, embedding models) are initialized in the master before forking,
+    so their read-only memory is shared copy-on-write by all workers instead of being
+    loaded once per worker.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    service = importlib.import_module(module_path)
+    if preload:
+        asyncio.run(service.module_registry.initialize(service.startup_modules))
+        # Keep the garbage collector from touching (and so un-sharing) the pages of
+        # everything loaded so far.
+        gc.freeze()
+        if logger:
+            logger.info(f"Modules preloaded, forking {workers} workers.")
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": preload,
+        "timeout": timeout,
+    }
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return service.app
+
+    Application().run()
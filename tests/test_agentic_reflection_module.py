@@ -19,5 +19,15 @@ class TestAgenticReflectionModule(unittest.TestCase):
         response = self.agentic_reflection_module.get_reflective_response("Test input")
         self.assertEqual(response, "Approved response")
 
+    @patch('app.modules.agentic_reflection_module.LlamaCppAgent')
+    def test_every_call_has_its_own_chat_history(self, mock_agent):
+        mock_agent.return_value.get_chat_response.return_value = '{"response_state": "approved"}'
+
+        self.agentic_reflection_module.get_reflective_response("First input")
+        self.agentic_reflection_module.get_reflective_response("Second input")
+        histories = [call.kwargs["chat_history"] for call in mock_agent.call_args_list]
+        self.assertEqual(len(histories), 4)
+        self.assertEqual(len({id(history) for history in histories}), 4)
+
 if __name__ == '__main__':
     unittest.main()
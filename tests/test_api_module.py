@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 import requests
 from unittest.mock import patch, Mock
@@ -5,6 +6,12 @@ from app.modules.api_module import APIModule
 from srt_core.config import Config
 from srt_core.utils.logger import Logger
 
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
 class TestAPIModule(unittest.TestCase):
     def setUp(self):
         self.config = Config()
@@ -49,5 +56,15 @@ class TestAPIModule(unittest.TestCase):
         data_list = self.api_module.fetch_data_list('https://example.com/api')
         self.assertIsNone(data_list)
 
+    @unittest.skipUnless(HTTPX_AVAILABLE, "needs httpx")
+    def test_afetch_data_non_json_body(self):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(
+                    lambda request: httpx.Response(200, text="<html>not json</html>"))) as client:
+                with patch('app.modules.async_provider.connection_pool.get_client', return_value=client):
+                    return await self.api_module.afetch_data('https://example.com/api')
+
+        self.assertIsNone(asyncio.run(run()))
+
 if __name__ == '__main__':
     unittest.main()
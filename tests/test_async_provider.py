@@ -0,0 +1,102 @@
+import asyncio
+import json
+import unittest
+from app.modules.async_provider import (
+    AsyncConnectionPool,
+    AsyncPooledProvider,
+    AsyncVLLMServerProvider,
+    _backend_limits,
+)
+from app.modules.backend_pool import Backend, BackendPool, CircuitBreaker
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+class FakeSettings:
+    def __init__(self, **values):
+        self.values = values
+        self.max_tokens = values.get("max_tokens", 0)
+
+    def as_dict(self):
+        return dict(self.values)
+
+@unittest.skipUnless(HTTPX_AVAILABLE, "needs httpx")
+class TestAsyncProvider(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.requests = []
+
+    def _client(self, handler):
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+        return httpx.AsyncClient(transport=httpx.MockTransport(record))
+
+    def test_vllm_completion(self):
+        client = self._client(lambda request: httpx.Response(200, json={"choices": [{"text": "Hello"}]}))
+        provider = AsyncVLLMServerProvider(None, client, "http://backend/v1/", "some/model", api_key="key")
+
+        result = asyncio.run(provider.create_completion("Hi", None, FakeSettings(temperature=0.5)))
+
+        self.assertEqual(result, "Hello")
+        request = self.requests[0]
+        self.assertEqual(str(request.url), "http://backend/v1/completions")
+        self.assertEqual(request.headers["Authorization"], "Bearer key")
+        body = json.loads(request.content)
+        self.assertEqual(body["prompt"], "Hi")
+        self.assertEqual(body["model"], "some/model")
+        self.assertFalse(body["stream"])
+        self.assertEqual(body["temperature"], 0.5)
+
+    def test_vllm_stream_completion(self):
+        chunks = "".join(f"data: {json.dumps({'choices': [{'text': text}]})}\n\n" for text in ("Hel", "lo"))
+        client = self._client(lambda request: httpx.Response(200, text=chunks + "data: [DONE]\n\n"))
+        provider = AsyncVLLMServerProvider(None, client, "http://backend/v1", "some/model")
+
+        async def run():
+            return [text async for text in provider.stream_completion("Hi", None, FakeSettings())]
+
+        self.assertEqual(asyncio.run(run()), ["Hel", "lo"])
+        self.assertTrue(json.loads(self.requests[0].content)["stream"])
+
+    def test_pooled_stream_fails_over_before_first_token(self):
+        chunks = f"data: {json.dumps({'choices': [{'text': 'Hi'}]})}\n\ndata: [DONE]\n\n"
+        down = self._client(lambda request: httpx.Response(503))
+        up = self._client(lambda request: httpx.Response(200, text=chunks))
+        providers = {
+            "http://down": AsyncVLLMServerProvider(None, down, "http://down", "some/model"),
+            "http://up": AsyncVLLMServerProvider(None, up, "http://up", "some/model"),
+        }
+        backends = [Backend(url, None, CircuitBreaker()) for url in providers]
+        provider = AsyncPooledProvider(BackendPool("erebus", backends, Logger()), providers)
+
+        async def run():
+            return [text async for text in provider.stream_completion("Hi", None, FakeSettings())]
+
+        self.assertEqual(asyncio.run(run()), ["Hi"])
+        self.assertEqual(backends[0].failures, 1)
+        self.assertEqual(backends[1].outstanding, 0)
+
+    def test_connection_pool_reuses_client_per_backend(self):
+        pool = AsyncConnectionPool()
+        first = pool.get_client("http://backend-a")
+        self.assertIs(pool.get_client("http://backend-a"), first)
+        self.assertIsNot(pool.get_client("http://backend-b"), first)
+        asyncio.run(pool.close())
+
+    def test_backend_limits_per_llm_override(self):
+        self.config.config["async_providers"] = {"max_connections": 50, "timeout": 30}
+        self.config.config["llms"] = {"local": {"url": "http://backend", "max_connections": 8}}
+
+        limits = _backend_limits(self.config, "http://backend")
+        self.assertEqual(limits["max_connections"], 8)
+        self.assertEqual(limits["timeout"], 30)
+        self.assertEqual(_backend_limits(self.config, "http://other")["max_connections"], 50)
+
+if __name__ == '__main__':
+    unittest.main()
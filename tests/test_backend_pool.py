@@ -0,0 +1,204 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import Mock
+from app.modules.backend_pool import (
+    Backend,
+    BackendPool,
+    CircuitBreaker,
+    HedgePolicy,
+    NoBackendAvailableError,
+    PooledProvider,
+    create_backend_pool,
+    health_url,
+)
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class FakeSettings:
+    def __init__(self, stream=False):
+        self.stream = stream
+
+    def is_streaming(self):
+        return self.stream
+
+class TestBackendPool(unittest.TestCase):
+    def setUp(self):
+        self.logger = Logger()
+        self.providers = [Mock(name="a"), Mock(name="b")]
+        self.backends = [Backend(f"http://node{i}", provider, CircuitBreaker(failure_threshold=2, reset_timeout=60))
+                         for i, provider in enumerate(self.providers)]
+        self.pool = BackendPool("erebus", self.backends, self.logger)
+
+    def test_routes_to_least_outstanding_backend(self):
+        self.backends[0].outstanding = 3
+        self.providers[1].create_completion.return_value = "from b"
+        result = PooledProvider(self.pool).create_completion("prompt", None, FakeSettings(), None)
+        self.assertEqual(result, "from b")
+        self.providers[0].create_completion.assert_not_called()
+        self.assertEqual(self.backends[1].outstanding, 0)
+
+    def test_latency_routing(self):
+        pool = BackendPool("erebus", self.backends, self.logger, routing="latency")
+        self.backends[0].latency = 2.0
+        self.backends[1].latency = 0.5
+        self.backends[1].outstanding = 1
+        self.assertIs(pool._acquire(set()), self.backends[1])
+
+    def test_fails_over_and_opens_circuit(self):
+        self.providers[0].create_completion.side_effect = ConnectionError("down")
+        self.providers[1].create_completion.return_value = "from b"
+        provider = PooledProvider(self.pool)
+        for _ in range(2):
+            self.assertEqual(provider.create_completion("prompt", None, FakeSettings(), None), "from b")
+        self.assertEqual(self.backends[0].breaker.state, "open")
+        self.assertFalse(self.backends[0].breaker.allows_request())
+
+    def test_raises_when_all_backends_fail(self):
+        for provider in self.providers:
+            provider.create_completion.side_effect = ConnectionError("down")
+        with self.assertRaises(ConnectionError):
+            PooledProvider(self.pool).create_completion("prompt", None, FakeSettings(), None)
+        for backend in self.backends:
+            backend.healthy = False
+        with self.assertRaises(NoBackendAvailableError):
+            PooledProvider(self.pool).create_completion("prompt", None, FakeSettings(), None)
+
+    def test_streaming_tracks_outstanding_until_closed(self):
+        self.providers[0].create_completion.return_value = iter(["a", "b"])
+        stream = PooledProvider(self.pool).create_completion("prompt", None, FakeSettings(stream=True), None)
+        self.assertEqual(self.backends[0].outstanding, 1)
+        self.assertEqual(list(stream), ["a", "b"])
+        self.assertEqual(self.backends[0].outstanding, 0)
+
+    def test_half_open_allows_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allows_request())
+        breaker.on_request()
+        self.assertFalse(breaker.allows_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_call_async_fails_over(self):
+        async def complete(backend):
+            if backend is self.backends[0]:
+                raise ConnectionError("down")
+            return backend.url
+
+        self.assertEqual(asyncio.run(self.pool.call_async(complete)), "http://node1")
+        self.assertEqual(self.backends[0].failures, 1)
+
+    def _hedged_pool(self, max_hedge_ratio=1.0):
+        policy = HedgePolicy(initial_delay=0.05, min_samples=100, max_hedge_ratio=max_hedge_ratio)
+        return BackendPool("erebus", self.backends, self.logger, hedging=policy)
+
+    def test_hedge_wins_against_slow_backend(self):
+        pool = self._hedged_pool()
+        self.providers[0].create_completion.side_effect = lambda *args: time.sleep(0.5) or iter(["slow"])
+        self.providers[1].create_completion.return_value = iter(["fast"])
+
+        stream = PooledProvider(pool).create_completion("prompt", None, FakeSettings(stream=True), None)
+        self.assertEqual(list(stream), ["fast"])
+        stats = pool.hedging.stats()
+        self.assertEqual((stats["hedged"], stats["hedge_wins"]), (1, 1))
+        pool.stop()
+
+    def test_blocking_non_streaming_call_is_not_hedged(self):
+        pool = self._hedged_pool()
+        self.providers[0].create_completion.side_effect = lambda *args: time.sleep(0.2) or "slow"
+
+        self.assertEqual(PooledProvider(pool).create_completion("prompt", None, FakeSettings(), None), "slow")
+        self.assertEqual(pool.hedging.stats()["requests"], 0)
+        self.providers[1].create_completion.assert_not_called()
+        pool.stop()
+
+    def test_hedged_stream_closes_loser(self):
+        pool = self._hedged_pool()
+        closed = []
+
+        def slow_stream():
+            try:
+                time.sleep(0.3)
+                yield "slow"
+            finally:
+                closed.append(True)
+
+        self.providers[0].create_completion.side_effect = lambda *args: slow_stream()
+        self.providers[1].create_completion.return_value = iter(["fa", "st"])
+        stream = PooledProvider(pool).create_completion("prompt", None, FakeSettings(stream=True), None)
+        self.assertEqual(list(stream), ["fa", "st"])
+        time.sleep(0.4)
+        self.assertEqual(closed, [True])
+        self.assertEqual([backend.outstanding for backend in self.backends], [0, 0])
+        pool.stop()
+
+    def test_fast_primary_is_not_hedged(self):
+        pool = self._hedged_pool()
+        self.providers[0].create_completion.return_value = iter(["primary"])
+        stream = PooledProvider(pool).create_completion("prompt", None, FakeSettings(stream=True), None)
+        self.assertEqual(list(stream), ["primary"])
+        self.assertEqual(pool.hedging.stats()["hedged"], 0)
+        self.providers[1].create_completion.assert_not_called()
+        pool.stop()
+
+    def test_hedge_budget(self):
+        policy = HedgePolicy(max_hedge_ratio=0.5)
+        policy.record_request()
+        self.assertTrue(policy.within_budget())
+        policy.record_hedge()
+        self.assertFalse(policy.within_budget())
+
+    def test_hedge_delay_uses_percentile(self):
+        policy = HedgePolicy(percentile=90, min_samples=10, min_delay=0.0)
+        for latency in range(1, 11):
+            policy.record_latency(latency / 10)
+        self.assertAlmostEqual(policy.delay(), 1.0)
+
+    def test_hedge_delay_keeps_first_token_and_answer_latencies_apart(self):
+        policy = HedgePolicy(min_samples=1, min_delay=0.0)
+        policy.record_latency(0.2)
+        policy.record_latency(5.0, streaming=False)
+        self.assertAlmostEqual(policy.delay(), 0.2)
+        self.assertAlmostEqual(policy.delay(streaming=False), 5.0)
+
+    def test_async_hedge_cancels_loser(self):
+        pool = self._hedged_pool()
+        cancelled = []
+
+        async def complete(backend):
+            if backend is self.backends[0]:
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    cancelled.append(backend.url)
+                    raise
+            return backend.url
+
+        self.assertEqual(asyncio.run(pool.call_async(complete)), "http://node1")
+        self.assertEqual(cancelled, ["http://node0"])
+        self.assertEqual(self.backends[0].failures, 0)
+        self.assertEqual([backend.outstanding for backend in self.backends], [0, 0])
+        pool.stop()
+
+    def test_hedging_threads_follow_configured_concurrency(self):
+        config = Config()
+        config.config["worker_pool"] = {"max_workers": 40}
+        config.config["load_balancing"] = {"health_check_interval": 0, "hedging": {"enabled": True}}
+        llm_settings = {"agent_provider": "vllm_server", "url": "http://node1", "server_name": "hedged"}
+        providers = {"http://node1": self.providers[0], "http://node2": self.providers[1]}
+
+        pool = create_backend_pool(config, self.logger, llm_settings, providers)
+        self.assertEqual(pool._executor._max_workers, 80)
+        config.config["load_balancing"]["max_concurrency"] = 3
+        pool = create_backend_pool(config, self.logger, llm_settings, providers)
+        self.assertEqual(pool._executor._max_workers, 6)
+
+    def test_health_url(self):
+        self.assertEqual(health_url("vllm_server", "http://node:8081/v1/"), "http://node:8081/v1/models")
+        self.assertEqual(health_url("tgi_server", "http://node:8080"), "http://node:8080/health")
+        self.assertIsNone(health_url("groq", "https://api.groq.com/openai/v1"))
+
+if __name__ == '__main__':
+    unittest.main()
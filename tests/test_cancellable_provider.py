@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import Mock
+from app.modules.cancellable_provider import CancellableProvider
+from app.modules.cancellation import CancellationToken, GenerationCancelled, cancellation_stats
+
+class FakeSettings:
+    def __init__(self, stream=False, max_tokens=100):
+        self.stream = stream
+        self.max_tokens = max_tokens
+
+    def is_streaming(self):
+        return self.stream
+
+class TestCancellableProvider(unittest.TestCase):
+    def setUp(self):
+        self.inner = Mock()
+        self.provider = CancellableProvider(self.inner)
+
+    def test_passes_through_without_token(self):
+        self.inner.create_completion.return_value = {"choices": [{"text": "Hello"}]}
+        settings = FakeSettings()
+
+        result = self.provider.create_completion("prompt", None, settings, "<s>")
+        self.assertEqual(result, {"choices": [{"text": "Hello"}]})
+        self.inner.create_completion.assert_called_once_with("prompt", None, settings, "<s>")
+
+    def test_streams_and_joins_when_token_is_active(self):
+        self.inner.create_completion.return_value = iter([{"choices": [{"text": "Hel"}]}, {"choices": [{"text": "lo"}]}])
+        token = CancellationToken()
+
+        result = token.bind(self.provider.create_completion)("prompt", None, FakeSettings(), "<s>")
+        self.assertEqual(result, {"choices": [{"text": "Hello"}]})
+        self.assertTrue(self.inner.create_completion.call_args[0][2].stream)
+
+    def test_stops_generation_when_cancelled(self):
+        token = CancellationToken()
+        closed = []
+
+        def chunks():
+            try:
+                yield {"choices": [{"text": "Hel"}]}
+                token.cancel("client disconnected")
+                yield {"choices": [{"text": "lo"}]}
+                yield {"choices": [{"text": "!"}]}
+            finally:
+                closed.append(True)
+
+        self.inner.create_completion.return_value = chunks()
+        cancelled_before = cancellation_stats.cancelled_generations
+
+        with self.assertRaises(GenerationCancelled):
+            token.bind(self.provider.create_completion)("prompt", None, FakeSettings(max_tokens=100), "<s>")
+        self.assertEqual(closed, [True])
+        self.assertEqual(cancellation_stats.cancelled_generations, cancelled_before + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import threading
+import unittest
+from app.modules.cancellation import CancellationToken, GenerationCancelled, current_cancel_token, raise_if_cancelled
+
+class TestCancellation(unittest.TestCase):
+    def test_raise_if_cancelled_without_token(self):
+        raise_if_cancelled()
+
+    def test_bound_function_sees_token_on_other_thread(self):
+        token = CancellationToken()
+        seen = []
+        thread = threading.Thread(target=token.bind(lambda: seen.append(current_cancel_token.get())))
+        thread.start()
+        thread.join()
+        self.assertIs(seen[0], token)
+        self.assertIsNone(current_cancel_token.get())
+
+    def test_cancelled_token_raises(self):
+        token = CancellationToken()
+        token.cancel("client disconnected")
+
+        with self.assertRaises(GenerationCancelled) as ctx:
+            token.bind(raise_if_cancelled)()
+        self.assertIn("client disconnected", str(ctx.exception))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,5 +29,12 @@ class TestChatModule(unittest.TestCase):
         response = self.chat_module.chat("What is the current date and time?")
         self.assertEqual(response, "Current datetime is 2023-11-24 15:42:35")
 
+    @patch('app.modules.chat_module.FunctionCallingAgent')
+    def test_every_chat_has_its_own_agent(self, mock_agent):
+        mock_agent.return_value.generate_response.return_value = "Hello"
+        self.chat_module.chat("Hi")
+        self.chat_module.chat("Hi again")
+        self.assertEqual(mock_agent.call_count, 2)
+
 if __name__ == '__main__':
     unittest.main()
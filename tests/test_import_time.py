@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# Cumulative import time allowed for each entry point, in seconds. Override with
+# IMPORT_TIME_BUDGET_SCALE on slow CI machines.
+BUDGETS = {
+    "app.cli_interface": 0.5,
+    "app.api_service": 1.5,
+}
+
+# Optional dependencies that must only load when the provider or module using them does.
+HEAVY_MODULES = ["llama_cpp", "llama_cpp_agent", "ragatouille", "chromadb", "trafilatura", "readability",
+                 "torch", "sentence_transformers", "transformers", "uvicorn"]
+
+
+def import_times(module):
+    """Run `python -X importtime -c "import <module>"` and return {module: cumulative seconds}."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    def test_entry_points_within_budget(self):
+        scale = float(os.environ.get("IMPORT_TIME_BUDGET_SCALE", 1))
+        for module, budget in BUDGETS.items():
+            with self.subTest(module=module):
+                # Best of three, the first run also pays for writing bytecode.
+                elapsed = min(import_times(module)[module] for _ in range(3))
+                self.assertLess(elapsed, budget * scale, f"Importing {module} took {elapsed:.3f}s")
+
+    def test_entry_points_skip_heavy_dependencies(self):
+        for module in BUDGETS:
+            with self.subTest(module=module):
+                imported = import_times(module)
+                loaded = [name for name in HEAVY_MODULES if name in imported]
+                self.assertEqual(loaded, [], f"Importing {module} loads {loaded}")
+
+    def test_http_modules_skip_ragatouille(self):
+        try:
+            imported = import_times("app.modules.wiki_summary_module")
+        except ImportError as e:
+            self.skipTest(f"llama_cpp_agent is not importable: {e}")
+        for name in ["ragatouille", "chromadb", "torch", "trafilatura"]:
+            self.assertNotIn(name, imported)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import Mock, patch
+from app.modules.instrumented_provider import InstrumentedProvider
+
+class FakeSettings:
+    def __init__(self, stream=False):
+        self.stream = stream
+
+    def is_streaming(self):
+        return self.stream
+
+class TestInstrumentedProvider(unittest.TestCase):
+    def setUp(self):
+        self.inner = Mock()
+        self.provider = InstrumentedProvider(self.inner, "some/model")
+
+    @patch('app.modules.instrumented_provider.metrics')
+    def test_records_completion(self, metrics):
+        self.inner.create_completion.return_value = {"choices": [{"text": "a" * 40}]}
+        result = self.provider.create_completion("p" * 80, None, FakeSettings(), "<s>")
+
+        self.assertEqual(result, {"choices": [{"text": "a" * 40}]})
+        metrics.observe_first_token.assert_called_once()
+        model, _, prompt_tokens, generated_tokens = metrics.observe_generation.call_args[0]
+        self.assertEqual((model, prompt_tokens, generated_tokens), ("some/model", 20, 10))
+
+    @patch('app.modules.instrumented_provider.metrics')
+    def test_counts_streamed_chunks(self, metrics):
+        self.inner.create_completion.return_value = iter([{"choices": [{"text": "Hel"}]}, {"choices": [{"text": "lo"}]}])
+        chunks = list(self.provider.create_completion("prompt", None, FakeSettings(stream=True), "<s>"))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(metrics.observe_first_token.call_count, 1)
+        self.assertEqual(metrics.observe_generation.call_args[0][3], 2)
+
+    def test_delegates_other_attributes(self):
+        self.inner.get_provider_default_settings.return_value = "settings"
+        self.assertEqual(self.provider.get_provider_default_settings(), "settings")
+
+if __name__ == '__main__':
+    unittest.main()
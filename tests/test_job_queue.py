@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from app.modules.job_queue import JobStore, JobRunner
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.server.received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "jobs.db")
+        self.config.config["jobs"] = {"enabled": True, "path": self.path, "retry_delay": 0.01, "max_attempts": 2,
+                                      "poll_interval": 0.01, "webhook_hosts": ["127.0.0.1"]}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_store_lifecycle(self):
+        store = JobStore(self.path)
+        job_id = store.submit("product-comparison", {"product1": "a"}, max_attempts=2)
+        self.assertEqual(store.get(job_id)["status"], "queued")
+
+        job = store.claim(lease_timeout=60)
+        self.assertEqual((job["id"], job["attempts"], job["payload"]), (job_id, 1, {"product1": "a"}))
+        self.assertIsNone(store.claim(lease_timeout=60))
+
+        self.assertEqual(store.fail(job_id, 1, "backend down", retry_delay=0.01, result_ttl=60), "queued")
+        time.sleep(0.02)
+        self.assertEqual(store.claim(lease_timeout=60)["attempts"], 2)
+        self.assertEqual(store.fail(job_id, 2, "backend down", retry_delay=0.01, result_ttl=60), "failed")
+        self.assertEqual(store.get(job_id)["error"], "backend down")
+        self.assertIsNone(store.claim(lease_timeout=60))
+        store.close()
+
+    def test_expired_lease_and_results(self):
+        store = JobStore(self.path)
+        job_id = store.submit("reflective-response", {"input_message": "hi"})
+        store.claim(lease_timeout=0)
+        # The worker died; the job is claimed again.
+        self.assertEqual(store.claim(lease_timeout=60)["id"], job_id)
+
+        # The first worker finishes late: its claim was lost, the result of the second one is kept.
+        self.assertFalse(store.complete(job_id, 1, {"response": "late"}, result_ttl=60))
+        self.assertIsNone(store.fail(job_id, 1, "late", retry_delay=0, result_ttl=60))
+        self.assertTrue(store.complete(job_id, 2, {"response": "done"}, result_ttl=0))
+        self.assertIsNone(store.get(job_id))
+        self.assertEqual(store.purge_expired(), 1)
+        store.close()
+
+    def test_expired_lease_uses_up_attempts(self):
+        store = JobStore(self.path)
+        job_id = store.submit("reflective-response", {"input_message": "hi"}, max_attempts=2)
+        store.claim(lease_timeout=0)
+        store.claim(lease_timeout=0)
+        self.assertIsNone(store.claim(lease_timeout=60))
+        self.assertEqual(store.fail_expired(result_ttl=60), [job_id])
+        self.assertEqual(store.get(job_id)["status"], "failed")
+        store.close()
+
+    def test_renewed_lease_is_not_claimed_again(self):
+        store = JobStore(self.path)
+        job_id = store.submit("reflective-response", {"input_message": "hi"})
+        job = store.claim(lease_timeout=0)
+        self.assertTrue(store.renew(job_id, job["attempts"], lease_timeout=60))
+        self.assertIsNone(store.claim(lease_timeout=60))
+        self.assertFalse(store.renew(job_id, job["attempts"] + 1, lease_timeout=60))
+        store.close()
+
+    def test_long_job_keeps_its_lease(self):
+        self.config.config["jobs"]["lease_timeout"] = 0.06
+        attempts = []
+
+        async def handler(job):
+            attempts.append(job["attempts"])
+            await asyncio.sleep(0.3)
+            return {"response": "done"}
+
+        async def run():
+            runner = JobRunner(self.config, self.logger, handler)
+            runner.start()
+            job_id = runner.submit("reflective-response", {"input_message": "hi"})
+            for _ in range(100):
+                job = runner.store.get(job_id)
+                if job["status"] == "succeeded":
+                    break
+                await asyncio.sleep(0.01)
+            await runner.stop()
+            return job
+
+        self.assertEqual(asyncio.run(run())["status"], "succeeded")
+        self.assertEqual(attempts, [1])
+
+    def test_disabled_by_default_and_store_opened_on_start(self):
+        del self.config.config["jobs"]["enabled"]
+        runner = JobRunner(self.config, self.logger, None)
+        runner.start()
+        self.assertFalse(runner.enabled)
+        self.assertIsNone(runner.store)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_webhook_validation(self):
+        runner = JobRunner(self.config, self.logger, None)
+        runner.validate_webhook("http://127.0.0.1:8080/done")
+        for url in ("ftp://127.0.0.1/done", "http://10.0.0.1/done", "file:///etc/passwd"):
+            with self.assertRaises(ValueError):
+                runner.validate_webhook(url)
+        runner.webhook_hosts = []
+        for url in ("http://127.0.0.1/done", "http://localhost/done", "http://169.254.169.254/latest",
+                    "http://[::1]/done", "http://10.0.0.1/done"):
+            with self.assertRaises(ValueError):
+                runner.validate_webhook(url)
+        runner.validate_webhook("https://93.184.215.14/done")
+
+    def test_jobs_are_returned_to_their_api_key(self):
+        async def run():
+            runner = JobRunner(self.config, self.logger, None)
+            runner.start()
+            job_id = runner.submit("reflective-response", {"input_message": "hi"}, api_key="alice")
+            try:
+                return runner.get(job_id, "alice"), runner.get(job_id, "bob"), runner.get(job_id)
+            finally:
+                await runner.stop()
+
+        own, other, anonymous = asyncio.run(run())
+        self.assertEqual(own["api_key"], "alice")
+        self.assertIsNone(other)
+        self.assertIsNone(anonymous)
+
+    def test_runner_retries_and_calls_webhook(self):
+        server = HTTPServer(("127.0.0.1", 0), WebhookHandler)
+        server.received = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        attempts = []
+
+        async def handler(job):
+            attempts.append(job["attempts"])
+            if len(attempts) == 1:
+                raise ValueError("invalid JSON from the model")
+            return {"response": job["payload"]["input_message"].upper()}
+
+        async def run():
+            runner = JobRunner(self.config, self.logger, handler)
+            runner.start()
+            job_id = runner.submit("reflective-response", {"input_message": "hi"},
+                                   webhook=f"http://127.0.0.1:{server.server_address[1]}/done")
+            for _ in range(200):
+                job = runner.store.get(job_id)
+                if job["status"] == "succeeded" and server.received:
+                    break
+                await asyncio.sleep(0.01)
+            await runner.stop()
+            return job
+
+        try:
+            job = asyncio.run(run())
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(attempts, [1, 2])
+        self.assertEqual(job["result"], {"response": "HI"})
+        self.assertEqual(server.received[0]["status"], "succeeded")
+        self.assertEqual(server.received[0]["result"], {"response": "HI"})
+
+if __name__ == '__main__':
+    unittest.main()
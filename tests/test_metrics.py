@@ -0,0 +1,54 @@
+import unittest
+from app.modules.metrics import Metrics, runtime_stats, estimate_tokens, PROMETHEUS_AVAILABLE
+from app.modules.worker_pool import WorkerPool
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.metrics = Metrics()
+
+    @unittest.skipUnless(PROMETHEUS_AVAILABLE, "needs prometheus_client")
+    def test_records_llm_and_tool_metrics(self):
+        self.metrics.observe_first_token("some/model", 0.4)
+        self.metrics.observe_generation("some/model", 2.0, 120, 30)
+        self.metrics.observe_tool_call("fetch_data", 0.2)
+        self.metrics.observe_tool_call("fetch_data", 0.1, ValueError("boom"))
+        self.metrics.record_cache("chat", hit=True)
+        self.metrics.record_error("chat", KeyError("missing"))
+
+        output = self.metrics.render().decode()
+        self.assertIn('llm_time_to_first_token_seconds_count{model="some/model"} 1.0', output)
+        self.assertIn('llm_generated_tokens_total{model="some/model"} 30.0', output)
+        self.assertIn('llm_prompt_tokens_total{model="some/model"} 120.0', output)
+        self.assertIn('chat_tool_calls_total{status="error",tool="fetch_data"} 1.0', output)
+        self.assertIn('cache_requests_total{cache="chat",result="hit"} 1.0', output)
+        self.assertIn('errors_total{endpoint="chat",exception="KeyError"} 1.0', output)
+
+    @unittest.skipUnless(PROMETHEUS_AVAILABLE, "needs prometheus_client")
+    def test_request_metrics(self):
+        with self.metrics.track_in_flight("/chat"):
+            self.assertIn('http_requests_in_flight{route="/chat"} 1.0', self.metrics.render().decode())
+        self.metrics.observe_request("POST", "/chat", 200, 1.5)
+        output = self.metrics.render().decode()
+        self.assertIn('http_requests_in_flight{route="/chat"} 0.0', output)
+        self.assertIn('http_request_duration_seconds_count{method="POST",route="/chat",status="200"} 1.0', output)
+
+    @unittest.skipUnless(PROMETHEUS_AVAILABLE, "needs prometheus_client")
+    def test_runtime_stats(self):
+        worker_pool = WorkerPool(self.config, self.logger)
+        worker_pool.get_limiter("chat")
+        self.metrics.add_stats_source(runtime_stats(worker_pool))
+        output = self.metrics.render().decode()
+        worker_pool.shutdown()
+        self.assertIn('worker_pool_active{endpoint="chat"} 0.0', output)
+        self.assertIn("llm_cancelled_generations_total", output)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("a" * 40), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch, Mock
+from app.modules.module_registry import ModuleRegistry, MODULES
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class FakeModule:
+    instances = 0
+
+    def __init__(self, config, logger):
+        FakeModule.instances += 1
+
+class BrokenModule:
+    def __init__(self, config, logger):
+        raise ImportError("missing dependency")
+
+class SlowModule:
+    def __init__(self, config, logger):
+        time.sleep(0.2)
+
+class FailingModule:
+    def __init__(self, config, logger):
+        raise ValueError("unknown LLM")
+
+class TestModuleRegistry(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.registry = ModuleRegistry(self.config, self.logger)
+        FakeModule.instances = 0
+
+    def _import_module(self, module_class):
+        return patch('app.modules.module_registry.importlib.import_module',
+                     return_value=Mock(APIModule=module_class))
+
+    def test_module_is_created_once(self):
+        with self._import_module(FakeModule):
+            first = self.registry.get("api")
+            second = self.registry.get("api")
+        self.assertIs(first, second)
+        self.assertEqual(FakeModule.instances, 1)
+
+    def test_concurrent_get_creates_single_instance(self):
+        results = []
+        with self._import_module(FakeModule):
+            threads = [threading.Thread(target=lambda: results.append(self.registry.get("api"))) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(FakeModule.instances, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_import_error_disables_module(self):
+        with self._import_module(BrokenModule):
+            self.assertIsNone(self.registry.get("api"))
+        self.assertEqual(self.registry.loaded(), {"api": False})
+
+    def test_unknown_module(self):
+        with self.assertRaises(KeyError):
+            self.registry.get("unknown")
+
+    def test_register_overrides_module(self):
+        module = Mock()
+        self.registry.register("wiki_summary", module)
+        self.assertIs(self.registry.get("wiki_summary"), module)
+        self.assertIn("wiki_summary", MODULES)
+
+    def test_initialize_creates_modules_concurrently(self):
+        slow = Mock(**{class_name: SlowModule for _, class_name, _ in MODULES.values()})
+        with patch('app.modules.module_registry.importlib.import_module', return_value=slow):
+            started = time.monotonic()
+            asyncio.run(self.registry.initialize(["api", "search", "translation"]))
+            elapsed = time.monotonic() - started
+        self.assertLess(elapsed, 0.5)
+        readiness = self.registry.readiness(["api", "search", "translation", "chat"])
+        self.assertEqual(readiness["api"]["state"], "ready")
+        self.assertGreaterEqual(readiness["api"]["seconds"], 0.2)
+        self.assertEqual(readiness["chat"], {"state": "pending", "seconds": None})
+
+    def test_failed_module_state(self):
+        with self._import_module(FailingModule):
+            asyncio.run(self.registry.initialize(["api"]))
+        self.assertEqual(self.registry.readiness(["api"])["api"]["state"], "failed")
+        self.assertEqual(self.registry.readiness(["api"])["api"]["error"], "unknown LLM")
+        with self._import_module(BrokenModule):
+            self.assertIsNone(self.registry.get("api"))
+        self.assertEqual(self.registry.state("api"), "disabled")
+
+if __name__ == '__main__':
+    unittest.main()
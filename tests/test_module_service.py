@@ -0,0 +1,131 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+import uvicorn
+from app.module_service import create_app
+from app.modules.async_provider import connection_pool
+from app.modules.module_registry import ModuleRegistry
+from app.modules.remote_module import RemoteModule, RemoteModuleError
+from app.modules.tracing import span
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+try:
+    import httpx  # noqa: F401
+    from fastapi.testclient import TestClient
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+class FakeSearchModule:
+    def supports_async(self):
+        return False
+
+    def search(self, query):
+        if query == "boom":
+            raise ValueError("search backend down")
+        return f"results for {query}"
+
+    def search_stream(self, query, emit):
+        emit("token", "results ")
+        emit("token", "for")
+        return f"results for {query}"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@unittest.skipUnless(HTTPX_AVAILABLE, "needs httpx")
+class TestModuleService(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.registry = ModuleRegistry(self.config, self.logger)
+        self.registry.register("search", FakeSearchModule())
+        self.app = create_app("search", self.config, self.logger, self.registry)
+
+    def test_call_and_stream(self):
+        with TestClient(self.app) as client:
+            response = client.post("/call/search", json={"args": ["python"]})
+            self.assertEqual(response.json(), {"result": "results for python"})
+            self.assertEqual(client.get("/ready").status_code, 200)
+            self.assertEqual(client.post("/call/chat", json={"args": []}).status_code, 404)
+
+            body = client.post("/call/search_stream", json={"args": ["python"]}).text
+            self.assertIn('event: token\ndata: "results "', body)
+            self.assertIn('event: done\ndata: "results for python"', body)
+
+    def test_module_error_is_500(self):
+        with TestClient(self.app) as client:
+            response = client.post("/call/search", json={"args": ["boom"]})
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("search backend down", response.json()["detail"])
+
+    def test_registry_creates_remote_module_for_services(self):
+        self.config.config["gateway"] = {"services": {"search": "http://search:8001/"}, "timeout": 30}
+        try:
+            remote = ModuleRegistry(self.config, self.logger).get("search")
+        finally:
+            del self.config.config["gateway"]
+        self.assertIsInstance(remote, RemoteModule)
+        self.assertEqual(remote.url, "http://search:8001")
+        self.assertEqual(remote.timeout, 30)
+        self.assertEqual(remote.asearch.__name__, "asearch")
+        with self.assertRaises(AttributeError):
+            remote.wiki_summary
+
+@unittest.skipUnless(HTTPX_AVAILABLE, "needs httpx")
+class TestRemoteModule(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        config = Config()
+        logger = Logger()
+        registry = ModuleRegistry(config, logger)
+        registry.register("search", FakeSearchModule())
+        port = free_port()
+        cls.server = uvicorn.Server(uvicorn.Config(create_app("search", config, logger, registry),
+                                                   host="127.0.0.1", port=port, log_level="warning"))
+        cls.thread = threading.Thread(target=cls.server.run, daemon=True)
+        cls.thread.start()
+        while not cls.server.started:
+            time.sleep(0.01)
+        cls.remote = RemoteModule("search", f"http://127.0.0.1:{port}", {"timeout": 10, "connect_timeout": 2})
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.remote.close()
+        cls.server.should_exit = True
+        cls.thread.join()
+
+    def test_sync_call_and_stream(self):
+        self.assertEqual(self.remote.search("python"), "results for python")
+        events = []
+        result = self.remote.search_stream("python", lambda event, data: events.append((event, data)))
+        self.assertEqual(result, "results for python")
+        self.assertEqual(events, [("token", "results "), ("token", "for")])
+
+    def test_async_call_and_stream(self):
+        events = []
+
+        async def run():
+            try:
+                with span("gateway request"):
+                    return (await self.remote.asearch("python"),
+                            await self.remote.asearch_stream("python", lambda event, data: events.append(event)))
+            finally:
+                await connection_pool.close()
+
+        self.assertEqual(asyncio.run(run()), ("results for python", "results for python"))
+        self.assertEqual(events, ["token", "token"])
+
+    def test_errors_are_raised(self):
+        with self.assertRaises(RemoteModuleError) as raised:
+            self.remote.search("boom")
+        self.assertEqual(raised.exception.status_code, 500)
+        self.assertIn("search backend down", raised.exception.detail)
+
+if __name__ == '__main__':
+    unittest.main()
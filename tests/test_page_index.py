@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from app.modules.page_index import PageIndex, PageIndexStore, NUMPY_AVAILABLE
+from app.modules.wikipedia import chunk_offsets, page_title
+from srt_core.utils.logger import Logger
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+def make_index(title, revision, size=4, dimensions=8):
+    vectors = np.eye(size, dimensions, dtype=np.float32)
+    return PageIndex(title, revision, [f"chunk {i} of {title}" for i in range(size)], list(range(0, size * 10, 10)),
+                     vectors)
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "needs numpy")
+class TestPageIndexStore(unittest.TestCase):
+    def setUp(self):
+        self.logger = Logger()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def store(self, max_memory_bytes=1024 * 1024, max_disk_bytes=1024 * 1024):
+        return PageIndexStore(self.directory.name, max_memory_bytes, max_disk_bytes, self.logger)
+
+    def test_search_returns_nearest_chunks(self):
+        index = make_index("Python", 1)
+        query = np.array([0, 1, 0.5, 0, 0, 0, 0, 0], dtype=np.float32)
+        self.assertEqual([number for _, number in index.search(query, 2)], [1, 2])
+
+    def test_index_is_reused_across_restarts(self):
+        self.store().put(make_index("Python", 7))
+        index = self.store().get("Python", 7)
+        self.assertEqual(index.chunks[2], "chunk 2 of Python")
+        self.assertEqual(index.offsets, [0, 10, 20, 30])
+        self.assertEqual(index.vectors.shape, (4, 8))
+        self.assertIsNone(self.store().get("Python", 8))
+
+    def test_new_revision_replaces_old_one(self):
+        store = self.store()
+        store.put(make_index("Python", 7))
+        store.put(make_index("Python", 8))
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        self.assertIsNone(store.get("Python", 7))
+        self.assertIsNotNone(store.get("Python", 8))
+
+    def test_memory_budget_evicts_least_recently_used_page(self):
+        size = make_index("A", 1).nbytes
+        store = self.store(max_memory_bytes=size * 2)
+        store.put(make_index("A", 1))
+        store.put(make_index("B", 1))
+        store.get("A", 1)
+        store.put(make_index("C", 1))
+        self.assertEqual([key[0] for key in store._indexes], ["A", "C"])
+        self.assertLessEqual(store.memory_size, size * 2)
+        # Evicted from memory, still loaded from disk.
+        self.assertIsNotNone(store.get("B", 1))
+
+    def test_disk_budget_evicts_least_recently_used_file(self):
+        store = self.store()
+        store.put(make_index("A", 1))
+        file_size = store.disk_size()
+        store.max_disk_bytes = file_size * 2
+        os.utime(store._file("A", 1), (1, 1))
+        store.put(make_index("B", 1))
+        store.put(make_index("C", 1))
+        self.assertFalse(os.path.exists(store._file("A", 1)))
+        self.assertTrue(os.path.exists(store._file("C", 1)))
+        self.assertLessEqual(store.disk_size(), file_size * 2)
+
+class TestWikipediaHelpers(unittest.TestCase):
+    def test_page_title(self):
+        self.assertEqual(page_title("https://en.wikipedia.org/wiki/Synthetic_diamond"), "Synthetic diamond")
+        self.assertEqual(page_title("synthetic  diamond"), "Synthetic diamond")
+
+    def test_chunk_offsets(self):
+        text = "alpha beta\n\ngamma alpha beta"
+        self.assertEqual(chunk_offsets(text, ["alpha beta\n\n", "gamma ", "alpha beta"]), [0, 12, 18])
+        self.assertEqual(chunk_offsets(text, ["missing"]), [-1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from app.modules.page_store import PageStore
+from app.modules.wikipedia import MediaWikiFetcher, HttpFetcher, PageNotFoundError
+from srt_core.utils.logger import Logger
+
+class StubWikipedia:
+    """Local stand-in for the MediaWiki API (/w/api.php) and a plain text page service (/page/<title>)."""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        self.statuses = []
+        self.failing = False
+        self.etags = True
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(self.path)
+                if stub.failing:
+                    return self.respond(500, b"")
+                url = urlsplit(self.path)
+                if url.path == "/w/api.php":
+                    query = parse_qs(url.query)
+                    title = query["titles"][0]
+                    if title not in stub.pages:
+                        page = {"title": title, "missing": ""}
+                    else:
+                        text, revision = stub.pages[title]
+                        page = {"title": title, "revisions": [{"revid": revision}]}
+                        if "extracts" in query["prop"][0]:
+                            page["extract"] = text
+                    body = json.dumps({"query": {"pages": {"1": page}}}).encode()
+                    return self.respond(200, body, {"Content-Type": "application/json"})
+                title = unquote(url.path[len("/page/"):]).replace("_", " ")
+                if title not in stub.pages:
+                    return self.respond(404, b"")
+                text, revision = stub.pages[title]
+                headers = {"Content-Type": "text/plain; charset=utf-8"}
+                if stub.etags:
+                    headers["ETag"] = f'"{revision}"'
+                    if self.headers.get("If-None-Match") == headers["ETag"]:
+                        return self.respond(304, b"", {"ETag": headers["ETag"]})
+                self.respond(200, text.encode(), headers)
+
+            def respond(self, status, body, headers=None):
+                stub.statuses.append(status)
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def full_fetches(self):
+        return [path for path in self.requests if "extracts" in path or path.startswith("/page/")]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class TestPageStore(unittest.TestCase):
+    def setUp(self):
+        self.logger = Logger()
+        self.directory = tempfile.TemporaryDirectory()
+        self.stub = StubWikipedia()
+        self.stub.pages["Synthetic diamond"] = ("Diamond made in a laboratory. " * 200, 100)
+
+    def tearDown(self):
+        self.stub.close()
+        self.directory.cleanup()
+
+    def store(self, fetcher=None, revalidate_interval=300, max_disk_bytes=1024 * 1024):
+        fetcher = fetcher or MediaWikiFetcher(f"{self.stub.url}/w/api.php")
+        return PageStore(self.directory.name, fetcher, max_disk_bytes, revalidate_interval, self.logger)
+
+    def test_stores_pages_compressed_and_reuses_them(self):
+        store = self.store()
+        page = store.get("https://en.wikipedia.org/wiki/Synthetic_diamond")
+        self.assertEqual((page.title, page.validator), ("Synthetic diamond", 100))
+        self.assertEqual(page.text, self.stub.pages["Synthetic diamond"][0])
+        self.assertLess(store.disk_size(), len(page.text) // 10)
+
+        # Served from disk, also by another store (worker or restart), without asking Wikipedia.
+        self.assertEqual(self.store().get("synthetic_diamond").text, page.text)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_revalidates_by_revision_id(self):
+        store = self.store(revalidate_interval=0)
+        store.get("Synthetic diamond")
+        store.get("Synthetic diamond")
+        # The second request only asked for the revision id.
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual(len(self.stub.full_fetches()), 1)
+
+        self.stub.pages["Synthetic diamond"] = ("Edited.", 101)
+        page = store.get("Synthetic diamond")
+        self.assertEqual((page.text, page.validator), ("Edited.", 101))
+        self.assertEqual(len(self.stub.full_fetches()), 2)
+
+    def test_revalidates_by_etag(self):
+        store = self.store(HttpFetcher(f"{self.stub.url}/page/{{title}}"), revalidate_interval=0)
+        self.assertEqual(store.get("Synthetic diamond").validator, '"100"')
+        store.get("Synthetic diamond")
+        self.stub.pages["Synthetic diamond"] = ("Edited.", 101)
+        self.assertEqual(store.get("Synthetic diamond").text, "Edited.")
+        # One download per version, the revalidation in between was answered with a 304.
+        self.assertEqual(self.stub.statuses, [200, 304, 200])
+
+    def test_revalidates_by_text_hash_without_etag(self):
+        self.stub.etags = False
+        store = self.store(HttpFetcher(f"{self.stub.url}/page/{{title}}"), revalidate_interval=0)
+        page = store.get("Synthetic diamond")
+        self.assertTrue(page.validator.startswith("sha256:"))
+        self.assertEqual(store.get("Synthetic diamond").validator, page.validator)
+        self.stub.pages["Synthetic diamond"] = ("Edited.", 101)
+        edited = store.get("Synthetic diamond")
+        # A changed page gets a new validator, so the index built from the old text is not reused.
+        self.assertEqual(edited.text, "Edited.")
+        self.assertNotEqual(edited.validator, page.validator)
+
+    def test_serves_stored_copy_when_revalidation_fails(self):
+        store = self.store(revalidate_interval=0)
+        text = store.get("Synthetic diamond").text
+        self.stub.failing = True
+        self.assertEqual(store.get("Synthetic diamond").text, text)
+        with self.assertRaises(Exception):
+            store.get("Diamond")
+
+    def test_missing_page(self):
+        store = self.store(revalidate_interval=0)
+        with self.assertRaises(PageNotFoundError):
+            store.get("Diamond")
+        store.get("Synthetic diamond")
+        # A deleted page is dropped from the store.
+        del self.stub.pages["Synthetic diamond"]
+        with self.assertRaises(PageNotFoundError):
+            store.get("Synthetic diamond")
+        self.assertEqual(store.disk_size(), 0)
+
+    def test_evicts_least_recently_validated_pages(self):
+        store = self.store()
+        store.get("Synthetic diamond")
+        page_size = store.disk_size()
+        os.utime(store._file("Synthetic diamond"), (1, 1))
+        store.max_disk_bytes = page_size * 2
+        for title in ("Diamond", "Graphite"):
+            self.stub.pages[title] = ("Carbon allotrope. " * 150 + title, 1)
+            store.get(title)
+        self.assertFalse(os.path.exists(store._file("Synthetic diamond")))
+        self.assertTrue(os.path.exists(store._file("Graphite")))
+        self.assertLessEqual(store.disk_size(), page_size * 2)
+
+    def test_without_path_always_fetches(self):
+        store = PageStore(None, MediaWikiFetcher(f"{self.stub.url}/w/api.php"), 0, 300, self.logger)
+        store.get("Synthetic diamond")
+        store.get("Synthetic diamond")
+        self.assertEqual(len(self.stub.full_fetches()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
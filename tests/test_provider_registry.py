@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import Mock
+from app.modules.provider_registry import ProviderRegistry, normalize_llm_settings
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class TestProviderRegistry(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.config.config["llms"]["small"] = {
+            "type": "Mistral",
+            "filename": "small",
+            "huggingface": "some/small-model",
+            "url": "http://small:8000/v1",
+            "agent_provider": "vllm_server",
+            "server": "Small",
+            "max_tokens": 4096,
+        }
+        self.config.config["routing"] = {"translation": "small"}
+        self.registry = ProviderRegistry(self.config, self.logger)
+
+    def test_normalized_settings_ignore_url_formatting(self):
+        settings = {"agent_provider": "vllm_server", "url": "HTTP://Erebus:8081/v1/", "huggingface": "model"}
+        same = {"agent_provider": "vllm_server", "url": "http://erebus:8081/v1", "huggingface": "model",
+                "server_name": "other name"}
+        self.assertEqual(normalize_llm_settings(settings), normalize_llm_settings(same))
+
+    def test_same_backend_shares_provider(self):
+        factory = Mock(side_effect=lambda settings: Mock())
+        chat = self.registry.get_provider(self.registry.settings_for_task("chat"), factory)
+        summary = self.registry.get_provider(self.registry.settings_for_task("summary"), factory)
+        self.assertIs(chat, summary)
+        self.assertEqual(factory.call_count, 1)
+
+    def test_routing_table(self):
+        self.assertEqual(self.registry.llm_name_for_task("translation"), "small")
+        self.assertEqual(self.registry.settings_for_task("translation")["url"], "http://small:8000/v1")
+        self.assertEqual(self.registry.llm_name_for_task("chat"), self.config.chat_llm_name)
+        self.assertIs(self.registry.settings_for_task("search"), self.config.default_llm_settings)
+
+        factory = Mock(side_effect=lambda settings: Mock())
+        default = self.registry.get_provider(self.registry.settings_for_task("search"), factory)
+        translation = self.registry.get_provider(self.registry.settings_for_task("translation"), factory)
+        self.assertIsNot(default, translation)
+
+    def test_unknown_route(self):
+        self.registry.routes["reflection_critique"] = "missing"
+        with self.assertRaises(ValueError):
+            self.registry.settings_for_task("reflection_critique")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from app.modules.rate_limiter import RateLimiter, RateLimitExceeded, current_usage, record_usage
+from app.modules.scheduler import current_api_key
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.directory = tempfile.TemporaryDirectory()
+        self.config.config["rate_limit"] = {
+            "enabled": True,
+            "default": {"tokens_per_minute": 600, "burst": 3000},
+            "api_keys": {"big": {"tokens_per_minute": 60000}},
+            "estimates": {"translate": 500, "search": 2000},
+        }
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_charges_estimated_tokens(self):
+        limiter = RateLimiter(self.config, self.logger)
+        self.assertEqual(limiter.estimate("translate", ["a" * 400, "English", "French"]), 500 + 103)
+        # Batches are charged per item.
+        self.assertEqual(limiter.estimate("search", ["page", ["a" * 40, "b" * 40, "c" * 40]]), 3 * 2000 + 31)
+        limiter.admit("search", ["query"])
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.admit("search", ["query"])
+        # 1002 tokens missing at 10 tokens per second.
+        self.assertEqual(raised.exception.retry_after, 101)
+        limiter.admit("translate", ["hi"])
+
+        token = current_api_key.set("big")
+        limiter.admit("search", ["query"])
+        current_api_key.reset(token)
+
+    def test_settles_with_actual_usage(self):
+        limiter = RateLimiter(self.config, self.logger)
+        charge = limiter.admit("search", ["query"])
+        usage_token = current_usage.set(charge.usage)
+        record_usage(150, 50)
+        current_usage.reset(usage_token)
+        record_usage(1000, 1000)
+        limiter.settle(charge)
+        limiter.settle(charge)
+        self.assertEqual(charge.usage.total, 200)
+        # The unused estimate was given back: 2800 tokens left.
+        limiter.admit("search", ["query"])
+        with self.assertRaises(RateLimitExceeded):
+            limiter.admit("search", ["query"])
+
+    def test_sheds_load_above_inflight_tokens(self):
+        self.config.config["rate_limit"]["max_inflight_tokens"] = 2500
+        limiter = RateLimiter(self.config, self.logger)
+        charge = limiter.admit("search", ["query"])
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.admit("translate", ["hi"])
+        self.assertEqual(raised.exception.reason, "server overloaded")
+        limiter.settle(charge)
+        self.assertEqual(limiter.inflight_tokens, 0)
+
+    def test_sqlite_state_is_shared_between_workers(self):
+        self.config.config["rate_limit"].update({"store": "sqlite", "path": os.path.join(self.directory.name, "rl.db")})
+        first, second = RateLimiter(self.config, self.logger), RateLimiter(self.config, self.logger)
+        first.admit("search", ["query"])
+        with self.assertRaises(RateLimitExceeded):
+            second.admit("search", ["query"])
+        first.close()
+        second.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_sqlite_store_reconnects_in_forked_worker(self):
+        self.config.config["rate_limit"].update({"store": "sqlite", "path": os.path.join(self.directory.name, "rl.db")})
+        limiter = RateLimiter(self.config, self.logger)
+        limiter.admit("search", ["query"])
+        inherited = limiter.store._connection()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                reconnected = limiter.store._connection() is not inherited
+                limiter.admit("search", ["query"])
+                os._exit(1)
+            except RateLimitExceeded:
+                os._exit(0 if reconnected else 2)
+            except BaseException:
+                os._exit(3)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        limiter.close()
+
+    def test_disabled(self):
+        self.config.config["rate_limit"] = {"enabled": False}
+        limiter = RateLimiter(self.config, self.logger)
+        self.assertIsNone(limiter.admit("search", ["query"]))
+        limiter.settle(None)
+
+if __name__ == '__main__':
+    unittest.main()
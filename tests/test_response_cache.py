@@ -0,0 +1,178 @@
+import asyncio
+import os
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from app.modules.response_cache import (ResponseCache, LRUCacheBackend, SQLiteCacheBackend, RedisCacheBackend,
+                                        normalize_url)
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """Minimal server speaking the Redis protocol for GET, SET (with PX) and DEL."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RedisHandler)
+        self.data = {}
+
+class RedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        data = self.server.data
+        while (args := self.read_command()) is not None:
+            command = args[0].upper()
+            if command == b"SET":
+                expires_at = time.time() + int(args[4]) / 1000 if len(args) > 4 else None
+                data[args[1]] = (args[2], expires_at)
+                self.wfile.write(b"+OK\r\n")
+            elif command == b"GET":
+                value, expires_at = data.get(args[1], (None, None))
+                if value is None or (expires_at and expires_at <= time.time()):
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+            elif command == b"DEL":
+                self.wfile.write(b":%d\r\n" % int(data.pop(args[1], None) is not None))
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check_backend(self, backend):
+        self.assertIsNone(backend.get("missing"))
+        backend.set("key", b"value", 60)
+        self.assertEqual(backend.get("key"), b"value")
+        backend.set("short", b"value", 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(backend.get("short"))
+        backend.delete("key")
+        self.assertIsNone(backend.get("key"))
+
+    def test_lru_backend_evicts_by_size(self):
+        backend = LRUCacheBackend(max_bytes=10)
+        self.check_backend(backend)
+        backend.set("a", b"12345", 60)
+        backend.set("b", b"12345", 60)
+        backend.get("a")
+        backend.set("c", b"12345", 60)
+        self.assertEqual(backend.get("a"), b"12345")
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.size, 10)
+
+    def test_sqlite_backend(self):
+        backend = SQLiteCacheBackend(os.path.join(self.directory.name, "cache.db"), max_entries=2)
+        self.check_backend(backend)
+        for key in ["a", "b", "c"]:
+            backend.set(key, b"value", 60)
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(backend.get("c"), b"value")
+        backend.close()
+
+    def test_redis_backend(self):
+        server = RedisStandIn()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        backend = RedisCacheBackend(f"redis://127.0.0.1:{server.server_address[1]}/0")
+        try:
+            self.check_backend(backend)
+            backend.set("key", b"value", 60)
+            self.assertIn(b"srt-agent-api:key", server.data)
+        finally:
+            backend.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_keys_are_normalized(self):
+        self.config.config["response_cache"] = {"enabled": True}
+        cache = ResponseCache(self.config, self.logger)
+        self.assertEqual(cache.key("wiki_summary", "python_(programming language)"),
+                         cache.key("wiki_summary", "Python (programming  language)"))
+        self.assertEqual(cache.key("translate", "Hello world\n", "English", "French"),
+                         cache.key("translate", " Hello world", "english", "FRENCH"))
+        # Line breaks and indentation are part of the text to translate.
+        self.assertNotEqual(cache.key("translate", "Hello\n    world", "English", "French"),
+                            cache.key("translate", "Hello world", "English", "French"))
+        self.assertNotEqual(cache.key("translate", "hello world", "English", "French"),
+                            cache.key("translate", "Hello world", "English", "French"))
+        self.assertEqual(normalize_url("HTTPS://Example.com/a?b=2&a=1#top"), "https://example.com/a?a=1&b=2")
+
+    def test_get_or_compute(self):
+        self.config.config["response_cache"] = {"enabled": True, "ttl": {"translate": 60, "fetch": 0}}
+        cache = ResponseCache(self.config, self.logger)
+        self.assertTrue(cache.enabled_for("translate"))
+        self.assertFalse(cache.enabled_for("fetch"))
+        self.assertFalse(cache.enabled_for("chat"))
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"response": "Bonjour"}
+
+        async def run():
+            first = await cache.get_or_compute("translate", ["Hello", "English", "French"], compute)
+            second = await cache.get_or_compute("translate", ["hello ", "English", "French"], compute)
+            third = await cache.get_or_compute("translate", ["Hello", "English", "French"], compute)
+            return first, second, third
+
+        first, second, third = asyncio.run(run())
+        self.assertFalse(first.hit)
+        self.assertFalse(second.hit)
+        self.assertTrue(third.hit)
+        self.assertEqual(third.value, {"response": "Bonjour"})
+        self.assertEqual(third.etag, first.etag)
+        self.assertGreater(third.max_age, 50)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_are_not_cached(self):
+        self.config.config["response_cache"] = {"enabled": True}
+        cache = ResponseCache(self.config, self.logger)
+
+        async def failing():
+            raise ValueError("backend down")
+
+        async def run():
+            with self.assertRaises(ValueError):
+                await cache.get_or_compute("wiki_summary", ["Python"], failing)
+            return await cache.get_or_compute("wiki_summary", ["Python"], lambda: asyncio.sleep(0, {"summary": "ok"}))
+
+        self.assertFalse(asyncio.run(run()).hit)
+
+    def test_empty_results_are_not_cached(self):
+        self.config.config["response_cache"] = {"enabled": True}
+        cache = ResponseCache(self.config, self.logger)
+        results = [None, [], [{"id": 1}]]
+
+        async def compute():
+            return results.pop(0)
+
+        async def run():
+            return [await cache.get_or_compute("fetch_list", ["https://example.com/items"], compute)
+                    for _ in range(4)]
+
+        responses = asyncio.run(run())
+        self.assertEqual([response.value for response in responses], [None, [], [{"id": 1}], [{"id": 1}]])
+        self.assertEqual([response.stored for response in responses], [False, False, True, True])
+        self.assertTrue(responses[3].hit)
+
+if __name__ == '__main__':
+    unittest.main()
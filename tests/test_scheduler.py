@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+from app.modules.scheduler import Scheduler, current_api_key
+from app.modules.worker_pool import WorkerPool, PoolRejectedError
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.config.config["scheduler"] = {"enabled": True, "max_concurrency": 1, "aging": 0}
+
+    def serve_order(self, requests, scheduler=None):
+        """Queue (endpoint, api key) requests behind a running one and return the order they are served in."""
+        scheduler = scheduler or Scheduler(self.config, self.logger)
+        order = []
+
+        async def request(endpoint, api_key):
+            current_api_key.set(api_key)
+            ticket = await scheduler.acquire(endpoint)
+            order.append((endpoint, api_key))
+            await asyncio.sleep(0)
+            scheduler.release(ticket)
+
+        async def run():
+            running = await scheduler.acquire("chat")
+            tasks = []
+            for endpoint, api_key in requests:
+                tasks.append(asyncio.ensure_future(request(endpoint, api_key)))
+                await asyncio.sleep(0)
+            self.assertEqual(sum(scheduler.stats()["waiting"].values()), len(requests))
+            scheduler.release(running)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        return order
+
+    def test_priority_classes(self):
+        order = self.serve_order([("reflective_response", "a"), ("search", "a"), ("chat", "a")])
+        self.assertEqual([endpoint for endpoint, _ in order], ["chat", "search", "reflective_response"])
+
+    def test_fair_share_between_api_keys(self):
+        order = self.serve_order([("chat", "heavy")] * 4 + [("chat", "light")])
+        self.assertEqual(order[1], ("chat", "light"))
+
+    def test_weights(self):
+        self.config.config["scheduler"]["api_keys"] = {"premium": 3}
+        order = self.serve_order([("chat", "basic")] * 3 + [("chat", "premium")] * 3)
+        self.assertEqual([key for _, key in order[:2]], ["premium", "premium"])
+        self.assertEqual([key for _, key in order[:4]].count("premium"), 3)
+
+    def test_shortest_job_first(self):
+        self.config.config["scheduler"].update(
+            {"shortest_job_first": True, "endpoints": {"translate": "standard", "chat": "standard"}})
+        order = self.serve_order([("chat", "a"), ("translate", "b")])
+        self.assertEqual(order[0], ("translate", "b"))
+
+    def test_aging_prevents_starvation(self):
+        self.config.config["scheduler"]["aging"] = 0.01
+        scheduler = Scheduler(self.config, self.logger)
+
+        async def run():
+            running = await scheduler.acquire("chat")
+            batch = asyncio.ensure_future(scheduler.acquire("reflective_response"))
+            await asyncio.sleep(0.05)
+            chat = asyncio.ensure_future(scheduler.acquire("chat"))
+            await asyncio.sleep(0)
+            scheduler.release(running)
+            await asyncio.sleep(0.01)
+            self.assertTrue(batch.done())
+            self.assertFalse(chat.done())
+            scheduler.release(batch.result())
+            scheduler.release(await chat)
+
+        asyncio.run(run())
+        self.assertEqual(scheduler.active, 0)
+
+    def test_worker_pool_rejects_when_no_slot(self):
+        self.config.config["scheduler"]["queue_timeout"] = 0.05
+        worker_pool = WorkerPool(self.config, self.logger)
+
+        async def run():
+            release = asyncio.Event()
+            running = asyncio.ensure_future(worker_pool.run_async("chat", release.wait))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(PoolRejectedError) as raised:
+                await worker_pool.run_async("translate", release.wait)
+            self.assertEqual(raised.exception.status_code, 503)
+            self.assertEqual(worker_pool.stats()["translate"]["active"], 0)
+            release.set()
+            await running
+            return await worker_pool.run("translate", lambda: "done")
+
+        self.assertEqual(asyncio.run(run()), "done")
+        self.assertEqual(worker_pool.scheduler.stats()["active"], 0)
+        worker_pool.shutdown()
+
+    def test_try_acquire_does_not_pass_waiting_requests(self):
+        scheduler = Scheduler(self.config, self.logger)
+
+        async def run():
+            running = await scheduler.acquire("chat")
+            self.assertEqual(scheduler.try_acquire("chat", "a"), (False, None))
+            waiting = asyncio.ensure_future(scheduler.acquire("search"))
+            await asyncio.sleep(0)
+            scheduler.release(running)
+            # The slot went to the waiting request.
+            self.assertEqual(scheduler.try_acquire("chat", "a"), (False, None))
+            scheduler.release(await waiting)
+            acquired, ticket = scheduler.try_acquire("chat", "a")
+            self.assertTrue(acquired)
+            scheduler.release(ticket)
+
+        asyncio.run(run())
+        self.assertEqual(scheduler.active, 0)
+
+if __name__ == '__main__':
+    unittest.main()
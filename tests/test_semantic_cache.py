@@ -0,0 +1,78 @@
+import time
+import unittest
+from app.modules.semantic_cache import SemanticCache, current_tool_calls, record_tool_call
+from app.modules.scheduler import current_api_key
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+VOCABULARY = ["opening", "hours", "office", "open", "when", "price", "support", "weather"]
+
+def bag_of_words(text):
+    # Deterministic stand-in for the embeddings model.
+    words = text.lower().replace("?", "").split()
+    return [float(sum(word.startswith(term) for word in words)) for term in VOCABULARY]
+
+class TestSemanticCache(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.config.config["semantic_cache"] = {"enabled": True, "similarity_threshold": 0.8, "max_entries": 2}
+        self.cache = SemanticCache(self.config, self.logger, embed=bag_of_words)
+
+    def test_returns_answer_for_paraphrase(self):
+        answer, vector = self.cache.lookup("When is the office open?")
+        self.assertIsNone(answer)
+        self.assertTrue(self.cache.store("When is the office open?", vector, "9 to 5"))
+
+        self.assertEqual(self.cache.lookup("when  is the office opening")[0], "9 to 5")
+        self.assertIsNone(self.cache.lookup("What is the price of support?")[0])
+
+    def test_answers_are_scoped_by_api_key(self):
+        token = current_api_key.set("alice")
+        try:
+            _, vector = self.cache.lookup("When is the office open?")
+            self.cache.store("When is the office open?", vector, "9 to 5")
+        finally:
+            current_api_key.reset(token)
+
+        token = current_api_key.set("bob")
+        try:
+            self.assertIsNone(self.cache.lookup("when is the office opening")[0])
+        finally:
+            current_api_key.reset(token)
+        token = current_api_key.set("alice")
+        try:
+            self.assertEqual(self.cache.lookup("when is the office opening")[0], "9 to 5")
+        finally:
+            current_api_key.reset(token)
+
+    def test_skips_time_sensitive_tools(self):
+        tool_calls = []
+        token = current_tool_calls.set(tool_calls)
+        record_tool_call("get_current_datetime")
+        current_tool_calls.reset(token)
+        record_tool_call("ignored outside of a chat call")
+
+        _, vector = self.cache.lookup("When is the office open?")
+        self.assertFalse(self.cache.store("When is the office open?", vector, "Now", tool_calls))
+        self.assertFalse(self.cache.store("When is the office open?", vector, "Open", ["fetch_data"]))
+        self.assertEqual(len(self.cache.index), 0)
+
+    def test_evicts_oldest_and_expired(self):
+        for question in ["office hours", "price support", "weather"]:
+            _, vector = self.cache.lookup(question)
+            self.cache.store(question, vector, question.upper())
+        self.assertEqual([entry["question"] for entry in self.cache.index.entries], ["price support", "weather"])
+
+        self.cache.index.entries[0]["expires_at"] = time.time() - 1
+        self.assertIsNone(self.cache.lookup("price support")[0])
+        self.assertEqual(len(self.cache.index), 1)
+
+    def test_disabled(self):
+        self.config.config["semantic_cache"] = {"enabled": False}
+        cache = SemanticCache(self.config, self.logger, embed=bag_of_words)
+        self.assertEqual(cache.lookup("office hours"), (None, None))
+        self.assertFalse(cache.store("office hours", None, "9 to 5"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+import unittest
+from app.modules.single_flight import SingleFlight, ThreadSingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight("wiki_summary")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"summary": "Python"}
+
+        async def run():
+            results = await asyncio.gather(*(flight.run("python", compute) for _ in range(10)))
+            self.assertEqual(flight.in_flight(), 0)
+            later = await flight.run("python", compute)
+            return results, later
+
+        results, later = asyncio.run(run())
+        self.assertEqual(results, [{"summary": "Python"}] * 10)
+        self.assertEqual(later, {"summary": "Python"})
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("page not found")
+
+        async def run():
+            return await asyncio.gather(flight.run("key", failing), flight.run("key", failing), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in asyncio.run(run())))
+
+    def test_timeout_does_not_cancel_computation(self):
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.1)
+            return "done"
+
+        async def run():
+            waiter = asyncio.ensure_future(flight.run("key", slow))
+            with self.assertRaises(asyncio.TimeoutError):
+                await flight.run("key", slow, timeout=0.01)
+            return await waiter
+
+        self.assertEqual(asyncio.run(run()), "done")
+
+    def test_thread_single_flight(self):
+        flight = ThreadSingleFlight("wikipedia_page")
+        calls = []
+        results = []
+
+        def download(title):
+            calls.append(title)
+            time.sleep(0.05)
+            return f"content of {title}"
+
+        threads = [threading.Thread(target=lambda: results.append(flight.run("Python", download, "Python")))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["content of Python"] * 5)
+        self.assertEqual(calls, ["Python"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+import unittest
+from app.modules.streaming import EventStream, current_event_sink, emit_event, format_sse
+
+class TestStreaming(unittest.TestCase):
+    def test_event_stream_delivers_events_from_worker_thread(self):
+        async def run():
+            stream = EventStream()
+
+            def produce():
+                stream.emit("token", "Hel")
+                stream.emit("token", "lo")
+                stream.emit("done", "Hello")
+                stream.close()
+
+            threading.Thread(target=produce).start()
+            return [item async for item in stream]
+
+        events = asyncio.run(run())
+        self.assertEqual(events, [("token", "Hel"), ("token", "lo"), ("done", "Hello")])
+
+    def test_emit_event_uses_current_sink(self):
+        events = []
+        emit_event("token", "ignored")
+        token = current_event_sink.set(lambda event, data: events.append((event, data)))
+        try:
+            emit_event("tool_call", {"tool": "fetch_data"})
+        finally:
+            current_event_sink.reset(token)
+        self.assertEqual(events, [("tool_call", {"tool": "fetch_data"})])
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse("token", "Hi"), 'event: token\ndata: "Hi"\n\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from app.modules.tracing import Tracer, FileExporter, tracer, span, traced, current_trace_id, parse_traceparent
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "traces.jsonl")
+        self.config.config["tracing"] = {"exporter": "file", "file": self.path}
+        tracer.configure(self.config, self.logger)
+
+    def tearDown(self):
+        tracer.exporter = None
+        self.directory.cleanup()
+
+    def exported(self):
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_nested_spans_share_trace(self):
+        with span("request") as parent:
+            with span("module", page="Python") as child:
+                self.assertEqual(current_trace_id(), parent.trace_id)
+        self.assertIsNone(current_trace_id())
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.parent_id, parent.span_id)
+
+        spans = {s["name"]: s for s in self.exported()}
+        self.assertEqual(spans["module"]["parentSpanId"], parent.span_id)
+        self.assertEqual(spans["module"]["attributes"], {"page": "Python"})
+        self.assertEqual(spans["request"]["parentSpanId"], "")
+        self.assertGreaterEqual(spans["request"]["endTimeUnixNano"], spans["module"]["endTimeUnixNano"])
+
+    def test_traced_records_errors(self):
+        @traced("failing")
+        def failing():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            failing()
+        self.assertEqual(self.exported()[0]["status"], {"code": "ERROR", "message": "ValueError: boom"})
+
+    def test_traced_coroutine(self):
+        @traced("async_module")
+        async def module():
+            return current_trace_id()
+
+        async def run():
+            with span("request") as request_span:
+                return request_span.trace_id, await module()
+
+        expected, seen = asyncio.run(run())
+        self.assertEqual(seen, expected)
+        self.assertEqual([s["name"] for s in self.exported()], ["async_module", "request"])
+
+    def test_remote_parent_and_sampling(self):
+        trace_id, parent_id = parse_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+        self.assertEqual((trace_id, parent_id), ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"))
+        self.assertEqual(parse_traceparent("garbage"), (None, None))
+
+        remote = tracer.start_span("request", trace_id=trace_id, parent_id=parent_id)
+        self.assertEqual(remote.trace_id, trace_id)
+        self.assertEqual(remote.parent_id, parent_id)
+
+        unsampled = Tracer()
+        unsampled.sample_rate = 0.0
+        unsampled.exporter = FileExporter(self.path)
+        unsampled.export(unsampled.start_span("dropped"))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unknown_exporter(self):
+        self.config.config["tracing"] = {"exporter": "zipkin"}
+        with self.assertRaises(ValueError):
+            Tracer().configure(self.config, self.logger)
+
+if __name__ == '__main__':
+    unittest.main()
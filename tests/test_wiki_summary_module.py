@@ -1,6 +1,9 @@
+import threading
+import time
 import unittest
 from unittest.mock import patch, Mock
 from app.modules.wiki_summary_module import WikiSummaryModule
+from app.modules.wikipedia import WikipediaPage
 from srt_core.config import Config
 from srt_core.utils.logger import Logger
 
@@ -30,5 +33,47 @@ class TestWikiSummaryModule(unittest.TestCase):
         self.assertEqual(summary, "This is a summary.")
         mock_get_page.assert_called_once_with("Sample_Title")
 
+    def test_long_page_is_summarized_with_map_reduce(self):
+        module = self.wiki_summary_module
+        module.llm_settings = {**(module.llm_settings or {}), "max_tokens": 100000}
+        module.tokens_per_summary, module.partial_summary_tokens, module.concurrency = 1000, 100, 3
+        # 40 paragraphs of about 124 tokens, 8 fit in a part.
+        text = "".join(f"Paragraph {i}. " + "x" * 480 + "\n\n" for i in range(40))
+        prompts, running, peak = [], [0], [0]
+        lock = threading.Lock()
+
+        def get_chat_response(prompt, **kwargs):
+            with lock:
+                prompts.append((prompt, kwargs["llm_sampling_settings"].max_tokens))
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return "y" * 1600 if prompt.startswith("The following") else "Final summary."
+
+        with patch.object(module.pages, "get", return_value=WikipediaPage("Long page", text, 1)), \
+                patch.object(module.agent, "get_chat_response", side_effect=get_chat_response):
+            summary = module.summarize_wikipedia_page("Long_page")
+
+        self.assertEqual(summary, "Final summary.")
+        partial = [prompt for prompt, max_tokens in prompts if max_tokens == 100]
+        # 5 parts of the page, then 3 and 2 parts of 400 token partial summaries, then the final summary.
+        self.assertEqual(len(partial), 5 + 3 + 2)
+        self.assertEqual(len(prompts), len(partial) + 1)
+        self.assertTrue(any("Paragraph 0." in prompt and "Paragraph 7." in prompt for prompt in partial))
+        self.assertTrue(prompts[-1][0].startswith("Summarize the following text:"))
+        self.assertLessEqual(peak[0], 3)
+        self.assertGreater(peak[0], 1)
+
+    def test_short_page_is_summarized_in_one_call(self):
+        module = self.wiki_summary_module
+        with patch.object(module.pages, "get", return_value=WikipediaPage("Short", "A short page.", 1)), \
+                patch.object(module.agent, "get_chat_response", return_value="Summary.") as get_chat_response:
+            self.assertEqual(module.summarize_wikipedia_page("Short"), "Summary.")
+        get_chat_response.assert_called_once()
+        self.assertIn("A short page.", get_chat_response.call_args.args[0])
+        self.assertFalse(get_chat_response.call_args.kwargs["add_message_to_chat_history"])
+
 if __name__ == '__main__':
     unittest.main()
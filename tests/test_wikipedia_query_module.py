@@ -1,7 +1,9 @@
 import unittest
 import json
+import numpy as np
 from unittest.mock import patch, Mock
 from app.modules.wikipedia_query_module import WikipediaQueryModule
+from app.modules.page_index import PageIndex
 from srt_core.config import Config
 from srt_core.utils.logger import Logger
 
@@ -30,5 +32,83 @@ class TestWikipediaQueryModule(unittest.TestCase):
         result = self.wikipedia_query_module.process_wikipedia_query("https://en.wikipedia.org/wiki/Synthetic_diamond", "What is a BARS apparatus?")
         self.assertIn("error", result)
 
+    def test_prompt_holds_best_excerpts_within_budget(self):
+        module = self.wikipedia_query_module
+        if not module.dependencies_available:
+            self.skipTest("needs ragatouille and sentence_transformers")
+        chunks = ["alpha " * 50, "beta " * 50, "gamma " * 400]
+        index = PageIndex("Test", 42, chunks, [0, 300, 550], np.eye(3, 4, dtype=np.float32))
+        module.max_context_tokens = 200
+        reranked = [[{"score": 3.0, "result_index": 2}, {"score": 2.0, "result_index": 1},
+                     {"score": 1.0, "result_index": 0}]]
+        with patch.object(module, "_index_page", return_value=index), \
+                patch.object(module, "_embed", return_value=np.array([[1, 0, 0, 0]], dtype=np.float32)), \
+                patch.object(module, "_rerank", return_value=reranked) as rerank, \
+                patch.object(module.agent, "get_chat_response", return_value="answer") as get_chat_response:
+            result = module.process_wikipedia_query("Test", "What is alpha?")
+
+        self.assertEqual(rerank.call_args.args[0], ["What is alpha?"])
+        prompt = get_chat_response.call_args.args[0]
+        # The best chunk does not fit in the budget, the next ones do.
+        self.assertNotIn("gamma", prompt)
+        self.assertLess(prompt.index("beta"), prompt.index("alpha"))
+        self.assertFalse(get_chat_response.call_args.kwargs["add_message_to_chat_history"])
+        self.assertEqual(result["answer"], "answer")
+        self.assertEqual((result["page"], result["revision"]), ("Test", 42))
+        self.assertEqual(result["sources"], [{"offset": 300, "length": 250, "score": 2.0},
+                                             {"offset": 0, "length": 300, "score": 1.0}])
+
+    def test_batch_indexes_once_and_keeps_query_order(self):
+        module = self.wikipedia_query_module
+        if not module.dependencies_available:
+            self.skipTest("needs ragatouille and sentence_transformers")
+        chunks = ["alpha " * 10, "beta " * 10, "gamma " * 10]
+        index = PageIndex("Test", 42, chunks, [0, 60, 110], np.eye(3, 4, dtype=np.float32))
+        module.candidates = 1
+        queries = ["What is alpha?", "What is gamma?", "What is beta?"]
+        vectors = np.eye(3, 4, dtype=np.float32)[[0, 2, 1]]
+        reranked = [[{"score": float(10 * q + n), "result_index": n} for n in range(3)] for q in range(3)]
+
+        def get_chat_response(prompt, **kwargs):
+            if "beta" in prompt:
+                raise RuntimeError("backend failed")
+            return prompt.split("[1] ")[1].split()[0]
+
+        with patch.object(module, "_index_page", return_value=index) as index_page, \
+                patch.object(module, "_embed", return_value=vectors) as embed, \
+                patch.object(module, "_rerank", return_value=reranked) as rerank, \
+                patch.object(module.agent, "get_chat_response", side_effect=get_chat_response):
+            result = module.process_wikipedia_queries("Test", queries)
+
+        index_page.assert_called_once()
+        embed.assert_called_once_with(queries)
+        # The candidates of all queries are reranked in one call.
+        rerank.assert_called_once_with(queries, chunks)
+        self.assertEqual((result["page"], result["revision"]), ("Test", 42))
+        self.assertEqual([item["query"] for item in result["results"]], queries)
+        self.assertEqual(result["results"][0]["answer"], "alpha")
+        self.assertEqual(result["results"][0]["sources"], [{"offset": 0, "length": 60, "score": 0.0}])
+        self.assertEqual(result["results"][1]["answer"], "gamma")
+        self.assertEqual(result["results"][1]["sources"], [{"offset": 110, "length": 60, "score": 12.0}])
+        self.assertEqual(result["results"][2]["error"], "backend failed")
+
+    def test_batch_reports_query_without_room_for_excerpts(self):
+        module = self.wikipedia_query_module
+        if not module.dependencies_available:
+            self.skipTest("needs ragatouille and sentence_transformers")
+        index = PageIndex("Test", 42, ["alpha " * 10], [0], np.eye(1, 4, dtype=np.float32))
+        module.rerank = False
+        queries = ["What is alpha?", "alpha " * module.llm_settings.get("max_tokens", 4096)]
+
+        with patch.object(module, "_index_page", return_value=index), \
+                patch.object(module, "_embed", return_value=np.eye(2, 4, dtype=np.float32)), \
+                patch.object(module.agent, "get_chat_response", return_value="answer"):
+            result = module.process_wikipedia_queries("Test", queries)
+
+        # The long question fails alone, the other one is answered.
+        self.assertEqual(result["results"][0]["answer"], "answer")
+        self.assertIn("fits in the context", result["results"][1]["error"])
+        self.assertEqual(result["results"][1]["sources"], [])
+
 if __name__ == '__main__':
     unittest.main()
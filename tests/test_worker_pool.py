@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import time
+import unittest
+from app.modules.worker_pool import WorkerPool, PoolRejectedError, map_in_pool, amap_in_pool
+from app.modules.tracing import span, current_trace_id
+from srt_core.config import Config
+from srt_core.utils.logger import Logger
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.config.config["worker_pool"] = {
+            "max_workers": 4,
+            "retry_after": 7,
+            "default": {"max_concurrency": 1, "max_queue": 1, "queue_timeout": 0.2},
+        }
+        self.worker_pool = WorkerPool(self.config, self.logger)
+
+    def tearDown(self):
+        self.worker_pool.shutdown()
+
+    def test_run_returns_result_off_loop_thread(self):
+        async def run():
+            return await self.worker_pool.run("chat", threading.current_thread)
+
+        thread = asyncio.run(run())
+        self.assertNotEqual(thread, threading.main_thread())
+        self.assertTrue(thread.name.startswith("llm-worker"))
+
+    def test_rejects_with_429_when_queue_full(self):
+        release = threading.Event()
+
+        async def run():
+            running = asyncio.ensure_future(self.worker_pool.run("chat", release.wait))
+            queued = asyncio.ensure_future(self.worker_pool.run("chat", lambda: "queued"))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(PoolRejectedError) as ctx:
+                await self.worker_pool.run("chat", lambda: "rejected")
+            release.set()
+            await running
+            self.assertEqual(await queued, "queued")
+            return ctx.exception
+
+        error = asyncio.run(run())
+        self.assertEqual(error.status_code, 429)
+        self.assertEqual(error.retry_after, 7)
+
+    def test_rejects_with_503_on_queue_timeout(self):
+        release = threading.Event()
+
+        async def run():
+            running = asyncio.ensure_future(self.worker_pool.run("chat", release.wait))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(PoolRejectedError) as ctx:
+                await self.worker_pool.run("chat", lambda: "late")
+            release.set()
+            await running
+            return ctx.exception
+
+        error = asyncio.run(run())
+        self.assertEqual(error.status_code, 503)
+
+    def test_endpoints_are_limited_independently(self):
+        release = threading.Event()
+
+        async def run():
+            running = asyncio.ensure_future(self.worker_pool.run("reflective_response", release.wait))
+            await asyncio.sleep(0.05)
+            result = await self.worker_pool.run("translate", lambda: "translated")
+            release.set()
+            await running
+            return result
+
+        self.assertEqual(asyncio.run(run()), "translated")
+
+    def test_run_async_shares_endpoint_limits(self):
+        async def run():
+            release = asyncio.Event()
+            running = asyncio.ensure_future(self.worker_pool.run_async("chat", release.wait))
+            queued = asyncio.ensure_future(self.worker_pool.run("chat", lambda: "queued"))
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.worker_pool.stats()["chat"]["active"], 1)
+            with self.assertRaises(PoolRejectedError):
+                await self.worker_pool.run_async("chat", release.wait)
+            release.set()
+            await running
+            return await queued
+
+        self.assertEqual(asyncio.run(run()), "queued")
+
+    def test_cancelled_call_holds_its_slot_until_the_thread_is_done(self):
+        finish = threading.Event()
+
+        async def run():
+            running = asyncio.ensure_future(self.worker_pool.run("chat", finish.wait))
+            await asyncio.sleep(0.05)
+            # The client disconnected, the blocking call keeps running.
+            running.cancel()
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.worker_pool.stats()["chat"]["active"], 1)
+            queued = asyncio.ensure_future(self.worker_pool.run("chat", lambda: "queued"))
+            await asyncio.sleep(0.05)
+            self.assertFalse(queued.done())
+            finish.set()
+            return await queued
+
+        self.assertEqual(asyncio.run(run()), "queued")
+        self.assertEqual(self.worker_pool.stats()["chat"]["active"], 0)
+
+    def test_rejects_with_503_after_shutdown(self):
+        self.worker_pool.shutdown()
+
+        async def run():
+            await self.worker_pool.run("chat", lambda: None)
+
+        with self.assertRaises(PoolRejectedError) as raised:
+            asyncio.run(run())
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(self.worker_pool.stats()["chat"]["active"], 0)
+
+    def test_run_propagates_trace_context(self):
+        async def run():
+            with span("request") as request_span:
+                return request_span.trace_id, await self.worker_pool.run("chat", current_trace_id)
+
+        expected, seen = asyncio.run(run())
+        self.assertEqual(seen, expected)
+
+class TestMapInPool(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.logger = Logger()
+        self.config.config["worker_pool"] = {
+            "max_workers": 8,
+            "default": {"max_concurrency": 1, "max_queue": 1, "queue_timeout": 1},
+            "endpoints": {"wiki_summary": {"max_concurrency": 3}},
+        }
+        self.worker_pool = WorkerPool(self.config, self.logger)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def tearDown(self):
+        self.worker_pool.shutdown()
+
+    def _work(self, item):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return item * 2
+
+    async def _awork(self, item):
+        return await asyncio.to_thread(self._work, item)
+
+    def test_fan_out_only_takes_free_slots(self):
+        release = threading.Event()
+
+        async def run():
+            other = asyncio.ensure_future(self.worker_pool.run("wiki_summary", release.wait))
+            await asyncio.sleep(0.05)
+            result = await self.worker_pool.run("wiki_summary", map_in_pool, self._work, list(range(6)), 4)
+            release.set()
+            await other
+            return result
+
+        self.assertEqual(asyncio.run(run()), [0, 2, 4, 6, 8, 10])
+        # One of the three slots is taken by the other request.
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(self.worker_pool.stats()["wiki_summary"]["active"], 0)
+
+    def test_fan_out_on_a_full_endpoint_runs_on_its_own_slot(self):
+        async def run():
+            return await self.worker_pool.run("chat", map_in_pool, self._work, [1, 2, 3], 4)
+
+        self.assertEqual(asyncio.run(run()), [2, 4, 6])
+        self.assertEqual(self.peak, 1)
+
+    def test_async_fan_out_only_takes_free_slots(self):
+        async def run():
+            return await self.worker_pool.run_async("wiki_summary", amap_in_pool, self._awork, list(range(6)), 4)
+
+        self.assertEqual(asyncio.run(run()), [0, 2, 4, 6, 8, 10])
+        self.assertEqual(self.peak, 3)
+        self.assertEqual(self.worker_pool.stats()["wiki_summary"]["active"], 0)
+
+    def test_fan_out_outside_the_pool_uses_max_workers(self):
+        self.assertEqual(map_in_pool(self._work, list(range(4)), 2), [0, 2, 4, 6])
+        self.assertEqual(self.peak, 2)
+
+if __name__ == '__main__':
+    unittest.main()